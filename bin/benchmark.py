@@ -0,0 +1,287 @@
+"""Benchmark the hot paths for working out what to install in an env.
+
+This generates a synthetic project with large pinned requirements files,
+deep and diamond shaped `-r` include graphs and many local requirements, and
+times the work we do on every run of tox against it.
+
+Results are compared with a stored baseline, so regressions show up as
+numbers. Baselines are only comparable on the same machine, so you will want
+to save one before making changes:
+
+    python bin/benchmark.py --save
+    # ... make some changes ...
+    python bin/benchmark.py
+"""
+
+import json
+import platform
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+from types import SimpleNamespace
+
+import py
+
+from tox_pip_sync._cache import CompileCache
+from tox_pip_sync._config import default_config
+from tox_pip_sync._pip_sync import requirements_files_for_env
+from tox_pip_sync._requirements import SESSION, RequirementList, SourceFiles
+
+BASELINE_FILE = Path(__file__).parent / "benchmark_baseline.json"
+
+
+class SyntheticProject:
+    """A generated project with lots of requirements to work through."""
+
+    PINNED_LINES = 2000
+    CHAIN_DEPTH = 30
+    DIAMOND_WIDTH = 20
+    LOCAL_EXTRAS = 50
+
+    def __init__(self, root_dir):
+        """Initialize a SyntheticProject object.
+
+        :param root_dir: The directory to create the project in
+        """
+        self.root_dir = Path(root_dir)
+
+    def create(self):
+        """Write the project files to disk."""
+
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+        for name in ("setup.py", "setup.cfg", "pyproject.toml"):
+            (self.root_dir / name).write_text(f"# {name}\n" * 50, encoding="utf-8")
+
+        # A large compiled file, like `pip-compile --generate-hashes` creates
+        self._write("pinned.txt", (self._pin(i) for i in range(self.PINNED_LINES)))
+
+        # A long chain of includes: chain_0.txt -> chain_1.txt -> ...
+        for i in range(self.CHAIN_DEPTH):
+            lines = [self._pin(i)]
+            if i + 1 < self.CHAIN_DEPTH:
+                lines.append(f"-r chain_{i + 1}.txt")
+            self._write(f"chain_{i}.txt", lines)
+
+        # Lots of files which all include the same large base file
+        for i in range(self.DIAMOND_WIDTH):
+            self._write(f"diamond_{i}.txt", ["-r pinned.txt", self._pin(i)])
+        self._write(
+            "diamond.txt", (f"-r diamond_{i}.txt" for i in range(self.DIAMOND_WIDTH))
+        )
+
+    @property
+    def deps(self):
+        """Get `deps` as they would be written in `tox.ini`."""
+
+        deps = ["-r pinned.txt", "-r chain_0.txt", "-r diamond.txt"]
+        deps.extend(f"-e .[extra_{i}]" for i in range(self.LOCAL_EXTRAS))
+        deps.append("ad-hoc-requirement>=1.0")
+
+        return deps
+
+    def _write(self, filename, lines):
+        (self.root_dir / filename).write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    @staticmethod
+    def _pin(i):
+        # The way `pip-compile --generate-hashes` writes them
+        return (
+            f"package-{i}==1.0.{i} \\\n"
+            f"    --hash=sha256:{i:064x} \\\n"
+            f"    --hash=sha256:{i + 1:064x}\n"
+            f"    # via something-{i}"
+        )
+
+
+class Benchmarks:
+    """The things we time against a synthetic project."""
+
+    def __init__(self, project, work_dir):
+        """Initialize a Benchmarks object.
+
+        :param project: The `SyntheticProject` to work against
+        :param work_dir: A scratch directory for virtual envs and caches
+        """
+        self.project = project
+        self.venv = self._fake_venv(Path(work_dir), project)
+
+        # The records from a previous run, to time the case where nothing
+        # has changed and we only need to check the files
+        self.previous_sources = SourceFiles()
+        self._requirements().hash(project.root_dir, sources=self.previous_sources)
+
+    def hash_cold(self):
+        """Hash requirements reading every file."""
+
+        SESSION.clear()
+        self._requirements().hash(self.project.root_dir, sources=SourceFiles())
+
+    def hash_cold_raw(self):
+        """Hash requirements reading every file as raw bytes."""
+
+        SESSION.clear()
+        self._requirements().hash(
+            self.project.root_dir, sources=SourceFiles(), raw_files=True
+        )
+
+    def hash_warm(self):
+        """Hash requirements where no files have changed since last time."""
+
+        self._requirements().hash(
+            self.project.root_dir, sources=SourceFiles(self.previous_sources)
+        )
+
+    def hash_other_env(self):
+        """Hash requirements for another env, after the first in this run."""
+
+        self._requirements().hash(self.project.root_dir, sources=SourceFiles())
+
+    def from_requirements_file(self):
+        """Parse a large compiled requirements file."""
+
+        RequirementList.from_requirements_file(self.project.root_dir / "pinned.txt")
+
+    def constrained_set(self):
+        """Convert includes to constraints for compiling."""
+
+        self._requirements().constrained_set(Path("../.."))
+
+    def requirements_files_for_env(self):
+        """Find the files to sync, with compiled deps in the compile cache."""
+
+        for pinned in Path(self.venv.path).glob("tox-pip-sync_*"):
+            pinned.unlink()
+
+        list(requirements_files_for_env(self.venv, None, self._requirements()))
+
+    def _requirements(self):
+        # Make a new one each time, as they remember their hashes
+        return RequirementList.from_strings(self.project.deps)
+
+    def _fake_venv(self, work_dir, project):
+        # tox uses `py.path` objects for env paths
+        # pylint: disable=no-member
+        venv_path = py.path.local(work_dir / ".tox" / "bench")
+        venv_path.ensure(dir=True)
+
+        venv = SimpleNamespace(
+            name="bench",
+            path=venv_path,
+            envconfig=SimpleNamespace(
+                config=SimpleNamespace(
+                    setupdir=project.root_dir,
+                    toxinidir=project.root_dir,
+                    tox_pip_sync=dict(
+                        default_config(), cache_dir=str(work_dir / "cache")
+                    ),
+                ),
+                python_info=SimpleNamespace(
+                    implementation=platform.python_implementation(),
+                    version_info=sys.version_info,
+                ),
+            ),
+        )
+
+        # Prime the compile cache, so we time finding the files and not
+        # running `pip-compile`
+        compiled = work_dir / "compiled.txt"
+        compiled.write_text("ad-hoc-requirement==1.0\n", encoding="utf-8")
+        cache = CompileCache.for_venv(venv)
+        requirements_hash = self._requirements().hash(project.root_dir)
+        cache.put(cache.key(requirements_hash, venv), compiled, project.root_dir)
+
+        return venv
+
+    def run(self, repeat, number):
+        """Time each benchmark.
+
+        :param repeat: How many times to repeat each measurement
+        :param number: How many calls to make in each measurement
+        :return: A dict of benchmark name to the best time per call in seconds
+        """
+        results = {}
+        for name in (
+            "hash_cold",
+            "hash_cold_raw",
+            "hash_warm",
+            "hash_other_env",
+            "from_requirements_file",
+            "constrained_set",
+            "requirements_files_for_env",
+        ):
+            func = getattr(self, name)
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                for _ in range(number):
+                    func()
+                timings.append((time.perf_counter() - start) / number)
+
+            results[name] = min(timings)
+
+        return results
+
+
+def report(results, baseline):
+    """Print results alongside the baseline they are compared to."""
+
+    print(f"{'benchmark':30} {'time (ms)':>10} {'baseline':>10} {'ratio':>7}")
+    for name, seconds in results.items():
+        line = f"{name:30} {seconds * 1000:10.3f}"
+        if name in baseline:
+            line += f" {baseline[name] * 1000:10.3f} {seconds / baseline[name]:6.2f}x"
+        print(line)
+
+
+def main(argv=None):
+    """Run the benchmarks from the command line."""
+
+    parser = ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--number", type=int, default=10)
+    parser.add_argument(
+        "--save", action="store_true", help="Store the results as the new baseline"
+    )
+    parser.add_argument(
+        "--max-ratio",
+        type=float,
+        help="Exit with an error if any benchmark is this many times slower "
+        "than the baseline",
+    )
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="tox-pip-sync-benchmark-") as work_dir:
+        project = SyntheticProject(Path(work_dir) / "project")
+        project.create()
+        results = Benchmarks(project, work_dir).run(args.repeat, args.number)
+
+    baseline = {}
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+
+    report(results, baseline)
+
+    if args.save:
+        args.baseline.write_text(
+            json.dumps(results, indent=2, sort_keys=True) + "\n", encoding="utf-8"
+        )
+        print(f"Saved baseline to '{args.baseline}'")
+
+    if args.max_ratio:
+        slow = [
+            name
+            for name, seconds in results.items()
+            if name in baseline and seconds / baseline[name] > args.max_ratio
+        ]
+        if slow:
+            print(f"Slower than {args.max_ratio}x the baseline: {', '.join(slow)}")
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
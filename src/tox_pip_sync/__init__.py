@@ -1,7 +1,8 @@
 import pluggy
 
-from tox_pip_sync._config import load_config
-from tox_pip_sync._pip_sync import clear_compiled_files, pip_sync
+# tox imports plugins on every run (even `tox -l` or `tox --help`), so only
+# import the rest of `tox_pip_sync` inside the hooks when it's needed.
+# pylint: disable=import-outside-toplevel
 
 hookimpl = pluggy.HookimplMarker("tox")
 
@@ -12,13 +13,20 @@ def tox_configure(config):
 
     Called after command line options are parsed and ini-file has been read.
     """
+    from tox_pip_sync._config import load_config
 
-    config.tox_pip_sync = load_config(config.setupdir)
+    config.tox_pip_sync = load_config(config)
 
 
 @hookimpl
 def tox_testenv_create(venv, action):  # pylint: disable=unused-argument
     """Perform creation action for this venv."""
+    from tox_pip_sync._background import BackgroundCompile
+    from tox_pip_sync._pip_sync import clear_compiled_files
+
+    # Our hook runs before tox creates the env, so we can compile the
+    # requirements while that happens. They don't depend on the new env.
+    venv.background_compile = BackgroundCompile.start(venv)
 
     # Ensure any files we've left about are removed if the environment is being
     # re/created as we can't assume they wouldn't compile differently in the
@@ -29,10 +37,11 @@ def tox_testenv_create(venv, action):  # pylint: disable=unused-argument
 @hookimpl
 def tox_testenv_install_deps(venv, action):
     """Perform install dependencies action for this venv."""
+    from tox_pip_sync._pip_sync import pip_sync
 
     # Call our pip sync method instead of the usual way to install dependencies
     config = venv.envconfig.config.tox_pip_sync
-    pip_sync(venv, action, skip_on_hash_match=config.get("enable_hashing", True))
+    pip_sync(venv, action, skip_on_hash_match=config["enable_hashing"])
     venv.pip_synced = True
 
     # Let tox know we've handled this case
@@ -44,7 +53,7 @@ def tox_runenvreport(venv, action):  # pylint: disable=unused-argument
     """Get the installed packages and versions in this venv."""
 
     config = venv.envconfig.config.tox_pip_sync
-    if config.get("skip_listing", True):
+    if config["skip_listing"]:
         # This appears to be purely FYI, and just slows things down
         return ["*** listing modules disabled by tox-pip-sync in pyproject.toml ***"]
 
@@ -65,3 +74,25 @@ def tox_runtest_pre(venv):
         # `tox_testenv_install_deps` does not get called every time we run tox
         # so assuming we've not run before, we should make sure we have
         tox_testenv_install_deps(venv=venv, action=venv.new_action("pip-sync"))
+
+
+@hookimpl
+def tox_cleanup(session):
+    """Report how long everything took and log our decisions at the end."""
+    from tox.reporter import verbosity1
+
+    from tox_pip_sync._events import EVENTS, event_log_file
+    from tox_pip_sync._timing import TIMINGS
+
+    config = session.config.tox_pip_sync
+    if EVENTS.events and config["event_log"]:
+        EVENTS.write(event_log_file(config))
+
+    if not TIMINGS.events:
+        return
+
+    verbosity1(f"tox-pip-sync timings:\n{TIMINGS.summary()}")
+
+    trace_file = config["trace_file"]
+    if trace_file:
+        TIMINGS.export(session.config.toxinidir / trace_file)
@@ -0,0 +1,125 @@
+import io
+import json
+import re
+import tarfile
+from pathlib import Path
+
+from tox.exception import ConfigError
+
+from tox_pip_sync._cache import CompileCache, config_cache_dir, make_relocatable
+from tox_pip_sync._env_data import EnvData
+
+# Pythons as stored in the env data like `cpython3.9`
+PYTHON_TAG = r"[a-z]+\d+\.\d+"
+
+# Keys from the compile cache like `<requirements hash>-cpython3.9`
+CACHE_KEY = re.compile(rf"^\w+-{PYTHON_TAG}$")
+
+# Where things go in the archive
+MANIFEST = "manifest.json"
+COMPILED_DIR = "compiled"
+
+# Bump this if the layout of the archive changes
+ARCHIVE_VERSION = 1
+
+
+def export_archive(tox_config, filename):
+    """Save the compiled requirements from every env into an archive.
+
+    The compiled files are stored with the project root replaced, by the
+    same keys as the compile cache, so the archive can be imported into a
+    checkout anywhere. The env data for each env is included too, to show
+    where each file came from.
+
+    :param tox_config: The tox `Config` object for the project
+    :param filename: The archive to create (a `.tar.gz` file)
+    :return: A dict of cache key to the names of the envs it came from
+    """
+    root_dir = tox_config.setupdir
+    manifest = {"version": ARCHIVE_VERSION, "compiled": {}, "envs": {}}
+    compiled = {}
+
+    for env_name, envconfig in sorted(tox_config.envconfigs.items()):
+        env_data = EnvData(Path(envconfig.envdir))
+        if not re.match(rf"^{PYTHON_TAG}$", env_data.python or ""):
+            # This env hasn't been synced (by this version at least)
+            continue
+
+        for pinned in Path(envconfig.envdir).glob("tox-pip-sync_*.txt"):
+            # Compiled files are named after the hash of their requirements
+            requirements_hash = pinned.stem[len("tox-pip-sync_") :]
+            key = f"{requirements_hash}-{env_data.python}"
+            compiled[key] = make_relocatable(
+                pinned.read_text(encoding="utf-8"), root_dir
+            )
+            manifest["compiled"].setdefault(key, []).append(env_name)
+
+        manifest["envs"][env_name] = json.loads(
+            env_data.path.read_text(encoding="utf-8")
+        )
+
+    Path(filename).parent.mkdir(parents=True, exist_ok=True)
+    with tarfile.open(filename, "w:gz") as archive:
+        _add_file(archive, MANIFEST, json.dumps(manifest, indent=2))
+        for key, content in sorted(compiled.items()):
+            _add_file(archive, f"{COMPILED_DIR}/{key}.txt", content)
+
+    return manifest["compiled"]
+
+
+def import_archive(tox_config, filename):
+    """Load the compiled requirements from an archive into the compile cache.
+
+    When tox next creates the envs, they will find their compiled requirements
+    in the cache rather than running `pip-compile`. We don't restore the env
+    data, as the envs themselves still need installing.
+
+    :param tox_config: The tox `Config` object for the project
+    :param filename: An archive created by `export_archive()`
+    :return: A list of the cache keys which were imported
+    :raises ConfigError: If the compile cache is disabled
+    :raises ValueError: If the archive isn't one of ours
+    """
+    config = tox_config.tox_pip_sync
+    if not config["compile_cache"]:
+        raise ConfigError(
+            "Importing compiled requirements needs the tox-pip-sync option "
+            "'compile_cache' enabled"
+        )
+
+    cache = CompileCache(config_cache_dir(config))
+
+    with tarfile.open(filename, "r:*") as archive:
+        manifest = json.loads(_read_file(archive, MANIFEST))
+        if manifest.get("version") != ARCHIVE_VERSION:
+            raise ValueError(f"Unsupported archive version: {manifest.get('version')}")
+
+        imported = []
+        for key in manifest["compiled"]:
+            if not CACHE_KEY.match(key):
+                # Don't let keys write anywhere outside of the cache
+                raise ValueError(f"Invalid key in archive: '{key}'")
+
+            if key in cache:
+                continue
+
+            cache.put_relocatable(key, _read_file(archive, f"{COMPILED_DIR}/{key}.txt"))
+            imported.append(key)
+
+    return imported
+
+
+def _add_file(archive, name, content):
+    data = content.encode("utf-8")
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    archive.addfile(info, io.BytesIO(data))
+
+
+def _read_file(archive, name):
+    try:
+        member = archive.extractfile(name)
+    except KeyError as err:
+        raise ValueError(f"Missing '{name}' from archive") from err
+
+    return member.read().decode("utf-8")
@@ -0,0 +1,185 @@
+import shutil
+import subprocess
+import threading
+from contextlib import contextmanager
+from os.path import relpath
+from pathlib import Path
+
+from tox.reporter import verbosity1
+
+from tox_pip_sync._cache import CompileCache
+from tox_pip_sync._pins import pinned_by_references
+from tox_pip_sync._pip_sync import previous_pinned_content, requirements_hash
+from tox_pip_sync._requirements import RequirementList
+from tox_pip_sync._timing import TIMINGS
+from tox_pip_sync._tool_env import ToolEnv
+
+
+class BackgroundCompile:
+    """Compile requirements into the compile cache in a background thread.
+
+    When an env is (re)created, the requirements don't depend on the new
+    virtual env, so we can compile them while `virtualenv` runs. The result
+    goes into the compile cache, where installing the deps will find it.
+    """
+
+    def __init__(self, venv, requirements, cache, tool_env):
+        """Initialize a BackgroundCompile object.
+
+        :param venv: The tox virtual env to compile for
+        :param requirements: The `RequirementList` to compile
+        :param cache: The `CompileCache` to store the result in
+        :param tool_env: The `ToolEnv` to run `pip-compile` from
+        """
+        self.venv = venv
+        self.requirements = requirements
+        self.cache = cache
+        self.tool_env = tool_env
+
+        # Somewhere next to the env, so relative paths are the same as they
+        # would be in the env, but which isn't removed when it's recreated
+        self.work_dir = Path(venv.path.dirpath()) / f".tox-pip-sync-{venv.name}"
+
+        self.error = None
+        self._thread = None
+
+    @classmethod
+    def start(cls, venv):
+        """Start compiling the requirements for an env if we can.
+
+        We only compile in the background when the shared `pip-tools` env
+        already exists and the result isn't in the compile cache yet.
+
+        :param venv: The tox virtual env to compile for
+        :return: A running `BackgroundCompile` or None
+        """
+        config = venv.envconfig.config.tox_pip_sync
+        if not config["background_compile"]:
+            return None
+
+        cache = CompileCache.for_venv(venv)
+        tool_env = ToolEnv.for_venv(venv)
+        if not cache or not tool_env or not tool_env.python.exists():
+            return None
+
+        requirements = RequirementList.from_strings(
+            (dep.name for dep in venv.envconfig.deps)
+        )
+        if not requirements.needs_compilation or pinned_by_references(
+            requirements, venv.envconfig.config.toxinidir
+        ):
+            return None
+
+        background = cls(venv, requirements, cache, tool_env)
+        if background.cache_key in cache:
+            return None
+
+        # Read this now, before the old env is removed
+        seed = previous_pinned_content(venv)
+        # Use the env's settings, so `pip` goes to any index set for it
+        env = venv._get_os_environ()  # pylint: disable=protected-access
+
+        verbosity1("Compiling dependencies in the background")
+        background._thread = threading.Thread(
+            target=background._run, args=(seed, env), daemon=True
+        )
+        background._thread.start()
+        return background
+
+    @property
+    def cache_key(self):
+        """Get the compile cache key for these requirements."""
+
+        return self.cache.key(
+            requirements_hash(self.venv, self.requirements), self.venv
+        )
+
+    def join(self):
+        """Wait for the compile to finish.
+
+        Any error is reported, but not raised, as the requirements will be
+        compiled again in the usual way if they aren't in the cache.
+        """
+        self._thread.join()
+
+        if self.error:
+            verbosity1(f"Compiling dependencies in the background failed: {self.error}")
+
+    def _run(self, seed, env):
+        root_dir = self.venv.envconfig.config.setupdir
+        relative_root = Path(relpath(root_dir, self.work_dir))
+
+        # pylint: disable=broad-exception-caught
+        with TIMINGS.phase("background-compile", self.venv):
+            try:
+                compile_into_cache(
+                    self.cache,
+                    self.cache_key,
+                    command=self.tool_env.command("pip-compile", self.venv),
+                    unpinned="\n".join(
+                        str(dep)
+                        for dep in self.requirements.constrained_set(relative_root)
+                    ),
+                    work_dir=self.work_dir,
+                    cwd=self.venv.envconfig.config.toxinidir,
+                    root_dir=root_dir,
+                    seed=seed,
+                    env=env,
+                )
+            except Exception as err:
+                self.error = err
+
+
+def compile_into_cache(  # pylint: disable=too-many-arguments
+    cache, key, *, command, unpinned, work_dir, cwd, root_dir, seed=None, env=None
+):
+    """Run `pip-compile` and store the result in the compile cache.
+
+    This doesn't need tox, so it can be run in another thread or process.
+
+    :param cache: The `CompileCache` to store the result in
+    :param key: The key to store the result against
+    :param command: The command to run `pip-compile`
+    :param unpinned: The contents of the requirements file to compile
+    :param work_dir: A directory to compile in, which is removed afterwards.
+        Any relative paths in `unpinned` should be relative to this.
+    :param cwd: The directory to run `pip-compile` in
+    :param root_dir: The project root, so the result can be relocated
+    :param seed: The contents of a previously compiled file to start from
+    :param env: The environment variables to run `pip-compile` with, so it
+        uses the same settings (like the index) as the env would
+    :raises subprocess.CalledProcessError: If `pip-compile` fails
+    """
+    with _temporary_dir(work_dir) as path:
+        unpinned_file = path / "requirements.in"
+        unpinned_file.write_text(unpinned, encoding="utf-8")
+
+        pinned = unpinned_file.with_suffix(".txt")
+        if seed:
+            pinned.write_text(seed, encoding="utf-8")
+
+        # Only one process compiles a set of requirements at a time
+        with cache.lock(key):
+            if key in cache:
+                return
+
+            subprocess.run(
+                command + [str(unpinned_file)],
+                cwd=cwd,
+                env=env,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                check=True,
+            )
+            cache.put(key, pinned, root_dir=root_dir)
+
+
+@contextmanager
+def _temporary_dir(path):
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+
+    try:
+        yield path
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,221 @@
+import os
+import re
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from filelock import FileLock, Timeout
+from tox.reporter import verbosity1
+
+ROOT_PLACEHOLDER = "${TOX_PIP_SYNC_ROOT}"
+
+
+class CompileCache:
+    """A user level cache of compiled requirements shared between envs.
+
+    Compiled files are stored by the hash of the requirements which created
+    them and the Python they were compiled with, so any virtual env in
+    any checkout with the same requirements can re-use them.
+    """
+
+    MAX_AGE = 30 * 24 * 60 * 60  # 30 days in seconds
+    MAX_SIZE = 50 * 1024 * 1024  # 50Mb
+
+    def __init__(self, path, max_age=MAX_AGE, max_size=MAX_SIZE):
+        """Initialize a CompileCache object.
+
+        :param path: The directory to store the cache in
+        :param max_age: Remove entries not used for this many seconds
+        :param max_size: Remove the least recently used entries to keep the
+            cache under this many bytes
+        """
+        self.path = Path(path)
+        self.max_age = max_age
+        self.max_size = max_size
+
+    @classmethod
+    def for_venv(cls, venv):
+        """Get the cache configured for a virtual env, or None if disabled."""
+
+        config = venv.envconfig.config.tox_pip_sync
+        if not config["compile_cache"]:
+            return None
+
+        return cls(cache_dir(venv))
+
+    @staticmethod
+    def key(requirements_hash, venv):
+        """Get the key for a set of requirements compiled for a virtual env."""
+
+        return f"{requirements_hash}-{python_tag(venv)}"
+
+    def lock(self, key):
+        """Get a context manager which holds a lock on a key between processes.
+
+        :param key: The key to lock (see `CompileCache.key()`)
+        """
+        return exclusive(
+            self.path / "locks" / f"{key}.lock",
+            waiting_message="Waiting for another env to compile the same dependencies",
+        )
+
+    def __contains__(self, key):
+        """Check if a key is in the cache without reading it."""
+
+        return self._entry(key).exists()
+
+    def get(self, key, target, root_dir):
+        """Copy a compiled file from the cache if present.
+
+        :param key: The key to retrieve (see `CompileCache.key()`)
+        :param target: The file to write to
+        :param root_dir: The project root to relocate the file to
+        :return: True if the file was found, False otherwise
+        """
+        entry = self._entry(key)
+        try:
+            content = entry.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return False
+
+        # Mark this as recently used for eviction
+        entry.touch()
+
+        Path(target).write_text(relocate(content, root_dir), encoding="utf-8")
+        return True
+
+    def put(self, key, source, root_dir):
+        """Store a compiled file in the cache.
+
+        :param key: The key to store against (see `CompileCache.key()`)
+        :param source: The compiled file to store
+        :param root_dir: The project root the file was compiled in
+        """
+        self.put_relocatable(
+            key, make_relocatable(Path(source).read_text(encoding="utf-8"), root_dir)
+        )
+
+    def put_relocatable(self, key, content):
+        """Store compiled requirements which have already been made relocatable.
+
+        :param key: The key to store against (see `CompileCache.key()`)
+        :param content: The compiled requirements, with the project root
+            replaced (see `make_relocatable()`)
+        """
+        entry = self._entry(key)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write and then rename, so other processes never see a partial file
+        partial = entry.with_name(f"{entry.name}.{os.getpid()}.partial")
+        partial.write_text(content, encoding="utf-8")
+        os.replace(partial, entry)
+
+        self.evict()
+
+    def evict(self):
+        """Remove old entries and keep the cache under the maximum size."""
+
+        entries = []
+        for entry in (self.path / "compiled").glob("*.txt"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:  # pragma: no cover
+                # Another process got here first
+                continue
+
+            entries.append((stat.st_mtime, stat.st_size, entry))
+
+        # Oldest first
+        entries.sort()
+        total_size = sum(size for _, size, _ in entries)
+        cut_off = time.time() - self.max_age
+
+        for mtime, size, entry in entries:
+            if mtime > cut_off and total_size <= self.max_size:
+                break
+
+            entry.unlink(missing_ok=True)
+            total_size -= size
+
+    def _entry(self, key):
+        return self.path / "compiled" / f"{key}.txt"
+
+
+@contextmanager
+def exclusive(lock_file, waiting_message):
+    """Hold a lock on a file, so only one process can continue at a time.
+
+    :param lock_file: The file to lock on
+    :param waiting_message: A message to show if another process holds the
+        lock, and we have to wait for it
+    """
+    lock_file = Path(lock_file)
+    lock_file.parent.mkdir(parents=True, exist_ok=True)
+    lock = FileLock(str(lock_file))
+
+    try:
+        lock.acquire(timeout=0)
+    except Timeout:
+        verbosity1(waiting_message)
+        lock.acquire()
+
+    try:
+        yield
+    finally:
+        lock.release()
+
+
+def default_cache_dir():
+    """Get the default location for our user level caches."""
+
+    cache_home = os.environ.get("XDG_CACHE_HOME")
+    if not cache_home:
+        cache_home = Path.home() / ".cache"
+
+    return Path(cache_home) / "tox-pip-sync"
+
+
+def cache_dir(venv):
+    """Get the location for our user level caches configured for a venv."""
+
+    return config_cache_dir(venv.envconfig.config.tox_pip_sync)
+
+
+def config_cache_dir(config):
+    """Get the location for our user level caches from our config.
+
+    :param config: Our config, as returned by `load_config()`
+    """
+    return Path(config["cache_dir"] or default_cache_dir())
+
+
+def python_tag(venv):
+    """Get the Python implementation and version for a venv like `cpython3.9`.
+
+    Requirements can resolve differently for other implementations (through
+    markers like `platform_python_implementation`), so anything we share
+    between envs is kept apart by this.
+    """
+    python_info = venv.envconfig.python_info
+    major, minor = python_info.version_info[:2]
+    return f"{python_info.implementation.lower()}{major}.{minor}"
+
+
+def make_relocatable(text, root_dir):
+    """Replace references to the project root with a placeholder.
+
+    `pip-compile` will write absolute paths to local projects into the files
+    it creates. This allows us to share them between checkouts.
+    """
+    return _root_pattern(root_dir).sub(ROOT_PLACEHOLDER, text)
+
+
+def relocate(text, root_dir):
+    """Replace the project root placeholder with a real location."""
+
+    return text.replace(ROOT_PLACEHOLDER, str(root_dir))
+
+
+def _root_pattern(root_dir):
+    # Only match the whole path, so `/project` doesn't match `/project-2`
+    return re.compile(re.escape(str(root_dir)) + r"(?=[/\\\s#\[;]|$)", re.MULTILINE)
@@ -0,0 +1,226 @@
+import sys
+import tarfile
+from argparse import ArgumentParser
+from pathlib import Path
+
+from tox.config import parseconfig
+from tox.exception import ConfigError
+
+from tox_pip_sync._archive import export_archive, import_archive
+from tox_pip_sync._config import default_config
+from tox_pip_sync._events import event_log_file, event_log_files, read_events, summarise
+from tox_pip_sync._precompile import Precompile
+
+
+def main(argv=None):
+    """Run the `tox-pip-sync` command line tool.
+
+    :param argv: The command line arguments (default: `sys.argv`)
+    :return: The exit code
+    """
+    parser = ArgumentParser(prog="tox-pip-sync")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    compile_parser = subparsers.add_parser(
+        "compile",
+        help="Compile the dependencies for every env into the compile cache",
+        description="Compile the dependencies for every env into the compile "
+        "cache, so tox can install them without running `pip-compile`. Envs "
+        "with the same dependencies are only compiled once.",
+    )
+    compile_parser.add_argument(
+        "-c", "--configfile", help="The tox config file to use (default: tox.ini)"
+    )
+    compile_parser.add_argument(
+        "-e",
+        "--envs",
+        help="A comma separated list of envs to compile (default: the envlist)",
+    )
+    compile_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        help="How many envs to compile at once (default: the number of CPUs)",
+    )
+    compile_parser.set_defaults(func=compile_command)
+
+    stats_parser = subparsers.add_parser(
+        "stats",
+        help="Show how often envs skip, recompile or resync and why",
+        description="Show how often envs skip, recompile or resync, why, and "
+        "roughly how much time the caches have saved, from the event log. "
+        "The time saved is estimated from how long the same env took when it "
+        "couldn't use the cache.",
+    )
+    stats_parser.add_argument(
+        "-f",
+        "--file",
+        action="append",
+        dest="files",
+        help="An event log to read. Can be given more than once to combine "
+        f"logs from many machines (default: {event_log_file(default_config())}, "
+        "or the one in the project's cache dir with -c)",
+    )
+    stats_parser.add_argument(
+        "-c",
+        "--configfile",
+        help="A tox config file, to read the event log from the cache dir it "
+        "sets (like tox.ini)",
+    )
+    stats_parser.set_defaults(func=stats_command)
+
+    export_parser = subparsers.add_parser(
+        "export",
+        help="Save the compiled requirements from every env into an archive",
+        description="Save the compiled requirements from every env into an "
+        "archive, which can be imported into another checkout (like on a CI "
+        "runner) so tox doesn't need to compile them again.",
+    )
+    export_parser.add_argument("archive", help="The archive to create (.tar.gz)")
+    export_parser.add_argument(
+        "-c", "--configfile", help="The tox config file to use (default: tox.ini)"
+    )
+    export_parser.set_defaults(func=export_command)
+
+    import_parser = subparsers.add_parser(
+        "import",
+        help="Load compiled requirements from an archive into the compile cache",
+        description="Load compiled requirements from an archive made with "
+        "`tox-pip-sync export` into the compile cache, where tox will find "
+        "them when it creates the envs.",
+    )
+    import_parser.add_argument("archive", help="The archive to import")
+    import_parser.add_argument(
+        "-c", "--configfile", help="The tox config file to use (default: tox.ini)"
+    )
+    import_parser.set_defaults(func=import_command)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+def compile_command(args):
+    """Compile the requirements for many envs into the compile cache."""
+
+    try:
+        precompile, jobs = _precompile_jobs(args)
+    except ConfigError as err:
+        print(f"tox-pip-sync: {err}", file=sys.stderr)
+        return 1
+
+    if not jobs:
+        print("Nothing to compile")
+        return 0
+
+    print(f"Compiling {len(jobs)} unique set(s) of dependencies")
+    failed = False
+    for _, venvs, error in precompile.run(jobs, max_workers=args.jobs):
+        env_names = ", ".join(venv.name for venv in venvs)
+        if error:
+            failed = True
+            print(f"Failed to compile {env_names}: {error}", file=sys.stderr)
+        else:
+            print(f"Compiled {env_names}")
+
+    return 1 if failed else 0
+
+
+def _precompile_jobs(args):
+    precompile = Precompile(_tox_config(args))
+    return precompile, precompile.jobs(args.envs.split(",") if args.envs else None)
+
+
+def export_command(args):
+    """Export the compiled requirements for every env to an archive."""
+
+    exported = export_archive(_tox_config(args), args.archive)
+    for env_names in exported.values():
+        print(f"Exported {', '.join(env_names)}")
+
+    print(f"Wrote {len(exported)} compiled file(s) to '{args.archive}'")
+    return 0
+
+
+def import_command(args):
+    """Import compiled requirements from an archive into the compile cache."""
+
+    try:
+        imported = import_archive(_tox_config(args), args.archive)
+    except (ConfigError, OSError, ValueError, tarfile.TarError) as err:
+        print(
+            f"tox-pip-sync: Could not import '{args.archive}': {err}", file=sys.stderr
+        )
+        return 1
+
+    print(f"Imported {len(imported)} compiled file(s) into the compile cache")
+    return 0
+
+
+def stats_command(args):
+    """Print a summary of the decisions in event logs."""
+
+    try:
+        events = list(read_events(_event_log_files(args)))
+    except OSError as err:
+        print(f"tox-pip-sync: Could not read event log: {err}", file=sys.stderr)
+        return 1
+
+    if not events:
+        print("No events recorded yet")
+        return 0
+
+    _print_summary(
+        "env",
+        summarise(
+            events, key=lambda event: f"{Path(event['project']).name}:{event['env']}"
+        ),
+    )
+    print()
+    _print_summary(
+        "decision",
+        summarise(
+            events,
+            key=lambda event: f"{event['kind']} {event['outcome']} ({event['reason']})",
+        ),
+    )
+    return 0
+
+
+def _event_log_files(args):
+    if args.files:
+        return args.files
+
+    if not args.configfile:
+        return event_log_files(default_config())
+
+    # Runs write to the cache dir set for the project, which our
+    # `tox_configure` hook reads into the config
+    return event_log_files(_tox_config(args).tox_pip_sync)  # pylint: disable=no-member
+
+
+def _tox_config(args):
+    return parseconfig(["-c", args.configfile] if args.configfile else [])
+
+
+def _print_summary(title, summary):
+    rows = [(title, "count", "hits", "hit rate", "spent", "saved")]
+    for name, totals in sorted(summary.items()):
+        rows.append(
+            (
+                name,
+                str(totals["count"]),
+                str(totals["hits"]),
+                f"{totals['hits'] / totals['count']:.0%}",
+                f"{totals['spent']:.1f}s",
+                f"{totals['saved']:.1f}s",
+            )
+        )
+
+    widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+    for row in rows:
+        print(
+            "  ".join(
+                [row[0].ljust(widths[0])]
+                + [cell.rjust(width) for cell, width in zip(row[1:], widths[1:])]
+            )
+        )
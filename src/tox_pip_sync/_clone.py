@@ -0,0 +1,129 @@
+import os
+import shutil
+from pathlib import Path
+
+from tox.reporter import verbosity1
+
+from tox_pip_sync._cache import python_tag
+from tox_pip_sync._env_data import EnvData
+from tox_pip_sync._installed import canonical_name, site_packages_dir
+
+# From `linux/fs.h`: clone a file sharing the same blocks on disk
+FICLONE = 0x40049409
+
+
+def clone_matching_env(venv, requirements_hash):
+    """Copy installed packages from another env with the same requirements.
+
+    We look for another env in the same tox work dir which was last synced
+    with the same hash and Python executable, and copy the contents of its
+    `site-packages` and any scripts into this one. Files are reflinked or
+    hardlinked where the file system allows, so this is much quicker than
+    installing everything again.
+
+    :param venv: The tox virtual env to populate
+    :param requirements_hash: The hash of the requirements for this env
+    :return: True if a matching env was found and copied
+    """
+    target_packages = site_packages_dir(venv.path)
+    if not target_packages:
+        return False
+
+    template = _find_template(venv, requirements_hash)
+    if not template:
+        return False
+
+    verbosity1(f"Copying installed packages from matching env: '{template}'")
+    _copy_site_packages(site_packages_dir(template), target_packages)
+    _copy_scripts(template, Path(venv.path))
+
+    return True
+
+
+def _find_template(venv, requirements_hash):
+    venv_path = Path(venv.path)
+    # Installed packages can contain extension modules, which only work with
+    # the same build of Python (not just the same version). So the env must
+    # have been created from the same executable.
+    python = (python_tag(venv), str(venv.envconfig.python_info.executable))
+
+    for candidate in sorted(venv_path.parent.iterdir()):
+        if candidate == venv_path or not site_packages_dir(candidate):
+            continue
+
+        env_data = EnvData(candidate)
+        if (
+            env_data.last_hash == requirements_hash
+            and (env_data.python, env_data.interpreter) == python
+        ):
+            return candidate
+
+    return None
+
+
+def _copy_site_packages(source, target):
+    # Leave anything the new env already has alone (like its own `pip`)
+    existing = {canonical_name(name.split("-")[0]) for name in os.listdir(target)}
+
+    for entry in source.iterdir():
+        if canonical_name(entry.name.split("-")[0]) in existing:
+            continue
+
+        if entry.is_dir() and not entry.is_symlink():
+            shutil.copytree(entry, target / entry.name, copy_function=clone_file)
+        else:
+            clone_file(entry, target / entry.name)
+
+
+def _copy_scripts(source_venv, target_venv):
+    source_bin, target_bin = source_venv / "bin", target_venv / "bin"
+    if not source_bin.is_dir():  # pragma: no cover
+        # Windows launchers have the path built in, so we can't copy them
+        return
+
+    old_shebang = f"#!{source_bin / 'python'}".encode("utf-8")
+    new_shebang = f"#!{target_bin / 'python'}".encode("utf-8")
+
+    for script in source_bin.iterdir():
+        target = target_bin / script.name
+        if target.exists() or not script.is_file():
+            continue
+
+        with open(script, "rb") as handle:
+            content = handle.read()
+
+        # Only copy scripts installed by packages, which point to the env
+        if not content.startswith(old_shebang):
+            continue
+
+        target.write_bytes(new_shebang + content[len(old_shebang) :])
+        shutil.copymode(script, target)
+
+
+def clone_file(source, target):
+    """Copy a file as cheaply as the file system allows.
+
+    This tries a copy-on-write clone (reflink), then a hardlink, and finally
+    falls back to a plain copy.
+    """
+    try:
+        _reflink(source, target)
+    except (ImportError, OSError):
+        if os.path.lexists(target):
+            os.unlink(target)
+    else:
+        return
+
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target, follow_symlinks=False)
+
+
+def _reflink(source, target):
+    import fcntl  # pylint: disable=import-outside-toplevel
+
+    with open(source, "rb") as source_handle, open(target, "wb") as target_handle:
+        fcntl.ioctl(target_handle.fileno(), FICLONE, source_handle.fileno())
+
+    shutil.copystat(source, target)
@@ -1,67 +1,126 @@
+import json
+import os
 from configparser import ConfigParser
+from contextlib import suppress
+from pathlib import Path
 
-import toml
+from tox.exception import ConfigError
 
-TYPED_OPTIONS = {
+OPTIONS = {
     # Option name:  (type, default)
-    "skip_listing": (bool, True)
+    "skip_listing": (bool, True),
+    "enable_hashing": (bool, True),
+    "compile_cache": (bool, True),
+    "cache_dir": (str, None),
+    "in_process_sync": (bool, True),
+    "shared_tool_env": (bool, True),
+    "wheelhouse": (bool, False),
+    "clone_envs": (bool, False),
+    "trace_file": (str, None),
+    "raw_file_hashing": (bool, False),
+    "background_compile": (bool, True),
+    "resolver_daemon": (bool, False),
+    "event_log": (bool, True),
 }
 
+# Where we remember our settings from `pyproject.toml` in the tox work dir
+PYPROJECT_CACHE = "tox-pip-sync-pyproject.json"
 
-def load_config(project_dir):
-    """Load our config for a particular project."""
 
-    config = IniConfig.parse(project_dir / "tox.ini")
-    config.update(_parse_toml(project_dir))
+def default_config():
+    """Get our config with every option set to the default."""
+
+    return {name: default for name, (_, default) in OPTIONS.items()}
+
+
+def load_config(tox_config):
+    """Load our config for a particular project.
+
+    Options are read from the tox ini file (as already parsed by tox) and
+    `pyproject.toml`, which takes precedence. Every option is present in the
+    result, using the default if it's not set.
+
+    :param tox_config: The tox `Config` object for the project
+    :return: A dict of option name to value
+    :raises ConfigError: If there are unknown options or values of the wrong
+        type
+    """
+    config = default_config()
+    config.update(_read_ini(tox_config))
+    config.update(
+        _read_pyproject(
+            Path(tox_config.setupdir) / "pyproject.toml",
+            cache_file=Path(tox_config.toxworkdir) / PYPROJECT_CACHE,
+        )
+    )
 
     return config
 
 
-def _parse_toml(project_dir):
-    project_file = project_dir / "pyproject.toml"
-    if not project_file.exists():
-        return {}
+def _read_ini(tox_config):
+    # tox puts all of its sections under `tox:` when using `setup.cfg`
+    ini_file = Path(tox_config.toxinipath).name
+    section = "tox:tox_pip_sync" if ini_file == "setup.cfg" else "tox_pip_sync"
 
-    toml_config = toml.load(project_file)
+    # pylint: disable=protected-access
+    values = tox_config._cfg.sections.get(section, {})
 
+    return _validate(values, source=ini_file, from_ini=True)
+
+
+def _read_pyproject(project_file, cache_file):
     try:
-        return toml_config["tool"]["tox"]["tox_pip_sync"]
-    except KeyError:
+        stat = os.stat(project_file)
+    except FileNotFoundError:
         return {}
 
+    # If the file looks the same as last time, use what we found then. This
+    # saves reading and parsing the whole file on every run.
+    stat = [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+    try:
+        cached = json.loads(cache_file.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        cached = {}
+
+    if cached.get("path") == str(project_file) and cached.get("stat") == stat:
+        return cached["values"]
+
+    # Most runs of tox don't need this, so only import it when we do
+    import toml  # pylint: disable=import-outside-toplevel
 
-class IniConfig:
-    """Load settings from a tox.ini file."""
+    table = toml.load(project_file).get("tool", {}).get("tox", {})
+    values = _validate(table.get("tox_pip_sync", {}), source="pyproject.toml")
 
-    # pylint: disable=too-few-public-methods
+    # We can manage without the cache if we can't write it
+    with suppress(OSError):
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        cache_file.write_text(
+            json.dumps({"path": str(project_file), "stat": stat, "values": values}),
+            encoding="utf-8",
+        )
 
-    @classmethod
-    def parse(cls, file_name):
-        """Load settings from a tox.ini file."""
+    return values
 
-        parser = ConfigParser()
-        parser.read(file_name)
 
-        if "tox_pip_sync" not in parser:
-            return {}
+def _validate(values, source, from_ini=False):
+    validated = {}
 
-        values = dict(parser["tox_pip_sync"])
-        cls._coerce_values(values)
+    for name, value in values.items():
+        if name not in OPTIONS:
+            raise ConfigError(f"Unknown tox-pip-sync option '{name}' in {source}")
 
-        return values
+        target_type, _ = OPTIONS[name]
+        if from_ini and target_type is bool:
+            # INI files only have strings, so convert them the way
+            # `ConfigParser.getboolean()` would
+            value = ConfigParser.BOOLEAN_STATES.get(value.lower(), value)
 
-    @classmethod
-    def _coerce_values(cls, values):
-        # TOML has sane type handling, so this is only necessary for INI files
-        for key, (target_type, default) in TYPED_OPTIONS.items():
-            if key in values:
-                values[key] = cls._convert_ini_type(values[key], target_type, default)
+        if not isinstance(value, target_type):
+            raise ConfigError(
+                f"The tox-pip-sync option '{name}' in {source} should be a "
+                f"{target_type.__name__}, not: {value!r}"
+            )
 
-    @classmethod
-    def _convert_ini_type(cls, value, target_type, default):
-        if target_type == bool:
-            # This is handy data, but no nice way to access them as we want to
-            # We don't want to deal with `ConfigParser`'s section objects.
-            return ConfigParser.BOOLEAN_STATES.get(value, default)
+        validated[name] = value
 
-        return value  # pragma: no cover
+    return validated
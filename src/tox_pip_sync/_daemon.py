@@ -0,0 +1,154 @@
+import json
+import socket
+import subprocess
+import time
+from pathlib import Path
+
+from tox.reporter import verbosity1
+
+from tox_pip_sync import _resolver_server
+from tox_pip_sync._cache import exclusive
+
+
+class ResolverDaemon:
+    """A long running process to run `pip-tools` commands in.
+
+    Starting Python and importing `pip-tools` (and `pip`) takes a noticeable
+    amount of time for every command. The daemon does this once, and then
+    runs commands for any env using the same shared tool env. It's started
+    the first time it's needed and exits by itself when it's been idle for
+    a while.
+    """
+
+    # How long the daemon waits for a request before exiting
+    IDLE_TIMEOUT = 600
+
+    # How long we wait for a new daemon to start listening
+    START_TIMEOUT = 30
+
+    # Unix sockets have a short maximum path length (104 bytes on macOS)
+    MAX_SOCKET_PATH = 100
+
+    def __init__(self, tool_env, socket_path):
+        """Initialize a ResolverDaemon object.
+
+        :param tool_env: The `ToolEnv` to run the daemon with
+        :param socket_path: The Unix socket the daemon listens on
+        """
+        self.tool_env = tool_env
+        self.socket_path = Path(socket_path)
+
+    @classmethod
+    def for_venv(cls, venv, tool_env):
+        """Get the daemon to use for a virtual env, or None if disabled.
+
+        :param venv: The tox virtual env to run commands for
+        :param tool_env: The shared `ToolEnv` for the env (if any)
+        """
+        config = venv.envconfig.config.tox_pip_sync
+        if (
+            not config["resolver_daemon"]
+            or not tool_env
+            or not hasattr(socket, "AF_UNIX")
+        ):
+            return None
+
+        socket_path = tool_env.path.with_name(f"{tool_env.path.name}.sock")
+        if len(str(socket_path)) > cls.MAX_SOCKET_PATH:
+            verbosity1(
+                f"Not using the resolver daemon, path is too long: {socket_path}"
+            )
+            return None
+
+        return cls(tool_env, socket_path)
+
+    def run(self, arguments, cwd, env):
+        """Run a `pip-tools` command in the daemon.
+
+        :param arguments: The arguments for `pip-tools`, like
+            `["compile", "requirements.in"]`
+        :param cwd: The directory to run the command in
+        :param env: The environment variables to run the command with
+        :return: A tuple of the exit code and output of the command, or None
+            if the daemon couldn't be reached
+        """
+        connection = self._connect()
+        if not connection:
+            return None
+
+        request = {"args": arguments, "cwd": str(cwd), "env": env}
+        try:
+            response = self._send(connection, request)
+        except (OSError, ValueError) as err:
+            # The daemon went away (or timed out) part way through
+            verbosity1(f"Resolver daemon failed: {err}")
+            return None
+
+        return response["returncode"], response["output"]
+
+    @staticmethod
+    def _send(connection, request):
+        with connection, connection.makefile("rwb") as stream:
+            stream.write(json.dumps(request).encode("utf-8") + b"\n")
+            stream.flush()
+            return json.loads(stream.readline())
+
+    def _connect(self):
+        connection = self._try_connect()
+        if connection:
+            return connection
+
+        lock_file = self.socket_path.with_name(f"{self.socket_path.name}.lock")
+        with exclusive(lock_file, "Waiting for another env to start resolver daemon"):
+            # Another process may have started it while we were waiting
+            connection = self._try_connect()
+            if not connection:
+                connection = self._start()
+
+        return connection
+
+    def _try_connect(self):
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            connection.connect(str(self.socket_path))
+        except OSError:
+            connection.close()
+            return None
+
+        return connection
+
+    def _start(self):
+        verbosity1(f"Starting resolver daemon: '{self.socket_path}'")
+
+        # Anything left here is from a daemon which didn't exit cleanly, and
+        # nothing can connect to it
+        self.socket_path.unlink(missing_ok=True)
+
+        process = subprocess.Popen(  # pylint: disable=consider-using-with
+            [
+                str(self.tool_env.python),
+                _resolver_server.__file__,
+                str(self.socket_path),
+                "--idle-timeout",
+                str(self.IDLE_TIMEOUT),
+            ],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            # Don't get killed along with this tox run
+            start_new_session=True,
+        )
+
+        deadline = time.monotonic() + self.START_TIMEOUT
+        while time.monotonic() < deadline:
+            connection = self._try_connect()
+            if connection:
+                return connection
+
+            if process.poll() is not None:
+                break
+
+            time.sleep(0.05)
+
+        verbosity1("Resolver daemon didn't start, running pip-tools directly")
+        return None
@@ -0,0 +1,57 @@
+import json
+from functools import lru_cache
+
+
+class EnvData:
+    """Class for accessing data stored in a testenv by and for tox-pip-sync."""
+
+    def __init__(self, venv_path):
+        """Initialize an EnvData object.
+
+        :param venv_path: The path to the root of the virtual env.
+        """
+        self.path = venv_path / "tox-pip-sync.json"
+
+    @property
+    def last_hash(self):
+        """Get the last hash stored in the data."""
+
+        return self._load().get("hash")
+
+    @property
+    def sources(self):
+        """Get the details of the files read to create the last hash."""
+
+        return self._load().get("sources", {})
+
+    @property
+    def site_packages(self):
+        """Get the fingerprint of the installed packages after the last sync."""
+
+        return self._load().get("site_packages")
+
+    @property
+    def python(self):
+        """Get the Python version the env was last synced with."""
+
+        return self._load().get("python")
+
+    @property
+    def interpreter(self):
+        """Get the Python executable the env was last synced with."""
+
+        return self._load().get("interpreter")
+
+    def save(self, requirements_hash, **extra):
+        """Save the hash, along with any extra data provided."""
+
+        self.path.write_text(
+            json.dumps({"hash": requirements_hash, **extra}), encoding="utf-8"
+        )
+
+    @lru_cache(1)
+    def _load(self):
+        if not self.path.exists():
+            return {}
+
+        return json.loads(self.path.read_text(encoding="utf-8"))
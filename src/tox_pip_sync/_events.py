@@ -0,0 +1,172 @@
+import json
+import os
+import time
+from contextlib import contextmanager, suppress
+from pathlib import Path
+
+from tox_pip_sync._cache import config_cache_dir
+
+# Where the event log goes in our cache dir
+EVENT_LOG = "events.jsonl"
+
+# How big the event log gets before we start a new one. The previous log is
+# kept (with `.1` on the end), so there are never more than two.
+MAX_LOG_SIZE = 5 * 1024 * 1024
+
+# Outcomes where we avoided the expensive thing for each kind of decision
+HITS = {
+    "sync": ("skip", "reinstall-local"),
+    "compile": ("reuse", "skip", "cache-hit"),
+    "bootstrap": (),
+}
+
+
+class EventLog:
+    """A record of the decisions we make for each env.
+
+    Like whether we skipped syncing an env and why, or where the compiled
+    requirements came from. These are appended to a log after each run, so
+    we can see how often the caches are used over time.
+    """
+
+    def __init__(self):
+        """Initialize an EventLog object."""
+        self.events = []
+
+    @contextmanager
+    def decision(self, kind, venv):
+        """Record a decision made in this block, and how long it took.
+
+        The block should fill in the `outcome` and `reason` of the event this
+        yields. Nothing is recorded if there's no outcome, or it raises.
+
+        :param kind: The kind of decision (like `sync` or `compile`)
+        :param venv: The tox virtual env this is happening for
+        """
+        event = {
+            "kind": kind,
+            "outcome": None,
+            "reason": None,
+            "env": venv.name,
+            "project": str(venv.envconfig.config.toxinidir),
+            "time": round(time.time(), 3),
+        }
+        counter = time.perf_counter()
+
+        yield event
+
+        if event["outcome"]:
+            event["duration"] = round(time.perf_counter() - counter, 3)
+            self.events.append(event)
+
+    def write(self, filename):
+        """Append the events to a JSON lines file.
+
+        If the file has grown past `MAX_LOG_SIZE`, it's moved aside first and
+        a new one is started.
+
+        :param filename: The file to write to
+        """
+        filename = Path(filename)
+        filename.parent.mkdir(parents=True, exist_ok=True)
+
+        # There might not be a log yet, or a parallel run might have just
+        # moved it, in which case there's nothing to do
+        with suppress(FileNotFoundError):
+            if filename.stat().st_size >= MAX_LOG_SIZE:
+                os.replace(filename, rotated_log_file(filename))
+
+        # Write in one go, so parallel runs don't interleave their lines
+        with open(filename, "a", encoding="utf-8") as handle:
+            handle.write("".join(json.dumps(event) + "\n" for event in self.events))
+
+
+def event_log_file(config):
+    """Get the event log file for our config.
+
+    :param config: Our config, as returned by `load_config()`
+    """
+    return config_cache_dir(config) / EVENT_LOG
+
+
+def event_log_files(config):
+    """Get the current and any previous event log for our config, oldest first.
+
+    :param config: Our config, as returned by `load_config()`
+    :return: A list of files, which always includes the current log
+    """
+    filename = event_log_file(config)
+    rotated = rotated_log_file(filename)
+
+    return [rotated, filename] if rotated.exists() else [filename]
+
+
+def rotated_log_file(filename):
+    """Get where an event log is moved to when a new one is started."""
+
+    return filename.with_name(f"{filename.name}.1")
+
+
+def read_events(filenames):
+    """Read the events from event log files.
+
+    Lines which can't be read (like from a run which was killed part way
+    through writing) are skipped.
+
+    :param filenames: The files to read
+    :return: A generator of event dicts
+    """
+    for filename in filenames:
+        with open(filename, encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def summarise(events, key):
+    """Add up how often we avoided work, and how long it took.
+
+    The time saved by a hit is estimated from the average time taken when the
+    same kind of decision for the same env in the same project wasn't a hit.
+
+    :param events: An iterable of event dicts
+    :param key: A function to get the group (like the env name) for an event
+    :return: A dict of group to a dict with the `count`, `hits`, `spent` and
+        `saved` (in seconds) for that group
+    """
+    events = list(events)
+    misses = {}
+    for event in events:
+        if not _is_hit(event):
+            misses.setdefault(_target(event), []).append(event["duration"])
+
+    summary = {}
+    for event in events:
+        totals = summary.setdefault(
+            key(event), {"count": 0, "hits": 0, "spent": 0.0, "saved": 0.0}
+        )
+        totals["count"] += 1
+        totals["spent"] += event["duration"]
+
+        if _is_hit(event):
+            totals["hits"] += 1
+            durations = misses.get(_target(event))
+            if durations:
+                average = sum(durations) / len(durations)
+                totals["saved"] += max(0.0, average - event["duration"])
+
+    return summary
+
+
+def _is_hit(event):
+    return event["outcome"] in HITS.get(event["kind"], ())
+
+
+def _target(event):
+    return event["project"], event["env"], event["kind"]
+
+
+# The decisions made in this run of tox
+EVENTS = EventLog()
@@ -0,0 +1,238 @@
+import os
+import re
+from email.parser import HeaderParser
+from glob import glob
+from hashlib import blake2b
+from pathlib import Path
+
+from tox.reporter import verbosity1
+
+from tox_pip_sync._requirements import PipRequirement, RequirementList
+
+# The same packages `pip-sync` will never uninstall
+PACKAGES_TO_IGNORE = (
+    "-markerlib",
+    "pip",
+    "pip-tools",
+    "pip-review",
+    "pkg-resources",
+    "setuptools",
+    "wheel",
+)
+
+PINNED = re.compile(
+    r"^(?P<name>[A-Za-z0-9][A-Za-z0-9._-]*)(\[[^\]]*\])?\s*==\s*(?P<version>[^\s;,]+)$"
+)
+
+
+def sync_installed(venv, action, requirements_files, pip_args=()):
+    """Sync a virtual env by comparing its contents with requirements files.
+
+    This reads the installed packages directly, and only calls `pip` with
+    the packages which need to change, if any. It only understands plain
+    pinned requirements like `package==1.0` and gives up for anything else.
+
+    :param venv: The tox virtual env to sync
+    :param action: The current tox action
+    :param requirements_files: Compiled requirements files to sync with
+    :param pip_args: Extra arguments to pass to `pip install`
+    :return: True if the env was synced, False if `pip-sync` is required
+    """
+    site_packages = site_packages_dir(venv.path)
+    if not site_packages:
+        return False
+
+    root_dir = Path(venv.envconfig.config.toxinidir)
+    wanted = pinned_versions(root_dir / filename for filename in requirements_files)
+    if wanted is None:
+        verbosity1("Requirements are not all pinned, using pip-sync")
+        return False
+
+    installed = installed_versions(site_packages)
+    ignored = _dependency_tree(site_packages, "pip-tools") | set(PACKAGES_TO_IGNORE)
+
+    to_uninstall = sorted(set(installed) - set(wanted) - ignored)
+    to_install = sorted(
+        f"{name}=={version}"
+        for name, version in wanted.items()
+        if installed.get(name) != version
+    )
+
+    if not to_uninstall and not to_install:
+        verbosity1("Installed packages already match requirements")
+        return True
+
+    if to_uninstall:
+        action.setactivity("uninstall", " ".join(to_uninstall))
+        # pylint: disable=protected-access
+        venv._pcall(
+            [str(venv.envconfig.envpython), "-m", "pip", "uninstall", "-y"]
+            + to_uninstall,
+            cwd=venv.envconfig.config.toxinidir,
+            action=action,
+        )
+
+    if to_install:
+        # Our requirements are compiled, so all dependencies are listed
+        venv._install(  # pylint: disable=protected-access
+            to_install, extraopts=["--no-deps", *pip_args], action=action
+        )
+
+    return True
+
+
+def reinstall_local(venv, action, requirements):
+    """Reinstall only the local project in a virtual env.
+
+    This is for when the project's files have changed, but not in a way
+    which changes its dependencies, so they can be left as they are.
+
+    :param venv: The tox virtual env to install into
+    :param action: The current tox action
+    :param requirements: The `RequirementList` for the env
+    """
+    packages = []
+    for req in requirements:
+        if req.is_local:
+            if req.arg_type == PipRequirement.ArgType.EDITABLE:
+                packages.append("-e")
+            packages.append(req.requirement)
+
+    action.setactivity("reinstall", " ".join(packages))
+    venv._install(  # pylint: disable=protected-access
+        packages, extraopts=["--no-deps", "--force-reinstall"], action=action
+    )
+
+
+def site_packages_dir(venv_path):
+    """Get the `site-packages` directory for a virtual env, if it exists."""
+
+    for pattern in ("lib/python*/site-packages", "Lib/site-packages"):
+        matches = glob(str(Path(venv_path) / pattern))
+        if matches:
+            return Path(matches[0])
+
+    return None
+
+
+def site_packages_fingerprint(venv_path):
+    """Get a fingerprint of the packages installed in a virtual env.
+
+    This is based on the names and modification times of the package metadata
+    directories, so it changes when anything is installed, upgraded or removed
+    without having to read any of them.
+
+    Packages installed from a path or URL rather than an index are left out.
+    This includes the project itself, which tox installs after we've synced.
+
+    :param venv_path: The path to the root of the virtual env
+    :return: A hex digest, or None if there is no `site-packages` directory
+    """
+    site_packages = site_packages_dir(venv_path)
+    if not site_packages:
+        return None
+
+    fingerprint = blake2b(digest_size=16)
+    with os.scandir(site_packages) as entries:
+        for entry in sorted(entries, key=lambda entry: entry.name):
+            if entry.name.endswith(
+                (".dist-info", ".egg-info")
+            ) and not _installed_directly(entry.path):
+                stat = entry.stat()
+                fingerprint.update(f"{entry.name}:{stat.st_mtime_ns}\n".encode())
+
+    return fingerprint.hexdigest()
+
+
+def _installed_directly(metadata_dir):
+    # `pip` records where packages not from an index came from (PEP 610)
+    return os.path.exists(os.path.join(metadata_dir, "direct_url.json"))
+
+
+def installed_versions(site_packages):
+    """Get the installed packages in `site-packages` by name and version."""
+
+    installed = {}
+    for metadata_dir in _metadata_dirs(site_packages):
+        # The directory names look like `name-version(-extra).dist-info`
+        parts = metadata_dir.stem.split("-")
+        if len(parts) > 1:
+            installed[canonical_name(parts[0])] = parts[1]
+
+    return installed
+
+
+def pinned_versions(filenames):
+    """Get the pinned versions of packages from requirements files.
+
+    :param filenames: An iterable of requirements files to read
+    :return: A dict of package name to version, or None if any requirement
+        can't be understood or conflicts with another
+    """
+    versions = {}
+
+    for filename in filenames:
+        for req in RequirementList.iter_requirements_file(filename):
+            # We don't check hashes or understand options, so leave files
+            # using them to `pip-sync`
+            if req.arg_type != PipRequirement.ArgType.NONE or req.options:
+                return None
+
+            match = PINNED.match(req.requirement)
+            if not match:
+                return None
+
+            name, version = canonical_name(match.group("name")), match.group("version")
+            if versions.setdefault(name, version) != version:
+                return None
+
+    return versions
+
+
+def canonical_name(name):
+    """Normalise a package name so different spellings are the same."""
+
+    # See https://peps.python.org/pep-0503/#normalized-names
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def _metadata_dirs(site_packages):
+    yield from site_packages.glob("*.dist-info")
+    yield from site_packages.glob("*.egg-info")
+
+
+def _dependency_tree(site_packages, name):
+    """Get the names of a package and everything it depends on."""
+
+    metadata = {}
+    for metadata_dir in _metadata_dirs(site_packages):
+        metadata[canonical_name(metadata_dir.stem.split("-")[0])] = metadata_dir
+
+    tree = set()
+    pending = [canonical_name(name)]
+    while pending:
+        name = pending.pop()
+        if name in tree or name not in metadata:
+            continue
+
+        tree.add(name)
+        pending.extend(_requirements_for(metadata[name]))
+
+    return tree
+
+
+def _requirements_for(metadata_dir):
+    metadata_file = metadata_dir / "METADATA"
+    if not metadata_file.exists():
+        metadata_file = metadata_dir / "PKG-INFO"
+        if not metadata_file.exists():
+            return
+
+    with open(metadata_file, encoding="utf-8") as handle:
+        headers = HeaderParser().parse(handle)
+
+    for requirement in headers.get_all("Requires-Dist") or []:
+        if "extra ==" in requirement:
+            continue
+
+        yield canonical_name(re.split(r"[\s\[(<>=!~;]", requirement, maxsplit=1)[0])
@@ -0,0 +1,117 @@
+from pathlib import Path
+
+from packaging.requirements import InvalidRequirement, Requirement
+from packaging.version import InvalidVersion, Version
+
+from tox_pip_sync._installed import PINNED, canonical_name
+from tox_pip_sync._requirements import PipRequirement, RequirementList
+
+
+def pinned_by_references(requirements, root_dir):
+    """Check if `-r` files already pin every other requirement for an env.
+
+    With deps like `-r requirements.txt` and `pytest`, where `pytest` is
+    already pinned in `requirements.txt`, compiling would only repeat the pins
+    we have. As `pip-sync` installs everything in `requirements.txt` anyway,
+    there's nothing more to install.
+
+    We are deliberately conservative here. Anything we can't be sure of, like
+    extras, markers or files which aren't fully pinned, needs compiling.
+
+    :param requirements: The `RequirementList` for the env
+    :param root_dir: The directory `-r` and `-c` files are relative to
+    :return: True if there's no need to compile the requirements
+    """
+    if not any(
+        req.arg_type == PipRequirement.ArgType.REFERENCE for req in requirements
+    ):
+        return False
+
+    try:
+        pins, constraints = _read_files(requirements, Path(root_dir))
+    except (OSError, _NotPinned):
+        return False
+
+    return all(
+        _is_satisfied(req, pins) for req in requirements if not req.filename
+    ) and all(
+        # Constraints apply to the pins too, as they would when compiling. We
+        # don't install anything else, so other constraints don't matter.
+        _is_satisfied(constraint, pins, must_be_pinned=False)
+        for constraint in constraints
+    )
+
+
+class _NotPinned(Exception):
+    """A requirements file has something other than exact pins in it."""
+
+
+def _read_files(requirements, root_dir):
+    pins = _read_pins(
+        root_dir / req.filename
+        for req in requirements
+        if req.arg_type == PipRequirement.ArgType.REFERENCE
+    )
+    constraints = [
+        constraint
+        for req in requirements
+        if req.arg_type == PipRequirement.ArgType.CONSTRAINT
+        for constraint in _read_constraints(root_dir / req.filename)
+    ]
+
+    return pins, constraints
+
+
+def _read_pins(filenames):
+    pins = {}
+    for filename in filenames:
+        for req in RequirementList.iter_requirements_file(filename):
+            if req.arg_type == PipRequirement.ArgType.OPTION:
+                continue
+
+            match = None
+            if req.arg_type == PipRequirement.ArgType.NONE:
+                match = PINNED.match(req.requirement)
+
+            if not match:
+                # Other references or editable installs could bring in
+                # anything, so we'd need to compile to know
+                raise _NotPinned(str(req))
+
+            name, version = canonical_name(match.group("name")), match.group("version")
+            if pins.setdefault(name, version) != version:
+                raise _NotPinned(str(req))
+
+    return pins
+
+
+def _read_constraints(filename):
+    for req in RequirementList.iter_requirements_file(filename):
+        if req.arg_type == PipRequirement.ArgType.NONE:
+            yield req
+        elif req.arg_type != PipRequirement.ArgType.OPTION:
+            raise _NotPinned(str(req))
+
+
+def _is_satisfied(req, pins, must_be_pinned=True):
+    if req.arg_type != PipRequirement.ArgType.NONE or req.options or req.is_local:
+        return False
+
+    try:
+        requirement = Requirement(req.requirement)
+    except InvalidRequirement:
+        return False
+
+    # We can't evaluate markers for the env's Python from here, and extras
+    # can need more packages than the pins have
+    if requirement.url or requirement.marker or requirement.extras:
+        return False
+
+    version = pins.get(canonical_name(requirement.name))
+    if version is None:
+        return not must_be_pinned
+
+    try:
+        return requirement.specifier.contains(Version(version), prereleases=True)
+    except InvalidVersion:
+        return False
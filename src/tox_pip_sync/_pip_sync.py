@@ -1,45 +1,269 @@
-import json
 import os
-from functools import lru_cache
+from contextlib import ExitStack
 from glob import glob
 from os.path import relpath
 from pathlib import Path
 
-from tox.reporter import verbosity1
-
-from tox_pip_sync._requirements import RequirementList
+from tox.exception import InvocationError
+from tox.reporter import error, verbosity1
+
+from tox_pip_sync._cache import CompileCache, python_tag
+from tox_pip_sync._clone import clone_matching_env
+from tox_pip_sync._daemon import ResolverDaemon
+from tox_pip_sync._env_data import EnvData
+from tox_pip_sync._events import EVENTS
+from tox_pip_sync._installed import (
+    reinstall_local,
+    site_packages_fingerprint,
+    sync_installed,
+)
+from tox_pip_sync._pins import pinned_by_references
+from tox_pip_sync._requirements import RequirementList, SourceFiles
+from tox_pip_sync._timing import TIMINGS
+from tox_pip_sync._tool_env import ToolEnv
+from tox_pip_sync._wheelhouse import Wheelhouse
 
 
 def pip_sync(venv, action, skip_on_hash_match=True):
     """Use pip-sync to ensure requirements are up to date in a virtual env."""
 
+    with TIMINGS.phase("install-deps", venv), EVENTS.decision("sync", venv) as event:
+        _pip_sync(venv, action, skip_on_hash_match, event)
+
+
+def _pip_sync(venv, action, skip_on_hash_match, event):
     requirements = RequirementList.from_strings(
         (dep.name for dep in venv.envconfig.deps)
     )
-    current_hash = requirements.hash(root_dir=venv.envconfig.config.setupdir)
+    config = venv.envconfig.config.tox_pip_sync
     env_data = EnvData(venv.path)
-
-    if skip_on_hash_match:
-        last_hash = env_data.last_hash
-        if last_hash == current_hash:
+    sources = SourceFiles(env_data.sources)
+    with TIMINGS.phase("hash", venv):
+        current_hash = requirements_hash(venv, requirements, sources=sources)
+
+    last_hash = env_data.last_hash
+    if (
+        skip_on_hash_match
+        and last_hash == current_hash
+        and not _installed_packages_changed(venv, env_data)
+    ):
+        changed = _changed_project_files(venv, requirements, sources)
+        if not changed:
             verbosity1("Skipping pip-sync, as hash has not changed")
+            if sources.changed or sources.removed:
+                # Files were touched without changing what they say. Store
+                # their new stats, so we don't read them again next time.
+                _save_env_data(venv, env_data, current_hash, sources)
+            event.update(outcome="skip", reason="hash-match")
             return
 
-    pip_tools_run(
-        "pip-sync",
-        list(requirements_files_for_env(venv, action, requirements)),
-        message="Syncing virtual env with pip-sync",
-        venv=venv,
-        action=action,
+        # The dependencies are the same (or the hash would have changed), so
+        # only the project itself needs installing again
+        verbosity1(
+            f"Only the local project changed ({', '.join(changed)}), reinstalling it"
+        )
+        with TIMINGS.phase("reinstall-local", venv):
+            reinstall_local(venv, action, requirements)
+
+        _save_env_data(venv, env_data, current_hash, sources)
+        event.update(
+            outcome="reinstall-local", reason="project-changed", changed=changed
+        )
+        return
+
+    event.update(
+        outcome="sync",
+        reason=_sync_reason(skip_on_hash_match, last_hash, current_hash),
+        changed=sources.changed + sources.removed,
     )
 
+    if last_hash and last_hash != current_hash:
+        verbosity1(f"Requirements have changed: {_describe_changes(sources)}")
+
+    if last_hash is None and config["clone_envs"]:
+        # This is a new env, so we might be able to copy a matching one rather
+        # than installing everything. Any differences are fixed by the sync.
+        with TIMINGS.phase("clone", venv):
+            clone_matching_env(venv, current_hash)
+
+    background_compile = getattr(venv, "background_compile", None)
+    if background_compile:
+        # Anything compiled while the env was created will be in the cache
+        with TIMINGS.phase("compile-wait", venv):
+            background_compile.join()
+        venv.background_compile = None
+
+    with TIMINGS.phase("requirements-files", venv):
+        requirements_files = list(
+            requirements_files_for_env(venv, action, requirements)
+        )
+
+    pip_args = []
+    wheelhouse = Wheelhouse.for_venv(venv)
+    if wheelhouse:
+        with TIMINGS.phase("prefetch", venv):
+            pip_args = wheelhouse.prefetch(venv, requirements_files)
+
+    with TIMINGS.phase("sync", venv):
+        if not config["in_process_sync"] or not sync_installed(
+            venv, action, requirements_files, pip_args=pip_args
+        ):
+            pip_tools_run(
+                "pip-sync",
+                requirements_files + pip_args,
+                message="Syncing virtual env with pip-sync",
+                venv=venv,
+                action=action,
+            )
+
     # Store the results of this run
-    env_data.save(requirements_hash=current_hash)
+    _save_env_data(venv, env_data, current_hash, sources)
+
+
+def requirements_hash(venv, requirements, sources=None):
+    """Get the hash of requirements for an env, as configured.
+
+    Anything which looks up compiled requirements should use this, so the
+    hash is always made the same way.
+
+    :param venv: The tox virtual env the requirements are for
+    :param requirements: The `RequirementList` to hash
+    :param sources: A `SourceFiles` object to record the files read in
+    """
+    return requirements.hash(
+        root_dir=venv.envconfig.config.setupdir,
+        sources=sources,
+        raw_files=venv.envconfig.config.tox_pip_sync["raw_file_hashing"],
+    )
+
+
+def _save_env_data(venv, env_data, current_hash, sources):
+    env_data.save(
+        requirements_hash=current_hash,
+        sources=sources,
+        python=python_tag(venv),
+        interpreter=str(venv.envconfig.python_info.executable),
+        site_packages=site_packages_fingerprint(venv.path),
+        timings={
+            name: round(duration, 3)
+            for name, duration in TIMINGS.totals(venv.name).items()
+        },
+    )
+
+
+def _sync_reason(skip_on_hash_match, last_hash, current_hash):
+    if not skip_on_hash_match:
+        return "hashing-disabled"
+
+    if last_hash is None:
+        return "new-env"
+
+    if last_hash != current_hash:
+        return "requirements-changed"
+
+    return "packages-changed"
+
+
+def _installed_packages_changed(venv, env_data):
+    """Check if anything has been installed in the env since our last sync."""
+
+    with TIMINGS.phase("fingerprint", venv):
+        fingerprint = site_packages_fingerprint(venv.path)
+
+    # Envs synced by older versions won't have a fingerprint to compare
+    if env_data.site_packages in (None, fingerprint):
+        return False
+
+    verbosity1("Installed packages have changed since the last sync")
+    return True
+
+
+def _changed_project_files(venv, requirements, sources):
+    """Get any project files of a local requirement which have changed."""
+
+    if not any(req.is_local for req in requirements):
+        return []
+
+    project_files = {
+        str(Path(venv.envconfig.config.setupdir) / file_name)
+        for file_name in RequirementList.PROJECT_FILE_SOURCES
+    }
+    return [
+        filename
+        for filename in sources.changed + sources.removed
+        if filename in project_files
+    ]
+
+
+def _describe_changes(sources):
+    changes = [f"'{filename}' changed" for filename in sources.changed]
+    changes.extend(f"'{filename}' removed" for filename in sources.removed)
+
+    # If no files have changed, it must be the `deps` in `tox.ini`
+    return ", ".join(changes) or "dependencies in tox.ini changed"
 
 
 def pip_tools_run(exe_name, arguments, message, venv, action):
     """Run a pip-tools executable with arguments in a virtual env."""
 
+    tool_env = ToolEnv.for_venv(venv)
+    with TIMINGS.phase("bootstrap", venv), EVENTS.decision("bootstrap", venv) as event:
+        if tool_env:
+            if not tool_env.python.exists():
+                event.update(outcome="create", reason="no-tool-env")
+            tool_env.ensure_exists(venv, action)
+            command = tool_env.command(exe_name, venv)
+        else:
+            if not (venv.envconfig.envbindir / exe_name).exists():
+                event.update(outcome="install", reason=f"no-{exe_name}")
+            command = [_bootstrap_pip_tools(exe_name, venv, action)]
+
+    action.setactivity(exe_name, message)
+    with TIMINGS.phase(exe_name, venv):
+        output = _daemon_run(exe_name, arguments, venv, tool_env)
+        if output is None:
+            output = venv._pcall(  # pylint: disable=protected-access
+                command + arguments,
+                cwd=venv.envconfig.config.toxinidir,
+                action=action,
+            )
+
+    verbosity1(output)
+
+
+def _daemon_run(exe_name, arguments, venv, tool_env):
+    """Run a pip-tools executable in the resolver daemon, if we can.
+
+    :return: The output of the command, or None if the daemon isn't available
+    :raise InvocationError: If the command fails
+    """
+    daemon = ResolverDaemon.for_venv(venv, tool_env)
+    if not daemon:
+        return None
+
+    arguments = tool_env.arguments(exe_name, venv) + arguments
+    result = daemon.run(
+        arguments,
+        cwd=venv.envconfig.config.toxinidir,
+        env=venv._get_os_environ(),  # pylint: disable=protected-access
+    )
+    if result is None:
+        return None
+
+    returncode, output = result
+    if returncode:
+        # Show the output, as tox would for a failed command
+        error(output)
+        raise InvocationError(
+            " ".join([exe_name] + arguments[1:]), exit_code=returncode, out=output
+        )
+
+    return output
+
+
+def _bootstrap_pip_tools(exe_name, venv, action):
+    """Install pip-tools in a virtual env and return the executable path."""
+
     exe_path = venv.envconfig.envbindir / exe_name
 
     if not exe_path.exists():
@@ -58,15 +282,7 @@ def pip_tools_run(exe_name, arguments, message, venv, action):
             "as a result of installing `pip-tools`"
         )
 
-    action.setactivity(exe_name, message)
-    verbosity1(
-        # pylint: disable=protected-access
-        venv._pcall(
-            [exe_path] + arguments,
-            cwd=venv.envconfig.config.toxinidir,
-            action=action,
-        )
-    )
+    return exe_path
 
 
 def requirements_files_for_env(venv, action, requirements):
@@ -87,69 +303,118 @@ def requirements_files_for_env(venv, action, requirements):
 
 
 def _pinned_file_for_requirements(venv, action, requirements):
-    requirements_hash = requirements.hash(root_dir=venv.envconfig.config.setupdir)
-    stub = "tox-pip-sync_" + requirements_hash
+    with EVENTS.decision("compile", venv) as event:
+        return _find_or_compile(venv, action, requirements, event)
+
+
+def _find_or_compile(venv, action, requirements, event):
+    current_hash = requirements_hash(venv, requirements)
+    stub = "tox-pip-sync_" + current_hash
 
     pinned = venv.path / stub + ".txt"
     if pinned.exists():
         verbosity1(f"Using existing compiled dependencies: '{pinned}'")
+        event.update(outcome="reuse", reason="pinned-file-exists")
         return pinned
 
-    # We can't find what we're looking for, so clear out any stale files
+    # Hold on to the last compiled file (if any) before we clear out any
+    # stale files, so `pip-compile` can start from the pins we had before
+    seed = previous_pinned_content(venv)
     clear_compiled_files(venv)
 
-    # Create a new version and compile it
-    relative_root = Path(relpath(venv.envconfig.config.setupdir, venv.path))
-    constrained = requirements.constrained_set(relative_root)
-    unpinned = venv.path / stub + ".in"
-    unpinned.write_text("\n".join(str(dep) for dep in constrained), encoding="utf-8")
-
-    pip_tools_run(
-        "pip-compile",
-        [str(unpinned)],
-        message=f"Compiling dependencies '{constrained}'",
-        venv=venv,
-        action=action,
-    )
-
-    if not pinned.exists():
-        raise FileNotFoundError(pinned)
+    if pinned_by_references(requirements, venv.envconfig.config.toxinidir):
+        verbosity1("Dependencies are already pinned by requirements files")
+        # `pip-sync` installs everything from the `-r` files, so there's
+        # nothing extra to put in here
+        pinned.write_text(
+            "# Every dependency is pinned in the requirements files for this "
+            "env,\n# so there was nothing to compile.\n",
+            encoding="utf-8",
+        )
+        event.update(outcome="skip", reason="pinned-by-references")
+        return str(pinned)
+
+    cache = CompileCache.for_venv(venv)
+    if not cache:
+        _compile(venv, action, requirements, stub, seed)
+        event.update(outcome="compile", reason="cache-disabled")
+        return str(pinned)
+
+    root_dir = venv.envconfig.config.setupdir
+    cache_key = cache.key(current_hash, venv)
+
+    # Only one env compiles a particular set of requirements at a time. Any
+    # others wait for it to finish, and then use the result from the cache.
+    with ExitStack() as stack:
+        with TIMINGS.phase("cache-wait", venv):
+            stack.enter_context(cache.lock(cache_key))
+
+        # Another env or checkout may have compiled this for us already
+        if cache.get(cache_key, pinned, root_dir=root_dir):
+            verbosity1(f"Using cached compiled dependencies: '{pinned}'")
+            event.update(outcome="cache-hit", reason="cached")
+        else:
+            _compile(venv, action, requirements, stub, seed)
+            cache.put(cache_key, pinned, root_dir=root_dir)
+            event.update(outcome="compile", reason="not-cached")
 
     return str(pinned)
 
 
-def clear_compiled_files(venv):
-    """Remove any files created by `tox-pip-sync`."""
+def previous_pinned_content(venv):
+    """Get the contents of the most recently compiled file in an env."""
 
-    # We can't find what we're looking for, so clear out any stale files
-    for old_files in glob(str(venv.path / "tox-pip-sync_*")):
-        os.remove(old_files)
+    compiled = glob(str(venv.path / "tox-pip-sync_*.txt"))
+    if not compiled:
+        return None
 
+    with open(max(compiled, key=os.path.getmtime), encoding="utf-8") as handle:
+        return handle.read()
 
-class EnvData:
-    """Class for accessing data stored in a testenv by and for tox-pip-sync."""
 
-    def __init__(self, venv_path):
-        """Initialize an EnvData object.
+def _compile(venv, action, requirements, stub, seed=None):
+    """Compile requirements into a pinned file in the virtual env.
 
-        :param venv_path: The path to the root of the virtual env.
-        """
-        self.path = venv_path / "tox-pip-sync.json"
+    :param seed: The contents of a previously compiled file. `pip-compile`
+        keeps the pins in an existing output file where it can, so only
+        requirements which have changed need to be resolved again.
+    """
+
+    relative_root = Path(relpath(venv.envconfig.config.setupdir, venv.path))
+    constrained = requirements.constrained_set(relative_root)
+    unpinned = venv.path / stub + ".in"
+    unpinned.write_text("\n".join(str(dep) for dep in constrained), encoding="utf-8")
 
-    @property
-    def last_hash(self):
-        """Get the last hash stored in the data."""
+    # Compile into another file, and only move it into place when done. If
+    # we're interrupted, the seed mustn't look like a compiled file.
+    pinned = venv.path / stub + ".txt"
+    partial = venv.path / stub + ".txt.partial"
+    if seed:
+        partial.write_text(seed, encoding="utf-8")
+
+    try:
+        pip_tools_run(
+            "pip-compile",
+            ["--output-file", str(partial), str(unpinned)],
+            message=f"Compiling dependencies '{constrained}'",
+            venv=venv,
+            action=action,
+        )
+    except BaseException:
+        if partial.exists():
+            partial.remove()
+        raise
 
-        return self._load().get("hash")
+    if not partial.exists():
+        raise FileNotFoundError(pinned)
 
-    def save(self, requirements_hash):
-        """Save the hash."""
+    partial.rename(pinned)
 
-        self.path.write_text(json.dumps({"hash": requirements_hash}), encoding="utf-8")
 
-    @lru_cache(1)
-    def _load(self):
-        if not self.path.exists():
-            return {}
+def clear_compiled_files(venv):
+    """Remove any files created by `tox-pip-sync`."""
 
-        return json.loads(self.path.read_text(encoding="utf-8"))
+    # We can't find what we're looking for, so clear out any stale files
+    with TIMINGS.phase("clear-compiled-files", venv):
+        for old_files in glob(str(venv.path / "tox-pip-sync_*")):
+            os.remove(old_files)
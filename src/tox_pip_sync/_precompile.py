@@ -0,0 +1,121 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from os.path import relpath
+from pathlib import Path
+
+from tox.exception import ConfigError
+from tox.venv import VirtualEnv
+
+from tox_pip_sync._background import compile_into_cache
+from tox_pip_sync._cache import CompileCache
+from tox_pip_sync._pins import pinned_by_references
+from tox_pip_sync._pip_sync import previous_pinned_content, requirements_hash
+from tox_pip_sync._requirements import RequirementList
+from tox_pip_sync._tool_env import ToolEnv
+
+
+class Precompile:
+    """Compile the requirements for many envs in one go.
+
+    Envs with the same requirements (and Python version) share a compiled
+    file, so each unique set is only compiled once. The results go into the
+    compile cache, where each env will find them when it's installed.
+    """
+
+    def __init__(self, tox_config):
+        """Initialize a Precompile object.
+
+        :param tox_config: The tox `Config` object for the project
+        :raises ConfigError: If the compile cache or shared tool env is
+            disabled, as we need them to compile outside of tox
+        """
+        config = tox_config.tox_pip_sync
+        if not config["compile_cache"] or not config["shared_tool_env"]:
+            raise ConfigError(
+                "Compiling requirements needs the tox-pip-sync options "
+                "'compile_cache' and 'shared_tool_env' enabled"
+            )
+
+        self.tox_config = tox_config
+        self.work_dir = Path(tox_config.toxworkdir) / ".tox-pip-sync-precompile"
+
+    def jobs(self, env_names=None):
+        """Get the unique sets of requirements which need compiling.
+
+        :param env_names: The envs to compile for (default: the envlist)
+        :return: A dict of cache key to a list of `VirtualEnv` objects which
+            need the same compiled requirements
+        :raises ConfigError: If any of the envs aren't in the tox config
+        """
+        env_names = env_names or self.tox_config.envlist
+        unknown = [name for name in env_names if name not in self.tox_config.envconfigs]
+        if unknown:
+            raise ConfigError(f"Unknown tox env(s): {', '.join(unknown)}")
+
+        jobs = {}
+        for env_name in env_names:
+            venv = VirtualEnv(self.tox_config.envconfigs[env_name])
+            if not venv.envconfig.python_info.version_info:
+                # The interpreter for this env isn't installed
+                continue
+
+            requirements = self._requirements(venv)
+            if not requirements.needs_compilation or pinned_by_references(
+                requirements, self.tox_config.toxinidir
+            ):
+                continue
+
+            cache = CompileCache.for_venv(venv)
+            key = cache.key(requirements_hash(venv, requirements), venv)
+            if key not in cache:
+                jobs.setdefault(key, []).append(venv)
+
+        return jobs
+
+    def run(self, jobs, max_workers=None):
+        """Compile each unique set of requirements in parallel.
+
+        :param jobs: The result of `Precompile.jobs()`
+        :param max_workers: The most `pip-compile` processes to run at once
+        :return: An iterable of `(key, venvs, error)` as each job finishes,
+            where `error` is None if it succeeded
+        """
+        # Create any tool envs first, so the processes don't all wait on
+        # each other to do it
+        for venvs in jobs.values():
+            ToolEnv.for_venv(venvs[0]).ensure_exists(venvs[0])
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(compile_into_cache, **self._job_kwargs(key, venvs)): key
+                for key, venvs in jobs.items()
+            }
+
+            for future in as_completed(futures):
+                key = futures[future]
+                yield key, jobs[key], future.exception()
+
+    def _job_kwargs(self, key, venvs):
+        venv = venvs[0]
+        root_dir = self.tox_config.setupdir
+        work_dir = self.work_dir / key
+        relative_root = Path(relpath(root_dir, work_dir))
+
+        return {
+            "cache": CompileCache.for_venv(venv),
+            "key": key,
+            "command": ToolEnv.for_venv(venv).command("pip-compile", venv),
+            "unpinned": "\n".join(
+                str(dep)
+                for dep in self._requirements(venv).constrained_set(relative_root)
+            ),
+            "work_dir": work_dir,
+            "cwd": str(self.tox_config.toxinidir),
+            "root_dir": str(root_dir),
+            "seed": previous_pinned_content(venv),
+            # Use the env's settings, so `pip` goes to any index set for it
+            "env": venv._get_os_environ(),  # pylint: disable=protected-access
+        }
+
+    @staticmethod
+    def _requirements(venv):
+        return RequirementList.from_strings(dep.name for dep in venv.envconfig.deps)
@@ -0,0 +1,147 @@
+import ast
+import json
+from configparser import ConfigParser
+from configparser import Error as ConfigParserError
+from hashlib import md5
+from pathlib import Path
+
+# The `setup()` arguments which change what gets installed
+SETUP_ARGUMENTS = (
+    "install_requires",
+    "extras_require",
+    "setup_requires",
+    "python_requires",
+    "dependency_links",
+)
+
+# The `pyproject.toml` tables and keys which change what gets installed
+PYPROJECT_KEYS = (
+    ("build-system",),
+    ("project", "dependencies"),
+    ("project", "optional-dependencies"),
+    ("project", "requires-python"),
+    ("project", "dynamic"),
+    ("tool", "setuptools", "dynamic"),
+    ("tool", "poetry", "dependencies"),
+    ("tool", "poetry", "dev-dependencies"),
+    ("tool", "poetry", "extras"),
+    ("tool", "poetry", "group"),
+)
+
+
+class NotAnalysable(Exception):
+    """We can't reliably work out the dependencies from a file."""
+
+
+def read_project_file(filename):
+    """Get a digest of the dependency related parts of a project file.
+
+    This means changes to things like the version, classifiers or linter
+    config don't cause the env to be rebuilt. If we can't work out the
+    dependencies from the file (like a `setup.py` which builds them
+    dynamically) we fall back to using the whole contents.
+
+    :param filename: The `setup.py`, `setup.cfg` or `pyproject.toml` to read
+    :return: A dict with the digest of the file, as `SourceFiles` expects
+    :raises FileNotFoundError: If the file does not exist
+    """
+    with open(filename, "rb") as handle:
+        content = handle.read()
+
+    parser = {
+        "setup.py": _setup_py_dependencies,
+        "setup.cfg": _setup_cfg_dependencies,
+        "pyproject.toml": _pyproject_dependencies,
+    }[Path(filename).name]
+
+    try:
+        dependencies = parser(content.decode("utf-8"))
+    except (NotAnalysable, UnicodeDecodeError):
+        # Use the whole contents
+        return {"digest": md5(content).hexdigest(), "includes": []}
+
+    digest = md5(json.dumps(dependencies, sort_keys=True, default=str).encode("utf-8"))
+    return {"digest": digest.hexdigest(), "includes": []}
+
+
+def _setup_py_dependencies(content):
+    try:
+        tree = ast.parse(content)
+    except (SyntaxError, ValueError) as err:
+        raise NotAnalysable() from err
+
+    calls = [
+        node
+        for node in ast.walk(tree)
+        if isinstance(node, ast.Call) and _call_name(node) == "setup"
+    ]
+    if len(calls) != 1:
+        raise NotAnalysable()
+
+    dependencies = {}
+    for keyword in calls[0].keywords:
+        # `setup(**kwargs)` could be passing anything
+        if keyword.arg is None:
+            raise NotAnalysable()
+
+        if keyword.arg in SETUP_ARGUMENTS:
+            try:
+                dependencies[keyword.arg] = ast.literal_eval(keyword.value)
+            except ValueError as err:
+                # Something worked out when `setup.py` runs
+                raise NotAnalysable() from err
+
+    return dependencies
+
+
+def _call_name(node):
+    # Both `setup(...)` and `setuptools.setup(...)`
+    if isinstance(node.func, ast.Name):
+        return node.func.id
+
+    if isinstance(node.func, ast.Attribute):
+        return node.func.attr
+
+    return None
+
+
+def _setup_cfg_dependencies(content):
+    parser = ConfigParser(interpolation=None)
+    try:
+        parser.read_string(content)
+    except ConfigParserError as err:
+        raise NotAnalysable() from err
+
+    dependencies = {}
+    if parser.has_section("options"):
+        dependencies["options"] = {
+            key: value
+            for key, value in parser.items("options")
+            if key in SETUP_ARGUMENTS
+        }
+
+    if parser.has_section("options.extras_require"):
+        dependencies["extras_require"] = dict(parser.items("options.extras_require"))
+
+    return dependencies
+
+
+def _pyproject_dependencies(content):
+    # Most runs of tox don't need this, so only import it when we do
+    import toml  # pylint: disable=import-outside-toplevel
+
+    try:
+        table = toml.loads(content)
+    except toml.TomlDecodeError as err:
+        raise NotAnalysable() from err
+
+    dependencies = {}
+    for keys in PYPROJECT_KEYS:
+        value = table
+        for key in keys:
+            value = value.get(key) if isinstance(value, dict) else None
+
+        if value is not None:
+            dependencies[".".join(keys)] = value
+
+    return dependencies
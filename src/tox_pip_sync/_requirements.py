@@ -1,32 +1,67 @@
+import mmap
+import os
+import re
+import sys
 from copy import deepcopy
 from enum import Enum
-from functools import lru_cache
-from hashlib import md5
+from hashlib import blake2b, md5
+
+from tox_pip_sync._project import read_project_file
 
 
 class RequirementList(list):
     PROJECT_FILE_SOURCES = ("setup.py", "setup.cfg", "pyproject.toml")
 
+    # Includes like `-r file`, `-cfile` or `--requirement=file`. Starting
+    # with a literal lets `re` skip straight to each `-`, which is much quicker
+    # over large files than a `^` anchor. We check they start a line after.
+    RAW_INCLUDE = re.compile(rb"-(?:[rc]|-requirement|-constraint)[= \t]*(\S+)")
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self._hashes = {}
+
     @classmethod
     def from_strings(cls, strings):
         return cls([PipRequirement(req) for req in strings])
 
     @classmethod
     def from_requirements_file(cls, filename):
-        requirements = cls()
+        return cls(cls.iter_requirements_file(filename))
+
+    @classmethod
+    def iter_requirements_file(cls, filename):
+        """Read requirements from a file one at a time.
+
+        This follows the `pip` requirements file format, including line
+        continuations, comments and options like `--hash` or `--index-url`.
 
+        :param filename: The requirements file to read
+        :return: A generator of `PipRequirement` objects
+        """
         with open(filename, encoding="utf-8") as handle:
+            continued = ""
             for line in handle:
-                line = line.strip()
-                if line.startswith("#") or not line:
+                line = line.rstrip()
+
+                # Comments end a continued line, as they do for `pip`
+                if line.endswith("\\") and not line.lstrip().startswith("#"):
+                    continued += line[:-1]
                     continue
 
+                if continued:
+                    line, continued = continued + line, ""
+
                 if "#" in line:
-                    line = line[: line.index("#")]
+                    line = _strip_comment(line)
 
-                requirements.append(PipRequirement(line))
+                if line and not line.isspace():
+                    yield PipRequirement(line)
 
-        return requirements
+            # The last line could end with a backslash
+            continued = _strip_comment(continued)
+            if continued and not continued.isspace():
+                yield PipRequirement(continued)
 
     @property
     def needs_compilation(self):
@@ -59,68 +94,299 @@ class RequirementList(list):
 
         return requirements
 
-    @lru_cache(1)
-    def hash(self, root_dir):
+    def hash(self, root_dir, sources=None, raw_files=False):
         """Get a hash of this set of requirements.
 
         This should change if any relevant change to files is detected.
 
         :param root_dir: The root of the project to resolve project files and
             requirements includes against as `pathlib.Path` object
+        :param sources: A `SourceFiles` object to record the files read in.
+            If it was created with the sources from a previous run, any files
+            which don't appear to have changed since will not be read again
+        :param raw_files: Hash the raw bytes of requirements files, rather than
+            parsing them. This is much quicker for large files, but changes to
+            comments or formatting will change the hash too
         :return: An hex string digest of the requirements
         """
-        digest = md5()
-        for fragment in self._hash_fragments(root_dir):
-            digest.update(str(fragment).encode("utf-8"))
-
-        return digest.hexdigest()
-
-    def _hash_fragments(self, root_dir):
+        # The sources change how much work we do, but not the result, so we
+        # only need to remember the hash by `root_dir` and how files are read
+        key = (root_dir, raw_files)
+        if key in self._hashes:
+            return self._hashes[key]
+
+        # Other envs with the same deps may have worked this out already. If
+        # we need to know about the sources, we'll have to visit them anyway.
+        session_key = (tuple(str(req) for req in self), str(root_dir), raw_files)
+        if sources is None:
+            self._hashes[key] = SESSION.get_hash(session_key)
+            sources = SourceFiles()
+
+        if not self._hashes.get(key):
+            digest = md5()
+            for fragment in self._hash_fragments(root_dir, sources, raw_files):
+                digest.update(str(fragment).encode("utf-8"))
+
+            self._hashes[key] = digest.hexdigest()
+            SESSION.put_hash(session_key, self._hashes[key], sources)
+
+        return self._hashes[key]
+
+    def _hash_fragments(self, root_dir, sources, raw_files=False):
         """Yield fragments for hashing from this set."""
+        reader = self._read_raw_file if raw_files else self._read_requirements_file
+
         for req in self:
             yield req
 
             if req.filename:
-                # pylint: disable=protected-access
-                # This is an instance of this class, making this fine...
+                yield self._hash_file(
+                    self._resolve(root_dir, req.filename), root_dir, sources, reader
+                )
 
-                filename = req.filename
-                # If this is a relative path, make it relative to the root
-                if not filename.startswith("/"):
-                    filename = root_dir / req.filename
+            if req.is_local:
+                yield from self._hash_fragments_for_project(root_dir, sources)
 
-                yield from self.from_requirements_file(filename)._hash_fragments(
-                    root_dir
+    @classmethod
+    def _hash_file(  # pylint: disable=too-many-arguments
+        cls, filename, root_dir, sources, reader, _parents=frozenset()
+    ):
+        """Get a digest of a requirements file and everything it includes.
+
+        Each digest combines the file's own contents with the digests of the
+        files it includes, making a Merkle tree of the include graph. The
+        digest is stored in the file's record in `sources` as `tree`.
+        """
+        if filename in _parents:
+            # We've been here before in this branch, which means we are in an
+            # include loop. The contents are already covered further up.
+            return f"cycle: {filename}"
+
+        # If we've seen this file already this time around (like a shared base
+        # file included from two places) we can reuse the tree digest
+        record = sources.get(filename)
+        if record is None or "tree" not in record:
+            record = sources.read(filename, reader, root_dir)
+            digest = md5(record["digest"].encode("utf-8"))
+            for include in record["includes"]:
+                digest.update(
+                    cls._hash_file(
+                        include, root_dir, sources, reader, _parents | {filename}
+                    ).encode("utf-8")
                 )
 
-            if req.is_local:
-                yield from self._hash_fragments_for_project(root_dir)
+            record["tree"] = digest.hexdigest()
 
-    def _hash_fragments_for_project(self, root_dir):
-        """Yield fragments for project files."""
+        return record["tree"]
+
+    @classmethod
+    def _read_requirements_file(cls, filename, root_dir):
+        digest = md5()
+        includes = []
 
-        # We can't be sure exactly what's required without doing some horrible
-        # parsing, but what we can say is, if the contents of some of these
-        # files have changed, there _might_ be a possibility that the env needs
-        # to be rebuilt.
+        for req in cls.iter_requirements_file(filename):
+            digest.update(str(req).encode("utf-8"))
 
+            if req.filename:
+                includes.append(cls._resolve(root_dir, req.filename))
+
+        return {"digest": digest.hexdigest(), "includes": includes}
+
+    @classmethod
+    def _read_raw_file(cls, filename, root_dir):
+        with open(filename, "rb") as handle:
+            # Empty files can't be memory mapped
+            if not os.fstat(handle.fileno()).st_size:
+                return {"digest": blake2b().hexdigest(), "includes": []}
+
+            with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as content:
+                digest = blake2b(content).hexdigest()
+                includes = [
+                    cls._resolve(root_dir, match.group(1).decode("utf-8"))
+                    for match in cls.RAW_INCLUDE.finditer(content)
+                    if _starts_line(content, match.start())
+                ]
+
+        return {"digest": digest, "includes": includes}
+
+    def _hash_fragments_for_project(self, root_dir, sources):
+        """Yield fragments for project files."""
+
+        # Only the parts of these files which say what to install matter, so
+        # changes to things like the version don't cause a rebuild
         for file_name in self.PROJECT_FILE_SOURCES:
-            project_file = root_dir / file_name
-            if project_file.exists():
-                # Use the whole contents
-                yield project_file.read()
+            try:
+                yield sources.read(root_dir / file_name, read_project_file)["digest"]
+            except FileNotFoundError:
+                continue
 
-    def __hash__(self):
-        # Ensure we are hashable, and also ensure that different instances of
-        # this class hash to different things, even if they have the same
-        # contents. Otherwise the `@lru_cache` above ends up being shared
-        # between all instances
-        return hash(id(self))
+    @staticmethod
+    def _resolve(root_dir, filename):
+        # If this is a relative path, make it relative to the root
+        if not str(filename).startswith("/"):
+            filename = root_dir / filename
+
+        return str(filename)
+
+
+def _starts_line(content, position):
+    # Only whitespace can come before an option on its line
+    start = content.rfind(b"\n", 0, position) + 1
+    return not content[start:position].strip(b" \t")
+
+
+def _strip_comment(line):
+    # Like `pip`, only treat `#` as a comment at the start of a line or after
+    # whitespace, so URLs like `https://example.com/pkg.zip#sha256=...` work
+    index = line.find("#")
+    while index != -1:
+        if not index or line[index - 1].isspace():
+            return line[:index]
+
+        index = line.find("#", index + 1)
+
+    return line
+
+
+class SourceFiles(dict):
+    """The files read to create a requirements hash, keyed by path.
+
+    Alongside details of the contents, each record stores the size,
+    modification time and inode of the file when it was read. If these are
+    the same next time around we assume the file hasn't changed, and use the
+    stored details instead of reading it again.
+    """
+
+    def __init__(self, previous=None):
+        """Initialize a SourceFiles object.
+
+        :param previous: Records from a previous run to reuse if possible
+        """
+        super().__init__()
+        self._previous = previous or {}
+        self.changed = []
+
+    def read(self, filename, reader, *args):
+        """Get the details for a file, only reading it if it's changed.
+
+        Files are read at most once per run, however many envs or
+        requirements refer to them.
+
+        :param filename: The file to get details for
+        :param reader: A callable which accepts the filename (and `args`) and
+            returns a dict of details about the file contents
+        :param args: Any other arguments for `reader`
+        :return: The details about the file
+        :raises FileNotFoundError: If the file does not exist
+        """
+        filename = str(filename)
+        if filename in self:
+            return self[filename]
+
+        stat = file_stat(filename)
+        record = self._previous.get(filename)
+        if not record or record["stat"] != stat:
+            record = SESSION.read_file(filename, stat, reader, *args)
+            self.changed.append(filename)
+
+        # Take a copy so we can update it without changing the original
+        self[filename] = {key: value for key, value in record.items() if key != "tree"}
+        return self[filename]
+
+    @property
+    def removed(self):
+        """Get files which were present in the previous run, but not this one."""
+
+        return [filename for filename in self._previous if filename not in self]
+
+
+def file_stat(filename):
+    """Get the details we use to tell if a file has changed.
+
+    :param filename: The file to check
+    :return: A list of the size, modification time and inode of the file
+    :raises FileNotFoundError: If the file does not exist
+    """
+    stat = os.stat(filename)
+    return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+
+class SessionCache:
+    """Files and hashes worked out this run, shared between every env.
+
+    tox runs each env in turn in the same process, so with a large matrix of
+    envs the same files would otherwise be read once per env. Everything is
+    stored with the stats of the files involved, so changes to a file part
+    way through a run are still noticed.
+    """
+
+    def __init__(self):
+        """Initialize a SessionCache object."""
+
+        self.files = {}
+        self.hashes = {}
+
+    def read_file(self, filename, stat, reader, *args):
+        """Read a file with a reader, unless it's been read already.
+
+        :param filename: The file to read
+        :param stat: The current stats of the file (see `file_stat()`)
+        :param reader: A callable which accepts the filename (and `args`) and
+            returns a dict of details about the file contents
+        :param args: Any other arguments for `reader`
+        :return: The details from the reader, with the stats added
+        """
+        key = (filename, tuple(stat), reader, args)
+        if key not in self.files:
+            self.files[key] = dict(reader(filename, *args), stat=stat)
+
+        return self.files[key]
+
+    def get_hash(self, key):
+        """Get a hash stored with `put_hash()`, if the files are unchanged.
+
+        :param key: The key the hash was stored against
+        :return: The hash, or None if there isn't one or any file changed
+        """
+        if key not in self.hashes:
+            return None
+
+        requirements_hash, stats = self.hashes[key]
+        try:
+            current_stats = [file_stat(filename) for filename in stats]
+        except FileNotFoundError:
+            return None
+
+        return requirements_hash if current_stats == list(stats.values()) else None
+
+    def put_hash(self, key, requirements_hash, sources):
+        """Store a hash of requirements for other envs to use.
+
+        :param key: The key to store the hash against
+        :param requirements_hash: The hash of the requirements
+        :param sources: The `SourceFiles` read to create the hash
+        """
+        self.hashes[key] = (
+            requirements_hash,
+            {filename: record["stat"] for filename, record in sources.items()},
+        )
+
+    def clear(self):
+        """Forget everything we've stored."""
+
+        self.files.clear()
+        self.hashes.clear()
+
+
+SESSION = SessionCache()
 
 
 class PipRequirement:
     """A pip compatible requirement."""
 
+    # We can create a lot of these when reading large compiled files
+    __slots__ = ("arg_type", "requirement", "filename", "options")
+
     class ArgType(Enum):
         """The type of argument used with this argument."""
 
@@ -128,26 +394,80 @@ class PipRequirement:
         CONSTRAINT = "-c"
         EDITABLE = "-e"
         REFERENCE = "-r"
+        # Any other option like `--index-url` which applies to a whole file
+        OPTION = "--"
+
+    # Long versions of the options we understand
+    LONG_OPTIONS = {
+        "--constraint": ArgType.CONSTRAINT,
+        "--editable": ArgType.EDITABLE,
+        "--requirement": ArgType.REFERENCE,
+    }
+
+    # Short versions of other options `pip` accepts in requirements files
+    OPTION_ALIASES = {"-f": "--find-links", "-i": "--index-url"}
 
-    arg_type = ArgType.NONE
-    requirement = None
-    filename = None
+    # An option like `-r file`, `-rfile`, `--requirement=file` or `--pre`
+    OPTION = re.compile(r"^(?P<option>-\w|--[\w-]+)[=\s]*(?P<value>.*)$", re.DOTALL)
+
+    # A hash given in the options for a requirement
+    HASH_OPTION = re.compile(r"--hash[=\s]\s*(\S+)")
 
     def __init__(self, string):
         """Initialise a requirement from a raw string."""
 
         string = string.strip()
+        self.requirement = None
+        self.filename = None
+        # Options for this requirement like `--hash=sha256:...`
+        self.options = ""
+
+        if not string.startswith("-"):
+            self.arg_type = self.ArgType.NONE
+        else:
+            self.arg_type, string = self._parse_arg_type(string)
+
+            if self.arg_type is self.ArgType.OPTION:
+                self.requirement = sys.intern(string)
+                return
 
-        if string.startswith("-"):
-            self.arg_type = self.ArgType(string[:2])
+            if self.arg_type is not self.ArgType.EDITABLE:
+                self.filename = sys.intern(string)
+                return
 
-            string = string[2:].strip()
+        # Like `pip`, anything after the first word starting with `-` is an
+        # option for this requirement
+        start = string.find(" -")
+        if start == -1 and "\t" in string:
+            start = string.find("\t-")
 
-            if self.arg_type in (self.ArgType.REFERENCE, self.ArgType.CONSTRAINT):
-                self.filename = string
-                return
+        if start != -1:
+            self.options = string[start + 1 :].lstrip()
+            string = string[:start].rstrip()
+
+        self.requirement = sys.intern(string)
+
+    @classmethod
+    def _parse_arg_type(cls, string):
+        """Get the type of argument, and the rest of the string after it."""
+
+        option, value = cls.OPTION.match(string).group("option", "value")
+        if option in cls.LONG_OPTIONS:
+            return cls.LONG_OPTIONS[option], value
 
-        self.requirement = string
+        try:
+            return cls.ArgType(option), value
+        except ValueError:
+            # Keep the whole option, so it's included when this is written out
+            option = cls.OPTION_ALIASES.get(option, option)
+            return cls.ArgType.OPTION, f"{option} {value}".strip()
+
+    @property
+    def hashes(self):
+        """Get the hashes given for this requirement with `--hash`."""
+
+        # Hashes can be written as `--hash=value` or `--hash value`
+        return tuple(self.HASH_OPTION.findall(self.options))
 
     @property
     def is_local(self):
@@ -156,6 +476,9 @@ class PipRequirement:
         return bool(self.requirement and self.requirement.startswith("."))
 
     def __str__(self):
+        if self.arg_type == self.ArgType.OPTION:
+            return self.requirement
+
         result = ""
         if self.arg_type != self.ArgType.NONE:
             result = self.arg_type.value + " "
@@ -163,6 +486,9 @@ class PipRequirement:
             if self.filename:
                 return result + str(self.filename)
 
+        if self.options:
+            return f"{result}{self.requirement} {self.options}"
+
         return result + self.requirement
 
     def __eq__(self, other):
@@ -175,7 +501,7 @@ class PipRequirement:
         return hash(self._key())
 
     def _key(self):
-        return self.arg_type, self.requirement, str(self.filename)
+        return self.arg_type, self.requirement, str(self.filename), self.options
 
     def __repr__(self):
         return f"PipRequirement('{self.__str__()}')"
@@ -0,0 +1,233 @@
+"""Run `pip-tools` commands in a long running process.
+
+This is started by `ResolverDaemon` with the Python from the shared
+`pip-tools` env, where `tox_pip_sync` isn't installed. So this must only
+use the standard library and `pip-tools`.
+
+Requests come in over a Unix socket as a line of JSON, like:
+
+    {"args": ["compile", "requirements.in"], "cwd": "/project", "env": {}}
+
+... and get a line of JSON back like: `{"returncode": 0, "output": "..."}`.
+Each request is run in a fork of the server, so requests from parallel envs
+run at the same time, with `pip-tools` and `pip` already imported. The server
+exits when it hasn't had a request for a while.
+
+This only saves starting Python and importing things. Anything a request
+builds up in memory, like `pip`'s HTTP connections or the package metadata it
+has read, goes away with the fork. (`pip`'s HTTP cache is on disk, so that is
+still shared as usual.)
+"""
+
+import importlib
+import json
+import os
+import socket
+import sys
+import tempfile
+import traceback
+from argparse import ArgumentParser
+from contextlib import contextmanager, redirect_stderr, redirect_stdout, suppress
+
+# Parts of `pip` which are only imported part way through a command, which
+# we import up front so each fork starts with them
+WARM_MODULES = (
+    "pip._internal.network.session",
+    "pip._internal.resolution.resolvelib.resolver",
+    "pip._internal.operations.prepare",
+)
+
+
+def serve(socket_path, idle_timeout, cli):
+    """Handle requests until we've been idle for long enough.
+
+    :param socket_path: The Unix socket to listen on
+    :param idle_timeout: How many seconds to wait for a request before exiting
+    :param cli: The `pip-tools` click command to run requests with
+    :return: The exit code
+    """
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        server.bind(socket_path)
+    except OSError:
+        # Another server got here first
+        server.close()
+        return 1
+
+    server.listen()
+    server.settimeout(idle_timeout)
+
+    try:
+        _accept_requests(server, cli)
+    finally:
+        server.close()
+        os.unlink(socket_path)
+
+    return 0
+
+
+def _accept_requests(server, cli):
+    children = set()
+
+    while True:
+        try:
+            connection, _ = server.accept()
+        except socket.timeout:
+            # Don't leave while requests are still running
+            _reap(children)
+            if not children:
+                return
+            continue
+
+        with connection:
+            children.add(_fork(server, connection, cli))
+
+        _reap(children)
+
+
+def _fork(server, connection, cli):
+    pid = os.fork()
+    if not pid:  # pragma: no cover
+        # This is the child, which coverage doesn't follow. Changes to the
+        # directory, env and file descriptors here don't affect anything else.
+        server.close()
+        try:
+            handle(connection, cli)
+        finally:
+            os._exit(0)  # pylint: disable=protected-access
+
+    return pid
+
+
+def _reap(children):
+    for pid in list(children):
+        finished, _ = os.waitpid(pid, os.WNOHANG)
+        if finished:
+            children.discard(pid)
+
+
+def handle(connection, cli):
+    """Run a single request from a connection and send back the result."""
+
+    # The timeout is inherited from the server, but commands can take a while
+    connection.settimeout(None)
+
+    with connection.makefile("rwb") as stream:
+        request = json.loads(stream.readline())
+        returncode, output = run(cli, request["args"], request["cwd"], request["env"])
+
+        stream.write(
+            json.dumps({"returncode": returncode, "output": output}).encode("utf-8")
+            + b"\n"
+        )
+
+
+def run(cli, args, cwd, env):
+    """Run a `pip-tools` command in this process, as if run from a shell.
+
+    :param cli: The `pip-tools` click command
+    :param args: The arguments to pass to it, like `["compile", "file.in"]`
+    :param cwd: The directory to run it in
+    :param env: The environment variables to run it with
+    :return: A tuple of the exit code and the combined stdout and stderr,
+        including anything from processes the command starts
+    """
+    with tempfile.TemporaryFile() as output:
+        with _environment(cwd, env), _redirect_output(output):
+            returncode = _call(cli, args)
+
+        output.seek(0)
+        return returncode, output.read().decode("utf-8", errors="replace")
+
+
+@contextmanager
+def _redirect_output(output):
+    # `pip-sync` runs `pip` in a subprocess, which writes straight to the file
+    # descriptors, so redirect those as well as `sys.stdout` and `sys.stderr`
+    with _redirect_fds(output.fileno()), open(
+        output.fileno(), "w", buffering=1, encoding="utf-8", closefd=False
+    ) as stream:
+        with redirect_stdout(stream), redirect_stderr(stream):
+            yield
+
+
+@contextmanager
+def _redirect_fds(fileno):
+    sys.stdout.flush()
+    sys.stderr.flush()
+    original_fds = [os.dup(1), os.dup(2)]
+    os.dup2(fileno, 1)
+    os.dup2(fileno, 2)
+
+    try:
+        yield
+    finally:
+        for fd, original_fd in enumerate(original_fds, start=1):
+            os.dup2(original_fd, fd)
+            os.close(original_fd)
+
+
+@contextmanager
+def _environment(cwd, env):
+    original_cwd, original_env = os.getcwd(), dict(os.environ)
+
+    os.chdir(cwd)
+    os.environ.clear()
+    os.environ.update(env)
+
+    try:
+        yield
+    finally:
+        os.chdir(original_cwd)
+        os.environ.clear()
+        os.environ.update(original_env)
+
+
+def _call(cli, args):
+    # pylint: disable=broad-exception-caught
+    try:
+        returncode = cli.main(args=args, prog_name="pip-tools", standalone_mode=False)
+    except SystemExit as err:
+        returncode = err.code
+    except Exception as err:
+        # Click exceptions know how to show themselves to the user
+        if hasattr(err, "show"):
+            err.show()
+        else:
+            traceback.print_exc()
+
+        returncode = getattr(err, "exit_code", 1)
+
+    if returncode is None or isinstance(returncode, int):
+        return returncode or 0
+
+    # Like `sys.exit("message")`
+    print(returncode, file=sys.stderr)
+    return 1
+
+
+def main(argv=None):
+    """Start the server from the command line."""
+
+    parser = ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("socket_path")
+    parser.add_argument("--idle-timeout", type=float, default=600)
+    args = parser.parse_args(argv)
+
+    # Import this once up front, so every request runs with it warm
+    # pylint: disable=import-outside-toplevel,import-error
+    from piptools.__main__ import cli
+
+    _warm_up()
+    return serve(args.socket_path, args.idle_timeout, cli)
+
+
+def _warm_up():
+    for module in WARM_MODULES:
+        # These are `pip` internals, so they might move between versions
+        with suppress(ImportError):
+            importlib.import_module(module)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main())
@@ -0,0 +1,103 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+
+class Timings:
+    """A record of how long each phase of our work took in each env."""
+
+    def __init__(self):
+        """Initialize a Timings object."""
+        self.events = []
+
+    @contextmanager
+    def phase(self, name, venv):
+        """Time the code run inside this context manager.
+
+        :param name: The name of the phase (like `pip-compile`)
+        :param venv: The tox virtual env this is happening for
+        """
+        start = time.time()
+        counter = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.events.append(
+                {
+                    "name": name,
+                    "env": venv.name,
+                    "start": start,
+                    "duration": time.perf_counter() - counter,
+                }
+            )
+
+    def totals(self, env_name):
+        """Get the total time spent in each phase for an env.
+
+        :param env_name: The name of the env to get totals for
+        :return: A dict of phase name to duration in seconds
+        """
+        totals = {}
+        for event in self.events:
+            if event["env"] == env_name:
+                totals[event["name"]] = totals.get(event["name"], 0) + event["duration"]
+
+        return totals
+
+    def summary(self):
+        """Get a human readable summary of the time spent in each env."""
+
+        lines = []
+        for env_name in dict.fromkeys(event["env"] for event in self.events):
+            phases = ", ".join(
+                f"{name} {duration:.2f}s"
+                for name, duration in self.totals(env_name).items()
+            )
+            lines.append(f"{env_name}: {phases}")
+
+        return "\n".join(lines)
+
+    def export(self, filename):
+        """Append the events to a file.
+
+        Files ending in `.jsonl` get one JSON object per line. Anything else is
+        written in Chrome's trace event format (the JSON array format, which
+        doesn't need to be closed) so it can be opened with `about:tracing` or
+        Perfetto. Either way, many runs can append to the same file.
+
+        :param filename: The file to write to
+        """
+        filename = Path(filename)
+        pid = os.getpid()
+
+        if filename.suffix == ".jsonl":
+            lines = [json.dumps(dict(event, pid=pid)) for event in self.events]
+        else:
+            lines = [
+                json.dumps(
+                    {
+                        "name": event["name"],
+                        "cat": event["env"],
+                        "ph": "X",
+                        "ts": int(event["start"] * 1e6),
+                        "dur": int(event["duration"] * 1e6),
+                        "pid": pid,
+                        "tid": event["env"],
+                    }
+                )
+                + ","
+                for event in self.events
+            ]
+            if not filename.exists() or not filename.stat().st_size:
+                lines.insert(0, "[")
+
+        # Write in one go, so parallel runs don't interleave their lines
+        with open(filename, "a", encoding="utf-8") as handle:
+            handle.write("".join(line + "\n" for line in lines))
+
+
+# The timings for this run of tox
+TIMINGS = Timings()
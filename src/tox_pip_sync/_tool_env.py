@@ -0,0 +1,135 @@
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+from tox.reporter import verbosity1
+
+from tox_pip_sync._cache import cache_dir, exclusive, python_tag
+
+
+class ToolEnv:
+    """A virtual env holding `pip-tools`, shared by all envs.
+
+    There is one of these for each implementation and version of Python,
+    which is used to compile requirements and sync any env using the same
+    version. This means we don't have to install `pip-tools` into every env
+    we work with.
+    """
+
+    # `--python-executable` for `pip-sync` requires this version or above
+    REQUIREMENTS = ("pip-tools>=6.8",)
+
+    def __init__(self, path):
+        """Initialize a ToolEnv object.
+
+        :param path: The location of the virtual env
+        """
+        self.path = Path(path)
+
+    @classmethod
+    def for_venv(cls, venv):
+        """Get the tool env to use for a virtual env, or None if disabled."""
+
+        config = venv.envconfig.config.tox_pip_sync
+        if not config["shared_tool_env"]:
+            return None
+
+        return cls(cache_dir(venv) / "tools" / python_tag(venv))
+
+    @property
+    def python(self):
+        """Get the Python executable for this env."""
+
+        if sys.platform == "win32":  # pragma: no cover
+            return self.path / "Scripts" / "python.exe"
+
+        return self.path / "bin" / "python"
+
+    def command(self, exe_name, venv):
+        """Get the command to run a `pip-tools` executable against an env.
+
+        :param exe_name: `pip-compile` or `pip-sync`
+        :param venv: The tox virtual env to act on
+        :return: A list of command line arguments
+        """
+        return [str(self.python), "-m", "piptools"] + self.arguments(exe_name, venv)
+
+    @staticmethod
+    def arguments(exe_name, venv):
+        """Get the arguments for `pip-tools` to run an executable against an env.
+
+        :param exe_name: `pip-compile` or `pip-sync`
+        :param venv: The tox virtual env to act on
+        :return: A list of arguments to follow `python -m piptools`
+        """
+        arguments = [exe_name[len("pip-") :]]
+
+        if exe_name == "pip-sync":
+            # Install into the tox env, rather than this one
+            arguments.extend(["--python-executable", str(venv.envconfig.envpython)])
+
+        return arguments
+
+    def ensure_exists(self, venv, action=None):
+        """Create this env if it doesn't already exist.
+
+        :param venv: The tox virtual env we are creating this for
+        :param action: The current tox action, or None to run the commands
+            outside of tox (like from our command line tool)
+        """
+        if self.python.exists():
+            return
+
+        lock_file = self.path.with_name(f"{self.path.name}.lock")
+        with exclusive(lock_file, "Waiting for another env to create pip-tools env"):
+            # Another process may have created it while we were waiting
+            if not self.python.exists():
+                self._create(venv, action)
+
+    def _create(self, venv, action):
+        verbosity1(f"Creating shared pip-tools env: '{self.path}'")
+
+        # Build somewhere else and then move it into place, so we never leave
+        # a half created env behind. We run everything with `python -m`, so
+        # there are no scripts pointing to the old location to worry about.
+        partial = self.path.with_name(f"{self.path.name}.{os.getpid()}.partial")
+        partial.parent.mkdir(parents=True, exist_ok=True)
+        build_env = ToolEnv(partial)
+
+        for command in (
+            # `virtualenv` comes with tox, and unlike `venv` it's always there
+            # (Debian and Ubuntu put `venv` in a separate package)
+            [
+                sys.executable,
+                "-m",
+                "virtualenv",
+                "--python",
+                str(venv.envconfig.python_info.executable),
+                str(partial),
+            ],
+            [str(build_env.python), "-m", "pip", "install"] + list(self.REQUIREMENTS),
+        ):
+            if action:
+                venv._pcall(  # pylint: disable=protected-access
+                    command,
+                    cwd=venv.envconfig.config.toxinidir,
+                    venv=False,
+                    action=action,
+                )
+            else:
+                subprocess.run(
+                    command,
+                    cwd=venv.envconfig.config.toxinidir,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    check=True,
+                )
+
+        # An old env is left behind when the Python it links to is removed
+        # or upgraded (like a new patch version with `pyenv`)
+        if self.path.exists():
+            shutil.rmtree(self.path)
+
+        partial.rename(self.path)
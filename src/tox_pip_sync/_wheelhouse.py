@@ -0,0 +1,149 @@
+import os
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from packaging.utils import InvalidWheelFilename, parse_wheel_filename
+from packaging.version import InvalidVersion, Version
+from tox.reporter import verbosity1
+
+from tox_pip_sync._cache import cache_dir, python_tag
+from tox_pip_sync._installed import PINNED, canonical_name
+from tox_pip_sync._requirements import PipRequirement, RequirementList
+
+
+class Wheelhouse:
+    """A local directory of wheels for pinned requirements.
+
+    This is shared by all envs using the same Python, so each wheel is only
+    fetched (or built) once and installs can happen without going to the
+    package index. Wheels built for one Python often won't install in another,
+    so each implementation and version of Python gets its own.
+    """
+
+    MAX_WORKERS = 8
+
+    def __init__(self, path):
+        """Initialize a Wheelhouse object.
+
+        :param path: The directory to store wheels in
+        """
+        self.path = Path(path)
+
+    @classmethod
+    def for_venv(cls, venv):
+        """Get the wheelhouse for a virtual env, or None if disabled."""
+
+        if not venv.envconfig.config.tox_pip_sync["wheelhouse"]:
+            return None
+
+        return cls(cache_dir(venv) / "wheels" / python_tag(venv))
+
+    def prefetch(self, venv, requirements_files):
+        """Make sure there are wheels for everything in requirements files.
+
+        :param venv: The virtual env the wheels will be installed in
+        :param requirements_files: Compiled requirements files to read
+        :return: A list of arguments for `pip` to install from the wheelhouse
+        """
+        root_dir = Path(venv.envconfig.config.toxinidir)
+        pins, all_pinned = self._read_pins(
+            root_dir / filename for filename in requirements_files
+        )
+
+        missing = self._missing(pins)
+        if missing:
+            verbosity1(f"Fetching {len(missing)} wheel(s) into '{self.path}'")
+            self.path.mkdir(parents=True, exist_ok=True)
+
+            # Use the env's settings, so `pip` goes to any index set for it
+            env = venv._get_os_environ()  # pylint: disable=protected-access
+            with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+                list(
+                    executor.map(
+                        lambda pin: self._fetch(venv.envconfig.envpython, pin, env),
+                        missing,
+                    )
+                )
+
+            # Check what actually arrived, rather than trusting `pip`
+            missing = self._missing(pins)
+
+        arguments = ["--find-links", str(self.path)]
+        if all_pinned and not missing:
+            # Everything we need is here, so there's no need to look elsewhere
+            arguments.append("--no-index")
+
+        return arguments
+
+    def _missing(self, pins):
+        available = set()
+        for wheel in self.path.glob("*.whl"):
+            try:
+                name, version, _, _ = parse_wheel_filename(wheel.name)
+            except (InvalidWheelFilename, InvalidVersion):
+                continue
+
+            available.add((canonical_name(name), version))
+
+        return [pin for pin in pins if (pin[0], _version(pin[1])) not in available]
+
+    @staticmethod
+    def _read_pins(filenames):
+        pins = []
+        all_pinned = True
+
+        for filename in filenames:
+            for req in RequirementList.iter_requirements_file(filename):
+                match = None
+                # Wheels we build might not match any hashes given
+                if req.arg_type == PipRequirement.ArgType.NONE and not req.options:
+                    match = PINNED.match(req.requirement)
+
+                if not match:
+                    all_pinned = False
+                    continue
+
+                pins.append(
+                    (canonical_name(match.group("name")), match.group("version"))
+                )
+
+        return pins, all_pinned
+
+    def _fetch(self, python, pin, env):
+        name, version = pin
+
+        # Build in a private directory and move the results in, so other
+        # processes never see a partially written wheel
+        with tempfile.TemporaryDirectory(dir=self.path) as build_dir:
+            result = subprocess.run(
+                [
+                    str(python),
+                    "-m",
+                    "pip",
+                    "wheel",
+                    "--no-deps",
+                    "--wheel-dir",
+                    build_dir,
+                    f"{name}=={version}",
+                ],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                env=env,
+                check=False,
+            )
+            if result.returncode:
+                verbosity1(f"Could not fetch a wheel for {name}=={version}")
+                return
+
+            for wheel in Path(build_dir).glob("*.whl"):
+                os.replace(wheel, self.path / wheel.name)
+
+
+def _version(version):
+    # Compare versions by what they mean, so `1.0` matches a wheel for `1.0.0`
+    try:
+        return Version(version)
+    except InvalidVersion:
+        return version
@@ -0,0 +1,47 @@
+import json
+import re
+import subprocess
+import sys
+
+# How much importing the plugin can add to starting tox, in microseconds
+IMPORT_BUDGET = 10_000
+
+
+class TestImportTime:
+    def test_importing_the_plugin_imports_nothing_else(self):
+        new_modules = json.loads(
+            self._run_python(
+                "import json, sys, tox",
+                "before = set(sys.modules)",
+                "import tox_pip_sync",
+                "print(json.dumps(sorted(set(sys.modules) - before)))",
+            ).stdout
+        )
+
+        assert new_modules == ["tox_pip_sync"]
+
+    def test_importing_the_plugin_is_within_budget(self):
+        # Take the best of a few runs to smooth out noise from the machine
+        import_time = min(self._import_time() for _ in range(3))
+
+        assert import_time < IMPORT_BUDGET
+
+    def _import_time(self):
+        result = self._run_python("import tox", "import tox_pip_sync", importtime=True)
+
+        # Lines look like: `import time: self [us] | cumulative | package`
+        match = re.search(r"\|\s*(\d+)\s*\|\s*tox_pip_sync$", result.stderr, re.M)
+        return int(match.group(1))
+
+    @staticmethod
+    def _run_python(*lines, importtime=False):
+        command = [sys.executable]
+        if importtime:
+            command.extend(["-X", "importtime"])
+
+        return subprocess.run(
+            command + ["-c", "; ".join(lines)],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
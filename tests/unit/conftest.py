@@ -5,6 +5,41 @@ from tox.action import Action
 from tox.config import TestenvConfig as EnvConfig
 from tox.venv import VirtualEnv
 
+from tox_pip_sync._config import default_config
+from tox_pip_sync._events import EVENTS
+from tox_pip_sync._requirements import SESSION
+from tox_pip_sync._timing import TIMINGS
+
+
+@pytest.fixture(autouse=True)
+def cache_home(tmp_path_factory, monkeypatch):
+    # Make sure we never write to the real user cache
+    cache_home = tmp_path_factory.mktemp("cache_home")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(cache_home))
+
+    return cache_home
+
+
+@pytest.fixture(autouse=True)
+def timings():
+    # Timings are recorded for the whole run, so don't let them leak
+    yield TIMINGS
+    TIMINGS.events.clear()
+
+
+@pytest.fixture(autouse=True)
+def events():
+    # So are the decisions we've made
+    yield EVENTS
+    EVENTS.events.clear()
+
+
+@pytest.fixture(autouse=True)
+def session_cache():
+    # So are the files and hashes we've worked out
+    yield SESSION
+    SESSION.clear()
+
 
 @pytest.fixture
 def action():
@@ -27,6 +62,7 @@ def venv(tmpdir):
     # things onto this as it runs in tox
     venv = create_autospec(venv_model, instance=True)
     venv._pcall.return_value = "Some command output"  # pylint: disable=protected-access
+    venv.name = "env_name"
 
     venv.path = tmpdir / ".tox"
     venv.path.mkdir()
@@ -37,5 +73,9 @@ def venv(tmpdir):
     venv.envconfig.envbindir.mkdir()
 
     venv.envconfig.config.setupdir = tmpdir
+    venv.envconfig.config.tox_pip_sync = default_config()
+    venv.envconfig.python_info.executable = "/usr/bin/python3.9"
+    venv.envconfig.python_info.implementation = "CPython"
+    venv.envconfig.python_info.version_info = (3, 9, 1, "final", 0)
 
     return venv
@@ -1,34 +1,36 @@
+import json
 from unittest.mock import create_autospec, sentinel
 
 import pytest
 from h_matchers import Any
 from tox.config import Config
+from tox.session import Session
 
 from tox_pip_sync import (
+    tox_cleanup,
     tox_configure,
     tox_runenvreport,
     tox_runtest_pre,
     tox_testenv_create,
     tox_testenv_install_deps,
 )
+from tox_pip_sync._config import default_config
 
 
 class TestToxConfigure:
     def test_it_sets_the_config(self, load_config, config):
         tox_configure(config)
 
-        load_config.assert_called_once_with(config.setupdir)
+        load_config.assert_called_once_with(config)
         assert config.tox_pip_sync == load_config.return_value
 
     @pytest.fixture
     def load_config(self, patch):
-        return patch("tox_pip_sync.load_config")
+        return patch("tox_pip_sync._config.load_config")
 
     @pytest.fixture
     def config(self):
-        config = create_autospec(Config)
-        config.setupdir = sentinel.setupdir
-        return config
+        return create_autospec(Config)
 
 
 class TestRunenvreport:
@@ -36,7 +38,7 @@ class TestRunenvreport:
         "skip_listing,expected", ((True, Any.list.of_size(at_least=1)), (False, None))
     )
     def test_it(self, skip_listing, expected, venv, action):
-        venv.envconfig.config.tox_pip_sync = {"skip_listing": skip_listing}
+        venv.envconfig.config.tox_pip_sync["skip_listing"] = skip_listing
 
         result = tox_runenvreport(venv, action)
 
@@ -53,14 +55,26 @@ class TestToxTestenvCreate:
         # We don't want to interfere
         assert not result
 
+    def test_it_starts_compiling_in_the_background(
+        self, venv, action, BackgroundCompile
+    ):
+        tox_testenv_create(venv, action)
+
+        BackgroundCompile.start.assert_called_once_with(venv)
+        assert venv.background_compile == BackgroundCompile.start.return_value
+
     @pytest.fixture(autouse=True)
     def clear_compiled_files(self, patch):
-        return patch("tox_pip_sync.clear_compiled_files")
+        return patch("tox_pip_sync._pip_sync.clear_compiled_files")
+
+    @pytest.fixture(autouse=True)
+    def BackgroundCompile(self, patch):
+        return patch("tox_pip_sync._background.BackgroundCompile")
 
 
 class TestToxTestenvInstallDeps:
     def test_it(self, venv, action, pip_sync):
-        venv.envconfig.config.tox_pip_sync = {"enable_hashing": sentinel.enable_hashing}
+        venv.envconfig.config.tox_pip_sync["enable_hashing"] = sentinel.enable_hashing
 
         result = tox_testenv_install_deps(venv, action)
 
@@ -73,7 +87,7 @@ class TestToxTestenvInstallDeps:
 
     @pytest.fixture(autouse=True)
     def pip_sync(self, patch):
-        return patch("tox_pip_sync.pip_sync")
+        return patch("tox_pip_sync._pip_sync.pip_sync")
 
 
 class TestToxRuntestPre:
@@ -97,3 +111,63 @@ class TestToxRuntestPre:
     @pytest.fixture(autouse=True)
     def tox_testenv_install_deps(self, patch):
         return patch("tox_pip_sync.tox_testenv_install_deps")
+
+
+class TestToxCleanup:
+    def test_it_reports_timings(self, session, timings, verbosity1):
+        tox_cleanup(session)
+
+        verbosity1.assert_called_once_with(Any.string.containing(timings.summary()))
+
+    def test_it_exports_timings(self, session, tmp_path):
+        session.config.tox_pip_sync["trace_file"] = "trace.jsonl"
+
+        tox_cleanup(session)
+
+        assert (tmp_path / "trace.jsonl").exists()
+
+    def test_it_writes_the_event_log(self, session, venv, events, tmp_path):
+        session.config.tox_pip_sync["cache_dir"] = str(tmp_path)
+        with events.decision("sync", venv) as event:
+            event.update(outcome="skip", reason="hash-match")
+
+        tox_cleanup(session)
+
+        log = (tmp_path / "events.jsonl").read_text(encoding="utf-8")
+        assert json.loads(log) == Any.dict.containing({"outcome": "skip"})
+
+    def test_it_can_have_the_event_log_disabled(self, session, venv, events, tmp_path):
+        session.config.tox_pip_sync.update(cache_dir=str(tmp_path), event_log=False)
+        with events.decision("sync", venv) as event:
+            event.update(outcome="skip", reason="hash-match")
+
+        tox_cleanup(session)
+
+        assert not (tmp_path / "events.jsonl").exists()
+
+    def test_it_does_nothing_without_timings(self, session, timings, verbosity1):
+        timings.events.clear()
+        session.config.tox_pip_sync["trace_file"] = "trace.jsonl"
+
+        tox_cleanup(session)
+
+        verbosity1.assert_not_called()
+
+    @pytest.fixture
+    def session(self, tmp_path):
+        session = create_autospec(Session, instance=True)
+        session.config = create_autospec(Config)
+        session.config.toxinidir = tmp_path
+        session.config.tox_pip_sync = default_config()
+        return session
+
+    @pytest.fixture(autouse=True)
+    def timings(self, timings, venv):
+        with timings.phase("hash", venv):
+            pass
+
+        return timings
+
+    @pytest.fixture
+    def verbosity1(self, patch):
+        return patch("tox.reporter.verbosity1")
@@ -0,0 +1,132 @@
+import io
+import json
+import tarfile
+from pathlib import Path
+
+import pytest
+from tox.config import parseconfig
+from tox.exception import ConfigError
+
+from tox_pip_sync._archive import export_archive, import_archive
+from tox_pip_sync._cache import CompileCache, default_cache_dir
+
+
+class TestExportArchive:
+    def test_it_exports_the_compiled_files(self, tox_config, archive):
+        exported = export_archive(tox_config, archive)
+
+        assert exported == {"abcd-cpython3.9": ["a", "b"], "ef01-cpython3.10": ["c"]}
+        with tarfile.open(archive) as tar:
+            manifest = json.loads(tar.extractfile("manifest.json").read())
+            compiled = tar.extractfile("compiled/abcd-cpython3.9.txt").read().decode()
+
+        assert manifest["compiled"] == exported
+        assert manifest["envs"]["a"] == {"hash": "abcd", "python": "cpython3.9"}
+        assert compiled == "-e file://${TOX_PIP_SYNC_ROOT}\npackage==1.0"
+
+    def test_it_skips_envs_which_have_not_been_synced(self, tox_config, archive):
+        exported = export_archive(tox_config, archive)
+
+        assert "not_synced" not in sum(exported.values(), [])
+
+    def test_it_skips_envs_synced_by_older_versions(self, tox_config, archive):
+        # Older versions didn't record the Python implementation
+        (Path(tox_config.envconfigs["c"].envdir) / "tox-pip-sync.json").write_text(
+            json.dumps({"hash": "ef01", "python": "3.10"}), encoding="utf-8"
+        )
+
+        exported = export_archive(tox_config, archive)
+
+        assert exported == {"abcd-cpython3.9": ["a", "b"]}
+
+
+class TestImportArchive:
+    def test_it_imports_into_the_compile_cache(self, tox_config, archive, tmp_path):
+        export_archive(tox_config, archive)
+
+        imported = import_archive(tox_config, archive)
+
+        assert sorted(imported) == ["abcd-cpython3.9", "ef01-cpython3.10"]
+        target = tmp_path / "out.txt"
+        assert cache().get("abcd-cpython3.9", target, root_dir="/new/checkout")
+        assert target.read_text(encoding="utf-8") == (
+            "-e file:///new/checkout\npackage==1.0"
+        )
+
+    def test_it_skips_keys_already_in_the_cache(self, tox_config, archive):
+        export_archive(tox_config, archive)
+        import_archive(tox_config, archive)
+
+        assert not import_archive(tox_config, archive)
+
+    def test_it_requires_the_compile_cache(self, tox_config, archive):
+        tox_config.tox_pip_sync["compile_cache"] = False
+
+        with pytest.raises(ConfigError):
+            import_archive(tox_config, archive)
+
+    @pytest.mark.parametrize(
+        "files,message",
+        (
+            ({}, "Missing 'manifest.json'"),
+            ({"manifest.json": {"version": 0}}, "Unsupported archive version"),
+            (
+                {"manifest.json": {"version": 1, "compiled": {"../../evil": []}}},
+                "Invalid key",
+            ),
+            (
+                {"manifest.json": {"version": 1, "compiled": {"abcd-cpython3.9": []}}},
+                "Missing 'compiled/abcd-cpython3.9.txt'",
+            ),
+        ),
+    )
+    def test_it_rejects_bad_archives(self, tox_config, archive, files, message):
+        with tarfile.open(archive, "w:gz") as tar:
+            for name, content in files.items():
+                data = json.dumps(content).encode("utf-8")
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+
+        with pytest.raises(ValueError, match=message):
+            import_archive(tox_config, archive)
+
+
+def cache():
+    return CompileCache(default_cache_dir())
+
+
+@pytest.fixture
+def tox_config(tmp_path, monkeypatch):
+    (tmp_path / "tox.ini").write_text(
+        "\n".join(
+            ["[tox]", "envlist = a,b,c,not_synced", "skipsdist = true", "[testenv]"]
+        ),
+        encoding="utf-8",
+    )
+    for env_name, requirements_hash, python in (
+        ("a", "abcd", "cpython3.9"),
+        ("b", "abcd", "cpython3.9"),
+        ("c", "ef01", "cpython3.10"),
+    ):
+        env_dir = tmp_path / ".tox" / env_name
+        env_dir.mkdir(parents=True)
+        (env_dir / "tox-pip-sync.json").write_text(
+            json.dumps({"hash": requirements_hash, "python": python}),
+            encoding="utf-8",
+        )
+        (env_dir / f"tox-pip-sync_{requirements_hash}.txt").write_text(
+            f"-e file://{tmp_path}\npackage==1.0", encoding="utf-8"
+        )
+
+    (tmp_path / ".tox" / "not_synced").mkdir()
+    monkeypatch.chdir(tmp_path)
+
+    return parseconfig(["-c", str(tmp_path / "tox.ini")])
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive_dir = tmp_path / "archive"
+    archive_dir.mkdir()
+    return archive_dir / "compiled.tar.gz"
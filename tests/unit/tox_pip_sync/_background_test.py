@@ -0,0 +1,176 @@
+import subprocess
+from contextlib import contextmanager
+from pathlib import Path
+
+import pytest
+from h_matchers import Any
+from tox.config import DepConfig
+
+from tox_pip_sync._background import BackgroundCompile
+from tox_pip_sync._cache import CompileCache
+from tox_pip_sync._requirements import RequirementList
+from tox_pip_sync._tool_env import ToolEnv
+
+
+class TestBackgroundCompile:
+    def test_it_compiles_into_the_cache(self, venv, run, cache):
+        background = BackgroundCompile.start(venv)
+        background.join()
+
+        run.assert_called_once_with(
+            ToolEnv.for_venv(venv).command("pip-compile", venv)
+            + [Any.string.matching(".*/requirements.in$")],
+            cwd=venv.envconfig.config.toxinidir,
+            env=venv._get_os_environ.return_value,  # pylint: disable=protected-access
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            check=True,
+        )
+        assert background.cache_key in cache
+        assert not background.work_dir.exists()
+
+    def test_it_compiles_under_the_key_used_when_installing(self, venv, run, cache):
+        venv.envconfig.config.tox_pip_sync["raw_file_hashing"] = True
+        (venv.envconfig.config.setupdir / "base.txt").write_text("# Base", "utf-8")
+        venv.envconfig.deps.append(DepConfig("-c base.txt"))
+        requirements, _, _ = self._requirements_cache_and_tool_env(venv)
+        raw_hash = requirements.hash(venv.envconfig.config.setupdir, raw_files=True)
+
+        BackgroundCompile.start(venv).join()
+
+        assert run.call_count == 1
+        assert cache.key(raw_hash, venv) in cache
+
+    def test_it_writes_requirements_relative_to_the_env(self, venv, run):
+        (venv.envconfig.config.setupdir / "constraints.txt").write_text("", "utf-8")
+        venv.envconfig.deps.append(DepConfig("-c constraints.txt"))
+
+        BackgroundCompile.start(venv).join()
+
+        unpinned = Path(run.call_args[0][0][-1])
+        assert unpinned.parent.parent == Path(venv.path.dirpath())
+        assert run.unpinned_content == "package\n-c ../../constraints.txt"
+
+    def test_it_starts_from_the_previous_compiled_file(self, venv, run):
+        (venv.path / "tox-pip-sync_old.txt").write_text("package==1.0", "utf-8")
+
+        BackgroundCompile.start(venv).join()
+
+        assert run.seed == "package==1.0"
+
+    def test_it_does_not_compile_if_the_cache_is_filled_while_waiting(self, venv, run):
+        requirements, cache, tool_env = self._requirements_cache_and_tool_env(venv)
+        background = BackgroundCompile(venv, requirements, cache, tool_env)
+
+        @contextmanager
+        def lock(key):
+            # Another process compiles this while we wait for the lock
+            self._fill(cache, key)
+            yield
+
+        cache.lock = lock
+
+        background._run(seed=None, env=None)  # pylint: disable=protected-access
+
+        run.assert_not_called()
+
+    def test_it_reports_errors_without_raising(self, venv, run, verbosity1):
+        run.side_effect = subprocess.CalledProcessError(1, "pip-compile")
+
+        background = BackgroundCompile.start(venv)
+        background.join()
+
+        assert isinstance(background.error, subprocess.CalledProcessError)
+        verbosity1.assert_called_with(Any.string.containing("failed"))
+        assert not background.work_dir.exists()
+
+    @pytest.mark.parametrize(
+        "config", ({"background_compile": False}, {"compile_cache": False})
+    )
+    def test_it_does_nothing_if_disabled(self, venv, run, config):
+        venv.envconfig.config.tox_pip_sync.update(config)
+
+        assert BackgroundCompile.start(venv) is None
+        run.assert_not_called()
+
+    @pytest.mark.parametrize("config", ({"shared_tool_env": False}, {}))
+    def test_it_does_nothing_without_an_existing_tool_env(
+        self, venv, run, tool_env, config
+    ):
+        tool_env.python.unlink()
+        venv.envconfig.config.tox_pip_sync.update(config)
+
+        assert BackgroundCompile.start(venv) is None
+        run.assert_not_called()
+
+    def test_it_does_nothing_if_there_is_nothing_to_compile(self, venv, run):
+        venv.envconfig.deps = [DepConfig("-r requirements.txt")]
+
+        assert BackgroundCompile.start(venv) is None
+        run.assert_not_called()
+
+    def test_it_does_nothing_if_the_dependencies_are_already_pinned(
+        self, venv, run, tmp_path
+    ):
+        (tmp_path / "requirements.txt").write_text("package==1.0", encoding="utf-8")
+        venv.envconfig.config.toxinidir = tmp_path
+        venv.envconfig.deps = [DepConfig("-r requirements.txt"), DepConfig("package")]
+
+        assert BackgroundCompile.start(venv) is None
+        run.assert_not_called()
+
+    def test_it_does_nothing_if_already_cached(self, venv, run, cache):
+        requirements, _, _ = self._requirements_cache_and_tool_env(venv)
+        self._fill(
+            cache, cache.key(requirements.hash(venv.envconfig.config.setupdir), venv)
+        )
+
+        assert BackgroundCompile.start(venv) is None
+        run.assert_not_called()
+
+    @staticmethod
+    def _requirements_cache_and_tool_env(venv):
+        return (
+            RequirementList.from_strings(dep.name for dep in venv.envconfig.deps),
+            CompileCache.for_venv(venv),
+            ToolEnv.for_venv(venv),
+        )
+
+    @staticmethod
+    def _fill(cache, key):
+        entry = cache.path / "compiled" / f"{key}.txt"
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        entry.write_text("package==1.0", encoding="utf-8")
+
+    @pytest.fixture(autouse=True)
+    def venv(self, venv):
+        venv.envconfig.deps = [DepConfig("package")]
+        return venv
+
+    @pytest.fixture
+    def cache(self, venv):
+        return CompileCache.for_venv(venv)
+
+    @pytest.fixture(autouse=True)
+    def tool_env(self, venv):
+        tool_env = ToolEnv.for_venv(venv)
+        tool_env.python.parent.mkdir(parents=True)
+        tool_env.python.touch()
+        return tool_env
+
+    @pytest.fixture
+    def run(self, patch):
+        def fake_pip_compile(args, **_kwargs):
+            unpinned = Path(args[-1])
+            pinned = unpinned.with_suffix(".txt")
+            run.unpinned_content = unpinned.read_text(encoding="utf-8")
+            run.seed = pinned.read_text(encoding="utf-8") if pinned.exists() else None
+            pinned.write_text("package==1.0", encoding="utf-8")
+
+        run = patch("tox_pip_sync._background.subprocess.run")
+        run.side_effect = fake_pip_compile
+        return run
+
+    @pytest.fixture(autouse=True)
+    def verbosity1(self, patch):
+        return patch("tox_pip_sync._background.verbosity1")
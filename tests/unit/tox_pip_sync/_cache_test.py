@@ -0,0 +1,210 @@
+import os
+import time
+from threading import Event, Thread
+
+import pytest
+from filelock import FileLock, Timeout
+from h_matchers import Any
+
+from tox_pip_sync._cache import (
+    ROOT_PLACEHOLDER,
+    CompileCache,
+    cache_dir,
+    default_cache_dir,
+    exclusive,
+    make_relocatable,
+    python_tag,
+    relocate,
+)
+
+
+class TestCompileCache:
+    def test_it_round_trips_files(self, cache, tmp_path):
+        source = tmp_path / "source.txt"
+        source.write_text("package==1.0", encoding="utf-8")
+        target = tmp_path / "target.txt"
+
+        cache.put("key", source, root_dir="/project")
+
+        assert cache.get("key", target, root_dir="/project")
+        assert target.read_text(encoding="utf-8") == "package==1.0"
+
+    def test_it_relocates_files(self, cache, tmp_path):
+        source = tmp_path / "source.txt"
+        source.write_text("-e file:///project\n# via -r /project/a.in", "utf-8")
+        target = tmp_path / "target.txt"
+
+        cache.put("key", source, root_dir="/project")
+        cache.get("key", target, root_dir="/elsewhere")
+
+        assert target.read_text(encoding="utf-8") == (
+            "-e file:///elsewhere\n# via -r /elsewhere/a.in"
+        )
+
+    def test_contains(self, cache, tmp_path):
+        self._add_entries(cache, tmp_path, "key")
+
+        assert "key" in cache
+        assert "missing" not in cache
+
+    def test_put_keeps_the_cache_under_the_maximum_size(self, cache, tmp_path):
+        cache.max_size = 0
+
+        (entry,) = self._add_entries(cache, tmp_path, "key")
+
+        assert not entry.exists()
+
+    def test_lock(self, cache, exclusive):
+        lock = cache.lock("key")
+
+        exclusive.assert_called_once_with(
+            cache.path / "locks" / "key.lock", waiting_message=Any.string()
+        )
+        assert lock == exclusive.return_value
+
+    def test_get_returns_False_for_missing_entries(self, cache, tmp_path):
+        target = tmp_path / "target.txt"
+
+        assert not cache.get("missing", target, root_dir="/project")
+        assert not target.exists()
+
+    def test_evict_removes_old_entries(self, cache, tmp_path):
+        old, new = self._add_entries(cache, tmp_path, "old", "new")
+        os.utime(old, (0, 0))
+
+        cache.evict()
+
+        assert not old.exists()
+        assert new.exists()
+
+    def test_evict_removes_least_recently_used_entries_when_too_big(
+        self, cache, tmp_path
+    ):
+        old, used, new = self._add_entries(cache, tmp_path, "old", "used", "new")
+        for days_ago, entry in enumerate((new, used, old), start=1):
+            mtime = time.time() - days_ago * 60 * 60 * 24
+            os.utime(entry, (mtime, mtime))
+        cache.max_size = 15
+        cache.get("used", tmp_path / "target.txt", root_dir="/project")
+
+        cache.evict()
+
+        assert not old.exists()
+        assert not new.exists()
+        assert used.exists()
+
+    def test_for_venv(self, venv, tmp_path):
+        venv.envconfig.config.tox_pip_sync["cache_dir"] = str(tmp_path)
+
+        cache = CompileCache.for_venv(venv)
+
+        assert cache.path == tmp_path
+
+    def test_for_venv_uses_the_default_path(self, venv):
+        cache = CompileCache.for_venv(venv)
+
+        assert cache.path == default_cache_dir()
+
+    def test_for_venv_returns_None_if_disabled(self, venv):
+        venv.envconfig.config.tox_pip_sync["compile_cache"] = False
+
+        assert CompileCache.for_venv(venv) is None
+
+    def test_key(self, venv):
+        assert CompileCache.key("0000", venv) == "0000-cpython3.9"
+
+    @staticmethod
+    def _add_entries(cache, tmp_path, *keys):
+        source = tmp_path / "source.txt"
+        source.write_text("package==1.0", encoding="utf-8")
+
+        for key in keys:
+            cache.put(key, source, root_dir="/project")
+
+        return [cache.path / "compiled" / f"{key}.txt" for key in keys]
+
+    @pytest.fixture
+    def exclusive(self, patch):
+        return patch("tox_pip_sync._cache.exclusive")
+
+    @pytest.fixture
+    def cache(self, tmp_path):
+        return CompileCache(tmp_path / "cache")
+
+
+class TestExclusive:
+    def test_it_holds_a_lock(self, tmp_path):
+        lock_file = tmp_path / "locks" / "file.lock"
+
+        with exclusive(lock_file, waiting_message="Waiting"):
+            with pytest.raises(Timeout):
+                FileLock(str(lock_file)).acquire(timeout=0)
+
+        FileLock(str(lock_file)).acquire(timeout=0)
+
+    def test_it_waits_for_other_processes(self, tmp_path, verbosity1):
+        lock_file = tmp_path / "file.lock"
+        locked = Event()
+
+        def other_process():
+            with FileLock(str(lock_file)):
+                locked.set()
+                time.sleep(0.1)
+
+        Thread(target=other_process).start()
+        locked.wait()
+
+        with exclusive(lock_file, waiting_message="Waiting"):
+            verbosity1.assert_called_once_with("Waiting")
+
+    @pytest.fixture
+    def verbosity1(self, patch):
+        return patch("tox_pip_sync._cache.verbosity1")
+
+
+class TestDefaultCacheDir:
+    def test_it(self, cache_home):
+        assert default_cache_dir() == cache_home / "tox-pip-sync"
+
+    def test_it_falls_back_to_home(self, monkeypatch, tmp_path):
+        monkeypatch.delenv("XDG_CACHE_HOME")
+        monkeypatch.setenv("HOME", str(tmp_path))
+
+        assert default_cache_dir() == tmp_path / ".cache" / "tox-pip-sync"
+
+
+class TestCacheDir:
+    def test_it(self, venv, tmp_path):
+        venv.envconfig.config.tox_pip_sync["cache_dir"] = str(tmp_path)
+
+        assert cache_dir(venv) == tmp_path
+
+    def test_it_uses_the_default(self, venv):
+        assert cache_dir(venv) == default_cache_dir()
+
+
+def test_python_tag(venv):
+    assert python_tag(venv) == "cpython3.9"
+
+
+def test_python_tag_includes_the_implementation(venv):
+    venv.envconfig.python_info.implementation = "PyPy"
+
+    assert python_tag(venv) == "pypy3.9"
+
+
+class TestRelocation:
+    @pytest.mark.parametrize(
+        "text,expected",
+        (
+            ("-e file:///project", f"-e file://{ROOT_PLACEHOLDER}"),
+            ("/project/setup.py", f"{ROOT_PLACEHOLDER}/setup.py"),
+            ("/project[tests]", f"{ROOT_PLACEHOLDER}[tests]"),
+            ("/project-2", "/project-2"),
+        ),
+    )
+    def test_make_relocatable(self, text, expected):
+        assert make_relocatable(text, "/project") == expected
+
+    def test_relocate(self):
+        assert relocate(f"-e file://{ROOT_PLACEHOLDER}", "/new") == "-e file:///new"
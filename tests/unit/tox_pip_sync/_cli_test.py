@@ -0,0 +1,221 @@
+import json
+import tarfile
+from types import SimpleNamespace
+from unittest.mock import sentinel
+
+import pytest
+from tox.exception import ConfigError
+
+from tox_pip_sync._cli import main
+from tox_pip_sync._config import default_config
+from tox_pip_sync._events import event_log_file
+
+
+class TestCompileCommand:
+    def test_it_compiles_the_requirements(self, parseconfig, Precompile, capsys):
+        assert not main(["compile", "-c", "setup.cfg", "-e", "a,b", "-j", "3"])
+
+        parseconfig.assert_called_once_with(["-c", "setup.cfg"])
+        Precompile.assert_called_once_with(parseconfig.return_value)
+        precompile = Precompile.return_value
+        precompile.jobs.assert_called_once_with(["a", "b"])
+        precompile.run.assert_called_once_with(
+            precompile.jobs.return_value, max_workers=3
+        )
+        assert "Compiled a, b" in capsys.readouterr().out
+
+    def test_it_uses_the_defaults(self, parseconfig, Precompile):
+        main(["compile"])
+
+        parseconfig.assert_called_once_with([])
+        Precompile.return_value.jobs.assert_called_once_with(None)
+        Precompile.return_value.run.assert_called_once_with(
+            Precompile.return_value.jobs.return_value, max_workers=None
+        )
+
+    def test_it_reports_errors(self, Precompile, capsys):
+        Precompile.return_value.run.return_value = [
+            ("key", [SimpleNamespace(name="a")], ValueError("oh no"))
+        ]
+
+        assert main(["compile"]) == 1
+
+        assert "Failed to compile a: oh no" in capsys.readouterr().err
+
+    def test_it_does_nothing_if_there_are_no_jobs(self, Precompile, capsys):
+        Precompile.return_value.jobs.return_value = {}
+
+        assert not main(["compile"])
+
+        Precompile.return_value.run.assert_not_called()
+        assert "Nothing to compile" in capsys.readouterr().out
+
+    @pytest.mark.parametrize("failing", ("init", "jobs"))
+    def test_it_reports_config_errors(self, Precompile, capsys, failing):
+        if failing == "init":
+            Precompile.side_effect = ConfigError("bad config")
+        else:
+            Precompile.return_value.jobs.side_effect = ConfigError("bad config")
+
+        assert main(["compile"]) == 1
+
+        assert "bad config" in capsys.readouterr().err
+
+    @pytest.fixture(autouse=True)
+    def parseconfig(self, patch):
+        return patch("tox_pip_sync._cli.parseconfig")
+
+    @pytest.fixture(autouse=True)
+    def Precompile(self, patch):
+        Precompile = patch("tox_pip_sync._cli.Precompile")
+        Precompile.return_value.jobs.return_value = {"key": sentinel.venvs}
+        Precompile.return_value.run.return_value = [
+            ("key", [SimpleNamespace(name="a"), SimpleNamespace(name="b")], None)
+        ]
+        return Precompile
+
+
+class TestExportCommand:
+    def test_it(self, parseconfig, export_archive, capsys):
+        export_archive.return_value = {"abcd-cpython3.9": ["a", "b"]}
+
+        assert not main(["export", "compiled.tar.gz", "-c", "setup.cfg"])
+
+        parseconfig.assert_called_once_with(["-c", "setup.cfg"])
+        export_archive.assert_called_once_with(
+            parseconfig.return_value, "compiled.tar.gz"
+        )
+        out = capsys.readouterr().out
+        assert "Exported a, b" in out
+        assert "Wrote 1 compiled file(s) to 'compiled.tar.gz'" in out
+
+    @pytest.fixture(autouse=True)
+    def parseconfig(self, patch):
+        return patch("tox_pip_sync._cli.parseconfig")
+
+    @pytest.fixture
+    def export_archive(self, patch):
+        return patch("tox_pip_sync._cli.export_archive")
+
+
+class TestImportCommand:
+    def test_it(self, parseconfig, import_archive, capsys):
+        import_archive.return_value = ["abcd-cpython3.9"]
+
+        assert not main(["import", "compiled.tar.gz"])
+
+        parseconfig.assert_called_once_with([])
+        import_archive.assert_called_once_with(
+            parseconfig.return_value, "compiled.tar.gz"
+        )
+        assert "Imported 1 compiled file(s)" in capsys.readouterr().out
+
+    @pytest.mark.parametrize(
+        "error",
+        (
+            ConfigError("bad config"),
+            FileNotFoundError("no archive"),
+            ValueError("bad archive"),
+            tarfile.ReadError("not a tar file"),
+        ),
+    )
+    def test_it_reports_errors(self, import_archive, capsys, error):
+        import_archive.side_effect = error
+
+        assert main(["import", "compiled.tar.gz"]) == 1
+
+        assert str(error) in capsys.readouterr().err
+
+    @pytest.fixture(autouse=True)
+    def parseconfig(self, patch):
+        return patch("tox_pip_sync._cli.parseconfig")
+
+    @pytest.fixture
+    def import_archive(self, patch):
+        return patch("tox_pip_sync._cli.import_archive")
+
+
+class TestStatsCommand:
+    @pytest.mark.usefixtures("log_file")
+    def test_it_summarises_the_event_log(self, capsys):
+        assert not main(["stats"])
+
+        rows = [line.split() for line in capsys.readouterr().out.splitlines()]
+        assert rows == [
+            ["env", "count", "hits", "hit", "rate", "spent", "saved"],
+            ["project:py39", "3", "2", "67%", "12.0s", "9.0s"],
+            [],
+            ["decision", "count", "hits", "hit", "rate", "spent", "saved"],
+            ["compile", "cache-hit", "(cached)", "1", "1", "100%", "1.0s", "0.0s"],
+            ["sync", "skip", "(hash-match)", "1", "1", "100%", "1.0s", "9.0s"],
+            ["sync", "sync", "(new-env)", "1", "0", "0%", "10.0s", "0.0s"],
+        ]
+
+    def test_it_reads_other_logs(self, log_file, tmp_path, capsys):
+        other = tmp_path / "other.jsonl"
+        other.write_text(log_file.read_text(encoding="utf-8"), encoding="utf-8")
+
+        assert not main(["stats", "-f", str(log_file), "--file", str(other)])
+
+        assert "project:py39      6" in capsys.readouterr().out
+
+    def test_it_reads_the_previous_log_too(self, log_file, capsys):
+        rotated = log_file.with_name("events.jsonl.1")
+        rotated.write_text(log_file.read_text(encoding="utf-8"), encoding="utf-8")
+
+        assert not main(["stats"])
+
+        assert "project:py39      6" in capsys.readouterr().out
+
+    def test_it_reads_the_log_from_the_projects_cache_dir(
+        self, log_file, tmp_path, patch, capsys
+    ):
+        parseconfig = patch("tox_pip_sync._cli.parseconfig")
+        parseconfig.return_value.tox_pip_sync = dict(
+            default_config(), cache_dir=str(tmp_path)
+        )
+        log_file.rename(tmp_path / "events.jsonl")
+
+        assert not main(["stats", "-c", "tox.ini"])
+
+        parseconfig.assert_called_once_with(["-c", "tox.ini"])
+        assert "project:py39      3" in capsys.readouterr().out
+
+    def test_it_reports_missing_logs(self, tmp_path, capsys):
+        assert main(["stats", "-f", str(tmp_path / "missing.jsonl")]) == 1
+
+        assert "Could not read event log" in capsys.readouterr().err
+
+    def test_it_reports_empty_logs(self, log_file, capsys):
+        log_file.write_text("", encoding="utf-8")
+
+        assert not main(["stats"])
+
+        assert "No events recorded yet" in capsys.readouterr().out
+
+    @pytest.fixture
+    def log_file(self):
+        log_file = event_log_file(default_config())
+        log_file.parent.mkdir(parents=True, exist_ok=True)
+        log_file.write_text(
+            "".join(
+                json.dumps(
+                    {
+                        "kind": kind,
+                        "outcome": outcome,
+                        "reason": reason,
+                        "env": "py39",
+                        "project": "/src/project",
+                        "duration": duration,
+                    }
+                )
+                + "\n"
+                for kind, outcome, reason, duration in (
+                    ("sync", "sync", "new-env", 10.0),
+                    ("sync", "skip", "hash-match", 1.0),
+                    ("compile", "cache-hit", "cached", 1.0),
+                )
+            ),
+            encoding="utf-8",
+        )
+        return log_file
@@ -0,0 +1,175 @@
+import os
+from pathlib import Path
+
+import pytest
+from h_matchers import Any
+
+from tox_pip_sync._clone import FICLONE, clone_file, clone_matching_env
+from tox_pip_sync._env_data import EnvData
+
+PYTHON = "/usr/bin/python3.9"
+
+
+class TestCloneMatchingEnv:
+    @pytest.mark.usefixtures("template", "target")
+    def test_it_copies_site_packages(self, venv):
+        assert clone_matching_env(venv, "0000")
+
+        target = site_packages(venv.path)
+        assert (target / "package_a" / "__init__.py").read_text() == "# A"
+        assert (target / "package_a-1.0.dist-info" / "METADATA").exists()
+        assert (target / "module_b.py").exists()
+        # The env's own pip is left as it is
+        assert (target / "pip" / "__init__.py").read_text() == "# Target pip"
+        assert not (target / "pip-21.0.dist-info").exists()
+
+    @pytest.mark.usefixtures("template", "target")
+    def test_it_copies_and_rewrites_scripts(self, venv):
+        clone_matching_env(venv, "0000")
+
+        script = Path(venv.path) / "bin" / "package-a"
+        assert script.read_text() == f"#!{Path(venv.path) / 'bin' / 'python'}\nrun()"
+        assert os.access(script, os.X_OK)
+        # Other things are left alone
+        assert not (Path(venv.path) / "bin" / "other").exists()
+        assert (Path(venv.path) / "bin" / "activate").read_text() == "target"
+
+    @pytest.mark.parametrize(
+        "data",
+        (
+            {"hash": "1111", "python": "cpython3.9", "interpreter": PYTHON},
+            {"hash": "0000", "python": "cpython3.8", "interpreter": PYTHON},
+            # Like PyPy, a debug build or 32-bit Python of the same version
+            {"hash": "0000", "python": "cpython3.9", "interpreter": "/opt/python"},
+            # Synced by an older version which didn't record this
+            {"hash": "0000", "python": "cpython3.9"},
+        ),
+    )
+    @pytest.mark.usefixtures("target")
+    def test_it_does_nothing_without_a_matching_env(self, venv, template, data):
+        EnvData(template).save(requirements_hash=data.pop("hash"), **data)
+
+        assert not clone_matching_env(venv, "0000")
+
+        assert not (site_packages(venv.path) / "package_a").exists()
+
+    @pytest.mark.usefixtures("template", "target")
+    def test_it_ignores_envs_without_site_packages(self, venv):
+        other = Path(venv.path).parent / "a_other"
+        other.mkdir()
+        EnvData(other).save(
+            requirements_hash="0000", python="cpython3.9", interpreter=PYTHON
+        )
+
+        assert clone_matching_env(venv, "0000")
+
+    @pytest.mark.usefixtures("template")
+    def test_it_does_nothing_if_the_env_is_not_created(self, venv):
+        assert not clone_matching_env(venv, "0000")
+
+    @pytest.fixture
+    def template(self, venv):
+        template = Path(venv.path).parent / "template"
+        packages = make_site_packages(template)
+        (packages / "package_a").mkdir()
+        (packages / "package_a" / "__init__.py").write_text("# A")
+        (packages / "package_a-1.0.dist-info").mkdir()
+        (packages / "package_a-1.0.dist-info" / "METADATA").write_text("")
+        (packages / "module_b.py").write_text("# B")
+        (packages / "pip").mkdir()
+        (packages / "pip" / "__init__.py").write_text("# Template pip")
+        (packages / "pip-21.0.dist-info").mkdir()
+
+        bin_dir = template / "bin"
+        bin_dir.mkdir()
+        script = bin_dir / "package-a"
+        script.write_text(f"#!{bin_dir / 'python'}\nrun()")
+        script.chmod(0o755)
+        (bin_dir / "other").write_text("#!/bin/sh")
+        (bin_dir / "activate").write_text("template")
+        (bin_dir / "sub_dir").mkdir()
+
+        EnvData(template).save(
+            requirements_hash="0000", python="cpython3.9", interpreter=PYTHON
+        )
+
+        return template
+
+    @pytest.fixture
+    def target(self, venv):
+        packages = make_site_packages(Path(venv.path))
+        (packages / "pip").mkdir()
+        (packages / "pip" / "__init__.py").write_text("# Target pip")
+        (packages / "pip-22.0.dist-info").mkdir()
+        (Path(venv.path) / "bin" / "activate").write_text("target")
+
+
+class TestCloneFile:
+    def test_it_copies_files(self, tmp_path):
+        source = tmp_path / "source"
+        source.write_text("content")
+
+        clone_file(source, tmp_path / "target")
+
+        assert (tmp_path / "target").read_text() == "content"
+
+    def test_it_uses_reflinks(self, tmp_path, ioctl):
+        source = tmp_path / "source"
+        source.write_text("content")
+
+        clone_file(source, tmp_path / "target")
+
+        ioctl.assert_called_once_with(Any.int(), FICLONE, Any.int())
+        assert (tmp_path / "target").stat().st_ino != source.stat().st_ino
+
+    def test_it_falls_back_to_hardlinks_without_fcntl(self, tmp_path, reflink):
+        reflink.side_effect = ImportError
+        source = tmp_path / "source"
+        source.write_text("content")
+
+        clone_file(source, tmp_path / "target")
+
+        assert (tmp_path / "target").stat().st_ino == source.stat().st_ino
+
+    def test_it_falls_back_to_hardlinks(self, tmp_path, reflink):
+        reflink.side_effect = self.failing_reflink
+        source = tmp_path / "source"
+        source.write_text("content")
+
+        clone_file(source, tmp_path / "target")
+
+        assert (tmp_path / "target").stat().st_ino == source.stat().st_ino
+
+    def test_it_falls_back_to_copying(self, tmp_path, reflink, patch):
+        reflink.side_effect = self.failing_reflink
+        patch("tox_pip_sync._clone.os.link", side_effect=OSError)
+        source = tmp_path / "source"
+        source.write_text("content")
+
+        clone_file(source, tmp_path / "target")
+
+        assert (tmp_path / "target").read_text() == "content"
+        assert (tmp_path / "target").stat().st_ino != source.stat().st_ino
+
+    @staticmethod
+    def failing_reflink(_source, target):
+        Path(target).touch()
+        raise OSError("Not supported")
+
+    @pytest.fixture
+    def ioctl(self, patch):
+        return patch("fcntl.ioctl")
+
+    @pytest.fixture
+    def reflink(self, patch):
+        return patch("tox_pip_sync._clone._reflink")
+
+
+def site_packages(venv_path):
+    return Path(venv_path) / "lib" / "python3.9" / "site-packages"
+
+
+def make_site_packages(venv_path):
+    packages = site_packages(venv_path)
+    packages.mkdir(parents=True)
+    return packages
@@ -1,60 +1,174 @@
+import os
+from unittest.mock import create_autospec
+
+import py
 import pytest
+from tox.config import Config
+from tox.exception import ConfigError
+
+from tox_pip_sync._config import PYPROJECT_CACHE, default_config, load_config
 
-from tox_pip_sync import load_config
+# We need to set up the parsed config tox keeps in `Config._cfg`
+# pylint: disable=protected-access,no-member
 
 
 class TestLoadConfig:
-    @pytest.mark.parametrize(
-        "file_name,content,expected_values",
-        (
-            (
-                "pyproject.toml",
-                "[tool.tox.tox_pip_sync]\na_setting = true",
-                {"a_setting": True},
-            ),
-            ("tox.ini", "[tox_pip_sync]\na_setting = true", {"a_setting": "true"}),
-        ),
-    )
-    def test_it_can_read_from_a_file(self, tmpdir, file_name, content, expected_values):
-        config_file = tmpdir / file_name
-        config_file.write_text(content, encoding="utf-8")
+    def test_it_reads_from_the_tox_config(self, tox_config, set_ini):
+        set_ini("[tox_pip_sync]\nskip_listing = false\ncache_dir = /some/dir")
+
+        config = load_config(tox_config)
+
+        assert config == dict(
+            default_config(), skip_listing=False, cache_dir="/some/dir"
+        )
+
+    def test_it_reads_from_setup_cfg(self, tox_config, set_ini):
+        set_ini("[tox:tox_pip_sync]\nskip_listing = false", file_name="setup.cfg")
 
-        settings = load_config(tmpdir)
+        config = load_config(tox_config)
 
-        assert settings == expected_values
+        assert not config["skip_listing"]
 
-    @pytest.mark.parametrize("file_name", ("pyproject.toml", "tox.ini"))
-    def test_it_can_handle_the_section_being_missing(self, tmpdir, file_name):
-        project_file = tmpdir / file_name
-        project_file.write_text("", encoding="utf-8")
+    def test_it_reads_from_pyproject_toml(self, tox_config, set_pyproject):
+        set_pyproject('skip_listing = false\ncache_dir = "/some/dir"')
 
-        settings = load_config(tmpdir)
+        config = load_config(tox_config)
 
-        assert not settings
+        assert config == dict(
+            default_config(), skip_listing=False, cache_dir="/some/dir"
+        )
 
-    def test_it_can_handle_the_files_being_missing(self, tmpdir):
-        settings = load_config(tmpdir)
+    def test_pyproject_toml_takes_precedence(self, tox_config, set_ini, set_pyproject):
+        set_ini("[tox_pip_sync]\nskip_listing = true\nwheelhouse = true")
+        set_pyproject("skip_listing = false")
+
+        config = load_config(tox_config)
+
+        assert not config["skip_listing"]
+        assert config["wheelhouse"]
+
+    @pytest.mark.parametrize(
+        "content", ("", "[tool.other]\na = 1", "[tool.tox.other]\na = 1")
+    )
+    def test_it_can_handle_the_section_being_missing(
+        self, tox_config, set_ini, set_pyproject, content
+    ):
+        set_ini("[other]\na = 1")
+        set_pyproject(content, section=None)
+
+        assert load_config(tox_config) == default_config()
+
+    def test_it_can_handle_the_files_being_missing(self, tox_config):
+        assert load_config(tox_config) == default_config()
+
+    @pytest.mark.parametrize(
+        "value,expected",
+        (
+            ("1", True),
+            ("0", False),
+            ("true", True),
+            ("false", False),
+            ("on", True),
+            ("off", False),
+            ("True", True),
+            ("False", False),
+        ),
+    )
+    def test_it_coerces_values_for_ini_files(
+        self, tox_config, set_ini, value, expected
+    ):
+        set_ini(f"[tox_pip_sync]\nskip_listing = {value}")
 
-        assert not settings
+        assert load_config(tox_config)["skip_listing"] == expected
 
     @pytest.mark.parametrize(
-        "option,value,expected",
+        "ini,toml",
         (
-            ("skip_listing", "1", True),
-            ("skip_listing", "0", False),
-            ("skip_listing", "true", True),
-            ("skip_listing", "false", False),
-            ("skip_listing", "on", True),
-            ("skip_listing", "off", False),
-            ("skip_listing", "True", True),
-            # Note this isn't part of what ConfigParser considers falsy
-            ("skip_listing", "False", True),
+            ("unknown = true", None),
+            ("skip_listing = maybe", None),
+            (None, "unknown = true"),
+            (None, 'skip_listing = "true"'),
+            (None, "cache_dir = true"),
         ),
     )
-    def test_it_coerces_values_for_ini_files(self, tmpdir, option, value, expected):
-        tox_ini = tmpdir / "tox.ini"
-        tox_ini.write_text(f"[tox_pip_sync]\n{option} = {value}", encoding="utf-8")
+    def test_it_raises_for_invalid_options(
+        self, tox_config, set_ini, set_pyproject, ini, toml
+    ):  # pylint: disable=too-many-arguments
+        if ini:
+            set_ini(f"[tox_pip_sync]\n{ini}")
+        if toml:
+            set_pyproject(toml)
+
+        with pytest.raises(ConfigError):
+            load_config(tox_config)
+
+    def test_it_caches_pyproject_toml(self, tox_config, set_pyproject, patch):
+        set_pyproject("skip_listing = false")
+        load_config(tox_config)
+        toml_load = patch("toml.load")
+
+        config = load_config(tox_config)
+
+        toml_load.assert_not_called()
+        assert not config["skip_listing"]
+
+    def test_it_reads_pyproject_toml_again_if_it_changes(
+        self, tox_config, set_pyproject
+    ):
+        pyproject = set_pyproject("skip_listing = false")
+        load_config(tox_config)
+        set_pyproject("skip_listing = true")
+        # Make sure the change is visible, even on coarse grained file systems
+        stat = os.stat(pyproject)
+        os.utime(pyproject, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        assert load_config(tox_config)["skip_listing"]
+
+    def test_it_ignores_invalid_cache_files(self, tox_config, set_pyproject, tmp_path):
+        set_pyproject("skip_listing = false")
+        (tmp_path / ".tox").mkdir()
+        (tmp_path / ".tox" / PYPROJECT_CACHE).write_text("{", encoding="utf-8")
+
+        assert not load_config(tox_config)["skip_listing"]
+
+    def test_it_works_if_the_cache_cannot_be_written(
+        self, tox_config, set_pyproject, tmp_path
+    ):
+        set_pyproject("skip_listing = false")
+        # Block the work dir from being created
+        (tmp_path / ".tox").write_text("", encoding="utf-8")
+
+        assert not load_config(tox_config)["skip_listing"]
+
+    @pytest.fixture
+    def tox_config(self, tmp_path):
+        tox_config = create_autospec(Config, instance=True)
+        tox_config.setupdir = tmp_path
+        tox_config.toxworkdir = tmp_path / ".tox"
+        tox_config.toxinipath = tmp_path / "tox.ini"
+        tox_config._cfg = py.iniconfig.IniConfig(str(tox_config.toxinipath), "")
+
+        return tox_config
+
+    @pytest.fixture
+    def set_ini(self, tox_config, tmp_path):
+        def set_ini(content, file_name="tox.ini"):
+            # tox has already parsed this by the time we get it
+            tox_config.toxinipath = tmp_path / file_name
+            tox_config._cfg = py.iniconfig.IniConfig(
+                str(tox_config.toxinipath), content
+            )
+
+        return set_ini
+
+    @pytest.fixture
+    def set_pyproject(self, tmp_path):
+        def set_pyproject(content, section="[tool.tox.tox_pip_sync]"):
+            if section:
+                content = f"{section}\n{content}"
 
-        settings = load_config(tmpdir)
+            pyproject = tmp_path / "pyproject.toml"
+            pyproject.write_text(content, encoding="utf-8")
+            return pyproject
 
-        assert settings == {option: expected}
+        return set_pyproject
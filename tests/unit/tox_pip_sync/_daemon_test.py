@@ -0,0 +1,154 @@
+import socket
+import subprocess
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Thread
+from unittest.mock import Mock
+
+import pytest
+
+from tox_pip_sync import _resolver_server
+from tox_pip_sync._daemon import ResolverDaemon
+from tox_pip_sync._tool_env import ToolEnv
+
+
+class TestResolverDaemon:
+    def test_for_venv(self, venv, tool_env):
+        daemon = ResolverDaemon.for_venv(venv, tool_env)
+
+        assert daemon.tool_env == tool_env
+        assert daemon.socket_path == tool_env.path.with_name("cpython3.9.sock")
+
+    def test_for_venv_returns_None_if_disabled(self, venv, tool_env):
+        venv.envconfig.config.tox_pip_sync["resolver_daemon"] = False
+
+        assert ResolverDaemon.for_venv(venv, tool_env) is None
+
+    def test_for_venv_returns_None_without_a_tool_env(self, venv):
+        assert ResolverDaemon.for_venv(venv, None) is None
+
+    def test_for_venv_returns_None_if_the_path_is_too_long(self, venv, tmp_path):
+        tool_env = ToolEnv(tmp_path / ("x" * ResolverDaemon.MAX_SOCKET_PATH))
+
+        assert ResolverDaemon.for_venv(venv, tool_env) is None
+
+    def test_run(self, daemon, start_server, Popen, tmp_path):
+        start_server()
+
+        result = daemon.run(["compile", "file.in"], cwd=tmp_path, env={"A": "B"})
+
+        assert result == (0, "compiled\n")
+        Popen.assert_not_called()
+
+    def test_run_starts_the_daemon(self, daemon, start_server, Popen, tmp_path):
+        Popen.side_effect = lambda *args, **kwargs: start_server()
+        # Left behind by a daemon which was killed
+        daemon.socket_path.touch()
+
+        result = daemon.run(["compile"], cwd=tmp_path, env={})
+
+        assert result == (0, "compiled\n")
+        Popen.assert_called_once_with(
+            [
+                str(daemon.tool_env.python),
+                _resolver_server.__file__,
+                str(daemon.socket_path),
+                "--idle-timeout",
+                str(ResolverDaemon.IDLE_TIMEOUT),
+            ],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+
+    def test_run_uses_a_daemon_started_while_waiting(
+        self, daemon, start_server, Popen, patch, tmp_path
+    ):
+        @contextmanager
+        def exclusive(*_args):
+            start_server()
+            yield
+
+        patch("tox_pip_sync._daemon.exclusive", side_effect=exclusive)
+
+        assert daemon.run(["compile"], cwd=tmp_path, env={}) == (0, "compiled\n")
+        Popen.assert_not_called()
+
+    def test_run_returns_None_if_the_daemon_exits(self, daemon, Popen, tmp_path):
+        Popen.return_value.poll.return_value = 1
+
+        assert daemon.run(["compile"], cwd=tmp_path, env={}) is None
+
+    def test_run_returns_None_if_the_daemon_does_not_start(
+        self, daemon, Popen, tmp_path
+    ):
+        Popen.return_value.poll.return_value = None
+        daemon.START_TIMEOUT = 0.1
+
+        assert daemon.run(["compile"], cwd=tmp_path, env={}) is None
+
+    def test_run_returns_None_if_the_daemon_fails(self, daemon, tmp_path):
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(str(daemon.socket_path))
+        server.listen()
+
+        def hang_up():
+            connection, _ = server.accept()
+            connection.close()
+
+        thread = Thread(target=hang_up)
+        thread.start()
+
+        assert daemon.run(["compile"], cwd=tmp_path, env={}) is None
+
+        thread.join()
+        server.close()
+
+    @pytest.fixture
+    def tool_env(self):
+        # Unix socket paths can't be very long, so avoid the pytest tmp dirs
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            yield ToolEnv(Path(tmp_dir) / "tools" / "cpython3.9")
+
+    @pytest.fixture
+    def venv(self, venv):
+        venv.envconfig.config.tox_pip_sync["resolver_daemon"] = True
+        return venv
+
+    @pytest.fixture
+    def daemon(self, tool_env):
+        tool_env.path.parent.mkdir(parents=True)
+        return ResolverDaemon(tool_env, tool_env.path.with_name("cpython3.9.sock"))
+
+    @pytest.fixture
+    def start_server(self, daemon):
+        cli = Mock(spec_set=["main"])
+        cli.main.side_effect = lambda **_kwargs: print("compiled")
+        threads = []
+
+        def start_server():
+            daemon.socket_path.unlink(missing_ok=True)
+            # Bind here, so the socket is ready as soon as this returns
+            server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            server.bind(str(daemon.socket_path))
+            server.listen()
+
+            def serve_one():
+                with server:
+                    connection, _ = server.accept()
+                    with connection:
+                        _resolver_server.handle(connection, cli)
+
+            threads.append(Thread(target=serve_one))
+            threads[-1].start()
+
+        yield start_server
+
+        for thread in threads:
+            thread.join()
+
+    @pytest.fixture(autouse=True)
+    def Popen(self, patch):
+        return patch("tox_pip_sync._daemon.subprocess.Popen")
@@ -0,0 +1,62 @@
+import json
+
+from tox_pip_sync._env_data import EnvData
+
+
+class TestEnvData:
+    def test_it_can_load_the_hash(self, tmpdir):
+        (tmpdir / "tox-pip-sync.json").write_text(
+            json.dumps({"hash": "value"}), "utf-8"
+        )
+        last_hash = EnvData(tmpdir).last_hash
+
+        assert last_hash == "value"
+
+    def test_it_fails_gracefully_if_the_file_is_missing(self, tmpdir):
+        last_hash = EnvData(tmpdir).last_hash
+
+        assert last_hash is None
+
+    def test_it_can_load_the_python_version(self, tmpdir):
+        (tmpdir / "tox-pip-sync.json").write_text(
+            json.dumps({"hash": "value", "python": "cpython3.9"}), "utf-8"
+        )
+
+        assert EnvData(tmpdir).python == "cpython3.9"
+
+    def test_it_can_load_the_interpreter(self, tmpdir):
+        (tmpdir / "tox-pip-sync.json").write_text(
+            json.dumps({"hash": "value", "interpreter": "/usr/bin/python3.9"}), "utf-8"
+        )
+
+        assert EnvData(tmpdir).interpreter == "/usr/bin/python3.9"
+
+    def test_it_can_load_the_site_packages_fingerprint(self, tmpdir):
+        (tmpdir / "tox-pip-sync.json").write_text(
+            json.dumps({"hash": "value", "site_packages": "abcd"}), "utf-8"
+        )
+
+        assert EnvData(tmpdir).site_packages == "abcd"
+
+    def test_it_can_load_the_sources(self, tmpdir):
+        (tmpdir / "tox-pip-sync.json").write_text(
+            json.dumps({"hash": "value", "sources": {"file": {}}}), "utf-8"
+        )
+        sources = EnvData(tmpdir).sources
+
+        assert sources == {"file": {}}
+
+    def test_sources_defaults_to_empty(self, tmpdir):
+        assert EnvData(tmpdir).sources == {}
+
+    def test_it_can_save_the_hash(self, tmpdir):
+        EnvData(tmpdir).save(requirements_hash="value")
+
+        content = json.loads((tmpdir / "tox-pip-sync.json").read_text("utf-8"))
+        assert content == {"hash": "value"}
+
+    def test_it_can_save_extra_data(self, tmpdir):
+        EnvData(tmpdir).save(requirements_hash="value", sources={"file": {}})
+
+        content = json.loads((tmpdir / "tox-pip-sync.json").read_text("utf-8"))
+        assert content == {"hash": "value", "sources": {"file": {}}}
@@ -0,0 +1,159 @@
+import json
+
+import pytest
+from h_matchers import Any
+
+from tox_pip_sync._cache import default_cache_dir
+from tox_pip_sync._config import default_config
+from tox_pip_sync._events import (
+    EventLog,
+    event_log_file,
+    event_log_files,
+    read_events,
+    summarise,
+)
+
+
+class TestEventLog:
+    def test_decision_records_the_outcome(self, event_log, venv):
+        with event_log.decision("sync", venv) as event:
+            event.update(outcome="skip", reason="hash-match")
+
+        assert event_log.events == [
+            {
+                "kind": "sync",
+                "outcome": "skip",
+                "reason": "hash-match",
+                "env": "env_name",
+                "project": str(venv.envconfig.config.toxinidir),
+                "time": Any.float(),
+                "duration": Any.float(),
+            }
+        ]
+
+    def test_decision_records_nothing_without_an_outcome(self, event_log, venv):
+        with event_log.decision("bootstrap", venv):
+            pass
+
+        assert not event_log.events
+
+    def test_decision_records_nothing_if_it_fails(self, event_log, venv):
+        with pytest.raises(ValueError):
+            with event_log.decision("sync", venv) as event:
+                event.update(outcome="sync", reason="new-env")
+                raise ValueError()
+
+        assert not event_log.events
+
+    def test_write_appends_to_the_file(self, event_log, tmp_path):
+        filename = tmp_path / "logs" / "events.jsonl"
+        event_log.events = [{"a": 1}]
+
+        event_log.write(filename)
+        event_log.write(filename)
+
+        assert filename.read_text(encoding="utf-8") == '{"a": 1}\n{"a": 1}\n'
+
+    def test_write_starts_a_new_file_when_it_gets_too_big(
+        self, event_log, tmp_path, monkeypatch
+    ):
+        monkeypatch.setattr("tox_pip_sync._events.MAX_LOG_SIZE", 10)
+        filename = tmp_path / "events.jsonl"
+        rotated = tmp_path / "events.jsonl.1"
+        rotated.write_text("oldest\n", encoding="utf-8")
+        event_log.events = [{"a": 1}]
+
+        event_log.write(filename)
+        event_log.write(filename)
+        event_log.write(filename)
+
+        assert rotated.read_text(encoding="utf-8") == '{"a": 1}\n{"a": 1}\n'
+        assert filename.read_text(encoding="utf-8") == '{"a": 1}\n'
+
+    @pytest.fixture
+    def event_log(self):
+        return EventLog()
+
+
+def test_event_log_file():
+    assert event_log_file(default_config()) == default_cache_dir() / "events.jsonl"
+
+
+def test_event_log_file_with_a_cache_dir(tmp_path):
+    config = dict(default_config(), cache_dir=str(tmp_path))
+
+    assert event_log_file(config) == tmp_path / "events.jsonl"
+
+
+def test_event_log_files(tmp_path):
+    config = dict(default_config(), cache_dir=str(tmp_path))
+
+    assert event_log_files(config) == [tmp_path / "events.jsonl"]
+
+
+def test_event_log_files_includes_the_previous_log(tmp_path):
+    config = dict(default_config(), cache_dir=str(tmp_path))
+    (tmp_path / "events.jsonl.1").touch()
+
+    assert event_log_files(config) == [
+        tmp_path / "events.jsonl.1",
+        tmp_path / "events.jsonl",
+    ]
+
+
+def test_read_events(tmp_path):
+    (tmp_path / "a.jsonl").write_text('{"a": 1}\n{"trunc', encoding="utf-8")
+    (tmp_path / "b.jsonl").write_text('{"b": 2}\n', encoding="utf-8")
+
+    events = read_events([tmp_path / "a.jsonl", tmp_path / "b.jsonl"])
+
+    assert list(events) == [{"a": 1}, {"b": 2}]
+
+
+class TestSummarise:
+    def test_it(self):
+        events = [
+            self.event("sync", "sync", 10),
+            self.event("sync", "sync", 20),
+            self.event("sync", "skip", 1),
+            self.event("sync", "reinstall-local", 2),
+            self.event("compile", "cache-hit", 1),
+            self.event("compile", "compile", 5, env="other"),
+            self.event("bootstrap", "create", 30),
+        ]
+
+        summary = summarise(events, key=lambda event: event["kind"])
+
+        assert summary == {
+            # Hits are compared with the average of 15s for misses
+            "sync": {"count": 4, "hits": 2, "spent": 33.0, "saved": 27.0},
+            # Misses for other envs aren't comparable, so we don't know
+            "compile": {"count": 2, "hits": 1, "spent": 6.0, "saved": 0.0},
+            "bootstrap": {"count": 1, "hits": 0, "spent": 30.0, "saved": 0.0},
+        }
+
+    def test_hits_never_lose_time(self):
+        events = [self.event("sync", "sync", 1), self.event("sync", "skip", 2)]
+
+        summary = summarise(events, key=lambda event: event["kind"])
+
+        assert summary["sync"]["saved"] == 0
+
+    @staticmethod
+    def event(kind, outcome, duration, env="env"):
+        return {
+            "kind": kind,
+            "outcome": outcome,
+            "reason": "reason",
+            "env": env,
+            "project": "/project",
+            "duration": duration,
+        }
+
+
+def test_events_are_json_serialisable(venv):
+    event_log = EventLog()
+    with event_log.decision("sync", venv) as event:
+        event.update(outcome="sync", reason="new-env", changed=["a.txt"])
+
+    assert json.loads(json.dumps(event_log.events)) == event_log.events
@@ -0,0 +1,272 @@
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+from tox_pip_sync._installed import (
+    canonical_name,
+    installed_versions,
+    pinned_versions,
+    reinstall_local,
+    site_packages_dir,
+    site_packages_fingerprint,
+    sync_installed,
+)
+from tox_pip_sync._requirements import RequirementList
+
+# pylint: disable=protected-access
+
+
+class TestSyncInstalled:
+    @pytest.mark.usefixtures("site_packages")
+    def test_it_does_nothing_if_the_env_matches(self, venv, action, requirements):
+        requirements.write_text("package-a==1.0\npackage-b==2.0", encoding="utf-8")
+
+        assert sync_installed(venv, action, [str(requirements)])
+
+        venv._pcall.assert_not_called()
+        venv._install.assert_not_called()
+
+    @pytest.mark.usefixtures("site_packages")
+    def test_it_installs_missing_and_changed_packages(self, venv, action, requirements):
+        requirements.write_text(
+            "package-a==1.1\npackage-b==2.0\npackage-c==3.0", encoding="utf-8"
+        )
+
+        assert sync_installed(venv, action, [str(requirements)])
+
+        venv._install.assert_called_once_with(
+            ["package-a==1.1", "package-c==3.0"], extraopts=["--no-deps"], action=action
+        )
+        venv._pcall.assert_not_called()
+
+    @pytest.mark.usefixtures("site_packages")
+    def test_it_passes_extra_arguments_to_pip(self, venv, action, requirements):
+        requirements.write_text("package-a==1.1\npackage-b==2.0", encoding="utf-8")
+
+        sync_installed(venv, action, [str(requirements)], pip_args=["--no-index"])
+
+        venv._install.assert_called_once_with(
+            ["package-a==1.1"], extraopts=["--no-deps", "--no-index"], action=action
+        )
+
+    @pytest.mark.usefixtures("site_packages")
+    def test_it_uninstalls_extra_packages(self, venv, action, requirements):
+        requirements.write_text("package-a==1.0", encoding="utf-8")
+
+        assert sync_installed(venv, action, [str(requirements)])
+
+        venv._pcall.assert_called_once_with(
+            [
+                str(venv.envconfig.envpython),
+                "-m",
+                "pip",
+                "uninstall",
+                "-y",
+                "package-b",
+            ],
+            cwd=venv.envconfig.config.toxinidir,
+            action=action,
+        )
+        venv._install.assert_not_called()
+
+    def test_it_does_not_uninstall_pip_tools_or_its_dependencies(
+        self, venv, action, requirements, site_packages
+    ):
+        add_dist(
+            site_packages,
+            "pip_tools-6.4.0.dist-info",
+            "Requires-Dist: click (>=7)\nRequires-Dist: pytest ; extra == 'testing'",
+        )
+        add_dist(
+            site_packages,
+            "click-8.0.3.egg-info",
+            "Requires-Dist: colorama",
+            metadata_file="PKG-INFO",
+        )
+        add_dist(site_packages, "colorama-0.4.4.dist-info", metadata=None)
+        add_dist(site_packages, "pip-21.3.1.dist-info")
+        requirements.write_text("package-a==1.0\npackage-b==2.0", encoding="utf-8")
+
+        assert sync_installed(venv, action, [str(requirements)])
+
+        venv._pcall.assert_not_called()
+
+    @pytest.mark.parametrize(
+        "content",
+        (
+            "package-a>=1.0",
+            "-e file:///project",
+            "package-a==1.0\npackage-a==2.0",
+        ),
+    )
+    @pytest.mark.usefixtures("site_packages")
+    def test_it_gives_up_for_requirements_it_does_not_understand(
+        self, venv, action, requirements, content
+    ):
+        requirements.write_text(content, encoding="utf-8")
+
+        assert not sync_installed(venv, action, [str(requirements)])
+
+        venv._pcall.assert_not_called()
+        venv._install.assert_not_called()
+
+    def test_it_gives_up_if_site_packages_is_missing(self, venv, action):
+        assert not sync_installed(venv, action, [])
+
+    @pytest.fixture
+    def requirements(self, venv):
+        return venv.path / "requirements.txt"
+
+    @pytest.fixture
+    def site_packages(self, venv):
+        venv.envconfig.config.toxinidir = venv.path
+        site_packages = Path(venv.path) / "lib" / "python3.9" / "site-packages"
+        site_packages.mkdir(parents=True)
+
+        add_dist(site_packages, "package_a-1.0.dist-info")
+        add_dist(site_packages, "package_b-2.0.egg-info", metadata_file="PKG-INFO")
+
+        return site_packages
+
+
+class TestReinstallLocal:
+    def test_it_reinstalls_only_the_local_project(self, venv, action):
+        requirements = RequirementList.from_strings(
+            ["-r requirements.txt", ".", "-e .[tests]", "package"]
+        )
+
+        reinstall_local(venv, action, requirements)
+
+        venv._install.assert_called_once_with(
+            [".", "-e", ".[tests]"],
+            extraopts=["--no-deps", "--force-reinstall"],
+            action=action,
+        )
+
+
+class TestInstalledVersions:
+    def test_it(self, tmp_path):
+        add_dist(tmp_path, "Package.Name-1.0.dist-info")
+        add_dist(tmp_path, "other-2.0-py3.9.egg-info")
+        add_dist(tmp_path, "unversioned.egg-info")
+
+        assert installed_versions(tmp_path) == {"package-name": "1.0", "other": "2.0"}
+
+
+class TestPinnedVersions:
+    def test_it(self, tmp_path):
+        file_1 = tmp_path / "file_1.txt"
+        file_1.write_text("Package_A==1.0\n# comment\npackage-b[extra]==2.0")
+        file_2 = tmp_path / "file_2.txt"
+        file_2.write_text("package-a==1.0")
+
+        assert pinned_versions([file_1, file_2]) == {
+            "package-a": "1.0",
+            "package-b": "2.0",
+        }
+
+    @pytest.mark.parametrize(
+        "content",
+        (
+            "package-a>=1.0",
+            "-e .",
+            "--index-url https://example.com",
+            "package-a==1.0 --hash=sha256:abc",
+            "package-a==1.0\npackage-a==2.0",
+        ),
+    )
+    def test_it_returns_None_for_things_it_cannot_handle(self, tmp_path, content):
+        reqs = tmp_path / "requirements.txt"
+        reqs.write_text(content)
+
+        assert pinned_versions([reqs]) is None
+
+
+class TestSitePackagesDir:
+    @pytest.mark.parametrize(
+        "path", ("lib/python3.9/site-packages", "Lib/site-packages")
+    )
+    def test_it(self, tmp_path, path):
+        (tmp_path / path).mkdir(parents=True)
+
+        assert site_packages_dir(tmp_path) == tmp_path / path
+
+    def test_it_returns_None_if_missing(self, tmp_path):
+        assert site_packages_dir(tmp_path) is None
+
+
+class TestSitePackagesFingerprint:
+    def test_it_is_stable(self, tmp_path):
+        assert site_packages_fingerprint(tmp_path) == site_packages_fingerprint(
+            tmp_path
+        )
+
+    @pytest.mark.parametrize(
+        "change",
+        (
+            lambda site_packages: add_dist(site_packages, "new-1.0.dist-info"),
+            lambda site_packages: shutil.rmtree(
+                site_packages / "package-1.0.dist-info"
+            ),
+            lambda site_packages: os.utime(
+                site_packages / "package-1.0.dist-info", ns=(0, 0)
+            ),
+        ),
+    )
+    def test_it_changes_with_the_installed_packages(
+        self, tmp_path, site_packages, change
+    ):
+        before = site_packages_fingerprint(tmp_path)
+
+        change(site_packages)
+
+        assert site_packages_fingerprint(tmp_path) != before
+
+    def test_it_ignores_packages_installed_from_a_path_or_url(
+        self, tmp_path, site_packages
+    ):
+        before = site_packages_fingerprint(tmp_path)
+
+        # Like tox installing the project after we've synced
+        add_dist(site_packages, "project-1.0.dist-info")
+        (site_packages / "project-1.0.dist-info" / "direct_url.json").write_text("{}")
+
+        assert site_packages_fingerprint(tmp_path) == before
+
+    def test_it_ignores_other_files(self, tmp_path, site_packages):
+        before = site_packages_fingerprint(tmp_path)
+
+        (site_packages / "package").mkdir()
+        (site_packages / "module.py").touch()
+
+        assert site_packages_fingerprint(tmp_path) == before
+
+    def test_it_returns_None_without_site_packages(self, tmp_path):
+        shutil.rmtree(tmp_path / "lib")
+
+        assert site_packages_fingerprint(tmp_path) is None
+
+    @pytest.fixture(autouse=True)
+    def site_packages(self, tmp_path):
+        site_packages = tmp_path / "lib" / "python3.9" / "site-packages"
+        site_packages.mkdir(parents=True)
+        add_dist(site_packages, "package-1.0.dist-info")
+        add_dist(site_packages, "other-2.0-py3.9.egg-info")
+        return site_packages
+
+
+@pytest.mark.parametrize(
+    "name,expected",
+    (("Package", "package"), ("package_name", "package-name"), ("a.-_b", "a-b")),
+)
+def test_canonical_name(name, expected):
+    assert canonical_name(name) == expected
+
+
+def add_dist(site_packages, dir_name, metadata="", metadata_file="METADATA"):
+    dist_dir = site_packages / dir_name
+    dist_dir.mkdir()
+    if metadata is not None:
+        (dist_dir / metadata_file).write_text(metadata, encoding="utf-8")
@@ -0,0 +1,120 @@
+import pytest
+
+from tox_pip_sync._pins import pinned_by_references
+from tox_pip_sync._requirements import RequirementList
+
+
+class TestPinnedByReferences:
+    @pytest.mark.parametrize(
+        "dependency",
+        (
+            "pytest",
+            "PyTest",
+            "py_test_plugin",
+            "pytest>=7",
+            "pytest==7.1.0",
+            "pytest~=7.0,!=7.0.1",
+        ),
+    )
+    def test_it_returns_True_if_every_dependency_is_pinned(self, check, dependency):
+        assert check(["-rrequirements.txt", dependency])
+
+    @pytest.mark.parametrize(
+        "dependency",
+        (
+            "not-pinned",
+            "pytest<7",
+            "pytest[testing]",
+            "pytest; python_version > '3.6'",
+            "pytest @ https://example.com/pytest.zip",
+            "pytest --hash=sha256:abcd",
+            "-e .",
+            ".[tests]",
+            "invalid requirement!",
+        ),
+    )
+    def test_it_returns_False_if_a_dependency_is_not_pinned(self, check, dependency):
+        assert not check(["-rrequirements.txt", dependency])
+
+    def test_it_returns_False_without_references(self, check):
+        assert not check(["pytest"])
+
+    @pytest.mark.parametrize(
+        "line",
+        (
+            "unpinned",
+            "other>=1.0",
+            "-r other.txt",
+            "-e .",
+            "pytest==7.2.0",
+        ),
+    )
+    def test_it_returns_False_if_the_references_are_not_all_pinned(
+        self, check, tmp_path, line
+    ):
+        self.append(tmp_path / "requirements.txt", line)
+
+        assert not check(["-rrequirements.txt", "pytest"])
+
+    def test_it_returns_False_if_a_pin_is_not_a_valid_version(self, check, tmp_path):
+        self.append(tmp_path / "requirements.txt", "package==not.a.version")
+
+        assert not check(["-rrequirements.txt", "package"])
+
+    def test_it_ignores_options_in_the_references(self, check, tmp_path):
+        self.append(tmp_path / "requirements.txt", "--index-url https://example.com")
+
+        assert check(["-rrequirements.txt", "pytest"])
+
+    def test_it_reads_every_reference(self, check, tmp_path):
+        (tmp_path / "other.txt").write_text("other==1.0", encoding="utf-8")
+
+        assert check(["-rrequirements.txt", "-rother.txt", "pytest", "other"])
+
+    def test_it_returns_False_if_a_reference_is_missing(self, check):
+        assert not check(["-rmissing.txt", "pytest"])
+
+    @pytest.mark.parametrize(
+        "constraint,satisfied",
+        (
+            ("pytest>=7", True),
+            ("unrelated<1.0", True),
+            ("--index-url https://example.com", True),
+            ("pytest<7", False),
+            ("pytest; python_version > '3.6'", False),
+            ("-r other.txt", False),
+        ),
+    )
+    def test_it_checks_the_pins_against_constraints(
+        self, check, tmp_path, constraint, satisfied
+    ):
+        (tmp_path / "constraints.txt").write_text(constraint, encoding="utf-8")
+
+        assert check(["-rrequirements.txt", "-cconstraints.txt", "pytest"]) == satisfied
+
+    @staticmethod
+    def append(filename, line):
+        with open(filename, "a", encoding="utf-8") as handle:
+            handle.write(f"\n{line}\n")
+
+    @pytest.fixture
+    def check(self, tmp_path):
+        def check(deps):
+            return pinned_by_references(RequirementList.from_strings(deps), tmp_path)
+
+        return check
+
+    @pytest.fixture(autouse=True)
+    def requirements_file(self, tmp_path):
+        (tmp_path / "requirements.txt").write_text(
+            "\n".join(
+                [
+                    "# A comment",
+                    "pytest==7.1.0 \\",
+                    "    --hash=sha256:abcd",
+                    "py-test-plugin==1.0",
+                    "iniconfig==2.0.0  # via pytest",
+                ]
+            ),
+            encoding="utf-8",
+        )
@@ -1,20 +1,23 @@
-import json
+from contextlib import contextmanager
 from pathlib import Path
-from unittest.mock import call, sentinel
+from unittest.mock import call, create_autospec, sentinel
 
 import pytest
 from h_matchers import Any
 from tox.config import DepConfig
+from tox.exception import InvocationError
 
-from tox_pip_sync import pip_sync
-from tox_pip_sync._pip_sync import EnvData, pip_tools_run, requirements_files_for_env
+from tox_pip_sync import _env_data, _installed, _requirements
+from tox_pip_sync._background import BackgroundCompile
+from tox_pip_sync._cache import CompileCache, default_cache_dir
+from tox_pip_sync._pip_sync import pip_sync, pip_tools_run, requirements_files_for_env
 from tox_pip_sync._requirements import PipRequirement
 
 # This test is heavily based on accessing underscored items
 # pylint: disable=protected-access
 
 
-class TestRequirementsFilesForEnv:
+class TestRequirementsFilesForEnv:  # pylint: disable=too-many-public-methods
     def test_it_passes_through_requirements_files(
         self, requirements_files, requirements_list
     ):
@@ -50,7 +53,11 @@ class TestRequirementsFilesForEnv:
         unpinned = venv.path / "tox-pip-sync_0000.in"
         pip_tools_run.assert_called_once_with(
             "pip-compile",
-            [str(unpinned)],
+            [
+                "--output-file",
+                str(venv.path / "tox-pip-sync_0000.txt.partial"),
+                str(unpinned),
+            ],
             message=Any.string(),
             venv=venv,
             action=action,
@@ -80,8 +87,8 @@ class TestRequirementsFilesForEnv:
 
     @pytest.mark.usefixtures("requirements_list")
     def test_it_re_uses_existing_files_when_compiling(
-        self, requirements_files, venv, pip_tools_run, requirements_list
-    ):
+        self, requirements_files, venv, pip_tools_run, requirements_list, events
+    ):  # pylint: disable=too-many-arguments
         requirements_list.__iter__.return_value = [PipRequirement(".")]
         pinned_file = venv.path / "tox-pip-sync_0000.txt"
         pinned_file.write(".")
@@ -90,6 +97,9 @@ class TestRequirementsFilesForEnv:
 
         assert file_names[0] == pinned_file
         pip_tools_run.assert_not_called()
+        assert events.events == [
+            Any.dict.containing({"outcome": "reuse", "reason": "pinned-file-exists"})
+        ]
 
     def test_it_cleans_up_old_files_when_compiling(
         self, requirements_files, venv, requirements_list
@@ -106,6 +116,201 @@ class TestRequirementsFilesForEnv:
         assert not old_pinned_file.exists()
         assert not old_unpinned_file.exists()
 
+    def test_it_seeds_pip_compile_with_the_last_compiled_file(
+        self, requirements_files, venv, pip_tools_run, requirements_list
+    ):
+        requirements_list.__iter__.return_value = [PipRequirement(".")]
+        (venv.path / "tox-pip-sync_1111.txt").write("package==1.0")
+        seen = []
+
+        def pip_compile(_exe_name, paths, **_kwargs):
+            seen.append(Path(paths[1]).read_text(encoding="utf-8"))
+            Path(paths[1]).write_text("package==2.0", encoding="utf-8")
+
+        pip_tools_run.side_effect = pip_compile
+
+        requirements_files()
+
+        assert seen == ["package==1.0"]
+        assert (venv.path / "tox-pip-sync_0000.txt").read() == "package==2.0"
+        assert not (venv.path / "tox-pip-sync_1111.txt").exists()
+
+    def test_it_seeds_from_the_most_recently_compiled_file(
+        self, requirements_files, venv, pip_tools_run, requirements_list
+    ):
+        requirements_list.__iter__.return_value = [PipRequirement(".")]
+        older = venv.path / "tox-pip-sync_1111.txt"
+        older.write("package==1.0")
+        older.setmtime(older.mtime() - 100)
+        (venv.path / "tox-pip-sync_2222.txt").write("package==2.0")
+        # `pip-compile` leaves the pins as they are
+        pip_tools_run.side_effect = None
+
+        requirements_files()
+
+        assert (venv.path / "tox-pip-sync_0000.txt").read() == "package==2.0"
+
+    def test_it_removes_the_seed_if_pip_compile_fails(
+        self, requirements_files, venv, pip_tools_run, requirements_list
+    ):
+        requirements_list.__iter__.return_value = [PipRequirement(".")]
+        (venv.path / "tox-pip-sync_1111.txt").write("package==1.0")
+        pip_tools_run.side_effect = ValueError
+
+        with pytest.raises(ValueError):
+            requirements_files()
+
+        assert not (venv.path / "tox-pip-sync_0000.txt").exists()
+
+    def test_it_compiles_again_after_being_interrupted(
+        self, requirements_files, venv, pip_tools_run, requirements_list
+    ):
+        requirements_list.__iter__.return_value = [PipRequirement(".")]
+        (venv.path / "tox-pip-sync_1111.txt").write("package==1.0")
+        compile_file = pip_tools_run.side_effect
+        pip_tools_run.side_effect = KeyboardInterrupt
+
+        with pytest.raises(KeyboardInterrupt):
+            requirements_files()
+
+        assert not (venv.path / "tox-pip-sync_0000.txt").exists()
+
+        pip_tools_run.side_effect = compile_file
+        requirements_files()
+
+        assert pip_tools_run.call_count == 2
+
+    def test_it_ignores_files_left_by_a_killed_compile(
+        self, requirements_files, venv, pip_tools_run, requirements_list
+    ):
+        requirements_list.__iter__.return_value = [PipRequirement(".")]
+        (venv.path / "tox-pip-sync_0000.txt.partial").write("package==1.0")
+
+        requirements_files()
+
+        pip_tools_run.assert_called_once()
+        assert not (venv.path / "tox-pip-sync_0000.txt.partial").exists()
+
+    def test_it_raises_if_pip_compile_fails_without_a_seed(
+        self, requirements_files, pip_tools_run, requirements_list
+    ):
+        requirements_list.__iter__.return_value = [PipRequirement(".")]
+        pip_tools_run.side_effect = ValueError
+
+        with pytest.raises(ValueError):
+            requirements_files()
+
+    def test_it_uses_the_compile_cache(
+        self, requirements_files, venv, pip_tools_run, requirements_list, cache, events
+    ):  # pylint: disable=too-many-arguments
+        requirements_list.__iter__.return_value = [PipRequirement(".")]
+        cached_file = venv.path / "cached.txt"
+        cached_file.write("package==1.0")
+        cache.put(
+            "0000-cpython3.9", cached_file, root_dir=venv.envconfig.config.setupdir
+        )
+
+        file_names = requirements_files()
+
+        pip_tools_run.assert_not_called()
+        assert (venv.path / "tox-pip-sync_0000.txt").read() == "package==1.0"
+        assert file_names[0] == str(venv.path / "tox-pip-sync_0000.txt")
+        assert events.events == [
+            Any.dict.containing({"kind": "compile", "outcome": "cache-hit"})
+        ]
+
+    def test_it_uses_files_compiled_by_other_envs_while_waiting(
+        self, requirements_files, venv, pip_tools_run, requirements_list, cache, patch
+    ):  # pylint: disable=too-many-arguments
+        requirements_list.__iter__.return_value = [PipRequirement(".")]
+        cached_file = venv.path / "cached.txt"
+        cached_file.write("package==1.0")
+
+        @contextmanager
+        def other_env_compiles(_self, key):
+            assert key == "0000-cpython3.9"
+            cache.put(key, cached_file, root_dir=venv.envconfig.config.setupdir)
+            yield
+
+        patch(
+            "tox_pip_sync._pip_sync.CompileCache.lock",
+            autospec=False,
+            new=other_env_compiles,
+        )
+
+        requirements_files()
+
+        pip_tools_run.assert_not_called()
+        assert (venv.path / "tox-pip-sync_0000.txt").read() == "package==1.0"
+
+    def test_it_times_the_compile(
+        self, requirements_files, requirements_list, cache, timings
+    ):  # pylint: disable=unused-argument
+        requirements_list.__iter__.return_value = [PipRequirement(".")]
+
+        requirements_files()
+
+        assert timings.totals("env_name") == Any.dict.containing(
+            ["clear-compiled-files", "cache-wait"]
+        )
+
+    def test_it_stores_compiled_files_in_the_cache(
+        self, requirements_files, venv, requirements_list, cache, events
+    ):  # pylint: disable=too-many-arguments
+        requirements_list.__iter__.return_value = [PipRequirement(".")]
+
+        requirements_files()
+
+        assert cache.get("0000-cpython3.9", venv.path / "out.txt", root_dir="/any")
+        assert events.events == [
+            Any.dict.containing({"outcome": "compile", "reason": "not-cached"})
+        ]
+
+    def test_it_can_have_the_compile_cache_disabled(
+        self, requirements_files, venv, requirements_list, cache, events
+    ):  # pylint: disable=too-many-arguments
+        venv.envconfig.config.tox_pip_sync["compile_cache"] = False
+        requirements_list.__iter__.return_value = [PipRequirement(".")]
+
+        requirements_files()
+
+        assert not cache.get("0000-cpython3.9", venv.path / "out.txt", root_dir="/any")
+        assert events.events == [
+            Any.dict.containing({"outcome": "compile", "reason": "cache-disabled"})
+        ]
+
+    def test_it_skips_pip_compile_if_the_dependencies_are_already_pinned(
+        self,
+        requirements_files,
+        venv,
+        pip_tools_run,
+        requirements_list,
+        pinned_by_references,
+        events,
+    ):  # pylint: disable=too-many-arguments
+        requirements_list.__iter__.return_value = [
+            PipRequirement("-rrequirements.txt"),
+            PipRequirement("pytest"),
+        ]
+        pinned_by_references.return_value = True
+        (venv.path / "tox-pip-sync_1111.txt").write("package==1.0")
+
+        file_names = requirements_files()
+
+        pinned_by_references.assert_called_once_with(
+            requirements_list, venv.envconfig.config.toxinidir
+        )
+        pip_tools_run.assert_not_called()
+        assert file_names == [
+            "requirements.txt",
+            str(venv.path / "tox-pip-sync_0000.txt"),
+        ]
+        assert (venv.path / "tox-pip-sync_0000.txt").read().startswith("#")
+        assert not (venv.path / "tox-pip-sync_1111.txt").exists()
+        assert events.events == [
+            Any.dict.containing({"outcome": "skip", "reason": "pinned-by-references"})
+        ]
+
     def test_it_raises_if_pip_compile_fails_to_create_the_expected_file(
         self, requirements_files, pip_tools_run, requirements_list
     ):
@@ -115,6 +320,10 @@ class TestRequirementsFilesForEnv:
         with pytest.raises(FileNotFoundError):
             requirements_files()
 
+    @pytest.fixture
+    def cache(self):
+        return CompileCache(default_cache_dir())
+
     @pytest.fixture
     def requirements_files(self, venv, action, requirements_list):
         def requirements_files():
@@ -129,21 +338,114 @@ class TestRequirementsFilesForEnv:
         requirements_list.hash.return_value = "0000"
         return requirements_list
 
+    @pytest.fixture(autouse=True)
+    def pinned_by_references(self, patch):
+        return patch("tox_pip_sync._pip_sync.pinned_by_references", return_value=False)
+
     @pytest.fixture(autouse=True)
     def pip_tools_run(self, patch):
         pip_tools_run = patch("tox_pip_sync._pip_sync.pip_tools_run")
 
-        # Fake creating a file
-        pip_tools_run.side_effect = (
-            lambda exe_name, paths, message, venv, action: Path(paths[0])
-            .with_suffix(".txt")
-            .touch()
-        )
+        # Fake creating the output file
+        pip_tools_run.side_effect = lambda exe_name, paths, message, venv, action: Path(
+            paths[1]
+        ).touch()
 
         return pip_tools_run
 
 
 class TestPipToolsRun:
+    def test_it_uses_the_shared_tool_env(self, venv, action, ToolEnv):
+        tool_env = ToolEnv.for_venv.return_value
+        tool_env.command.return_value = ["python", "-m", "piptools", "sync"]
+
+        pip_tools_run(
+            "pip-sync", ["arg_1"], message="A message", venv=venv, action=action
+        )
+
+        ToolEnv.for_venv.assert_called_once_with(venv)
+        tool_env.ensure_exists.assert_called_once_with(venv, action)
+        tool_env.command.assert_called_once_with("pip-sync", venv)
+        venv._pcall.assert_called_once_with(
+            ["python", "-m", "piptools", "sync", "arg_1"],
+            cwd=venv.envconfig.config.toxinidir,
+            action=action,
+        )
+        venv._install.assert_not_called()
+
+    def test_it_records_creating_the_tool_env(self, venv, action, ToolEnv, events):
+        ToolEnv.for_venv.return_value.python.exists.return_value = False
+
+        pip_tools_run("pip-sync", [], message="A message", venv=venv, action=action)
+
+        assert events.events == [
+            Any.dict.containing({"kind": "bootstrap", "outcome": "create"})
+        ]
+
+    def test_it_does_not_record_anything_if_the_tool_env_exists(
+        self, venv, action, events
+    ):
+        pip_tools_run("pip-sync", [], message="A message", venv=venv, action=action)
+
+        assert not events.events
+
+    def test_it_times_the_command(self, venv, action, timings):
+        pip_tools_run(
+            "pip-sync", ["arg_1"], message="A message", venv=venv, action=action
+        )
+
+        assert [event["name"] for event in timings.events] == ["bootstrap", "pip-sync"]
+
+    def test_it_runs_the_command_in_the_resolver_daemon(
+        self, venv, action, ToolEnv, ResolverDaemon
+    ):
+        tool_env = ToolEnv.for_venv.return_value
+        tool_env.arguments.return_value = ["sync", "--python-executable", "python"]
+        daemon = ResolverDaemon.for_venv.return_value = ResolverDaemon.return_value
+        daemon.run.return_value = (0, "Daemon output")
+
+        pip_tools_run(
+            "pip-sync", ["arg_1"], message="A message", venv=venv, action=action
+        )
+
+        ResolverDaemon.for_venv.assert_called_once_with(venv, tool_env)
+        tool_env.arguments.assert_called_once_with("pip-sync", venv)
+        daemon.run.assert_called_once_with(
+            ["sync", "--python-executable", "python", "arg_1"],
+            cwd=venv.envconfig.config.toxinidir,
+            env=venv._get_os_environ.return_value,
+        )
+        venv._pcall.assert_not_called()
+
+    def test_it_raises_if_the_daemon_command_fails(
+        self, venv, action, ToolEnv, ResolverDaemon
+    ):
+        ToolEnv.for_venv.return_value.arguments.return_value = ["compile"]
+        daemon = ResolverDaemon.for_venv.return_value = ResolverDaemon.return_value
+        daemon.run.return_value = (2, "Could not find a version")
+
+        with pytest.raises(InvocationError) as exc_info:
+            pip_tools_run(
+                "pip-compile", ["arg_1"], message="A message", venv=venv, action=action
+            )
+
+        assert exc_info.value.command == "pip-compile arg_1"
+        assert exc_info.value.exit_code == 2
+        assert exc_info.value.out == "Could not find a version"
+
+    def test_it_falls_back_if_the_daemon_is_unavailable(
+        self, venv, action, ResolverDaemon
+    ):
+        daemon = ResolverDaemon.for_venv.return_value = ResolverDaemon.return_value
+        daemon.run.return_value = None
+
+        pip_tools_run(
+            "pip-sync", ["arg_1"], message="A message", venv=venv, action=action
+        )
+
+        venv._pcall.assert_called_once()
+
+    @pytest.mark.usefixtures("without_tool_env")
     def test_it_calls_the_exe_through_tox(self, bin_dir, venv, action, exe_name):
         exe_file = bin_dir / exe_name
         exe_file.write_text("here", "utf-8")
@@ -160,9 +462,10 @@ class TestPipToolsRun:
 
         action.setactivity.assert_called_once_with(exe_name, "A message")
 
+    @pytest.mark.usefixtures("without_tool_env")
     def test_if_pip_sync_exe_is_missing_it_installs_it(
-        self, bin_dir, venv, action, exe_name
-    ):
+        self, bin_dir, venv, action, exe_name, events
+    ):  # pylint: disable=too-many-arguments
         exe_file = bin_dir / exe_name
         venv._install.side_effect = lambda command, action: exe_file.write_text(
             "here", "utf-8"
@@ -176,7 +479,11 @@ class TestPipToolsRun:
                 call(["pip<22", "--force"], action=action),
             ]
         )
+        assert events.events == [
+            Any.dict.containing({"outcome": "install", "reason": f"no-{exe_name}"})
+        ]
 
+    @pytest.mark.usefixtures("without_tool_env")
     def test_if_installing_pip_fails_we_raise(self, exe_name, venv, action):
         with pytest.raises(AssertionError):
             pip_tools_run(exe_name, ["args"], message="any", venv=venv, action=action)
@@ -189,8 +496,22 @@ class TestPipToolsRun:
     def bin_dir(self, venv):
         return venv.envconfig.envbindir
 
+    @pytest.fixture
+    def without_tool_env(self, ToolEnv):
+        ToolEnv.for_venv.return_value = None
+
+    @pytest.fixture(autouse=True)
+    def ToolEnv(self, patch):
+        return patch("tox_pip_sync._pip_sync.ToolEnv")
 
-class TestPipSync:
+    @pytest.fixture(autouse=True)
+    def ResolverDaemon(self, patch):
+        ResolverDaemon = patch("tox_pip_sync._pip_sync.ResolverDaemon")
+        ResolverDaemon.for_venv.return_value = None
+        return ResolverDaemon
+
+
+class TestPipSync:  # pylint: disable=too-many-public-methods
     def test_it(
         self, pip_tools_run, requirements_files_for_env, venv, action, RequirementList
     ):  # pylint: disable=too-many-arguments
@@ -209,8 +530,59 @@ class TestPipSync:
             "pip-sync", ["requirements.txt"], message=Any(), venv=venv, action=action
         )
 
+    def test_it_syncs_in_process_if_possible(
+        self, pip_tools_run, requirements_files_for_env, venv, action, sync_installed
+    ):  # pylint: disable=too-many-arguments
+        requirements_files_for_env.return_value = ("requirements.txt",)
+        sync_installed.return_value = True
+
+        pip_sync(venv, action, skip_on_hash_match=False)
+
+        sync_installed.assert_called_once_with(
+            venv, action, ["requirements.txt"], pip_args=[]
+        )
+        pip_tools_run.assert_not_called()
+
+    def test_it_installs_from_the_wheelhouse(
+        self,
+        pip_tools_run,
+        requirements_files_for_env,
+        venv,
+        action,
+        sync_installed,
+        Wheelhouse,
+    ):  # pylint: disable=too-many-arguments
+        requirements_files_for_env.return_value = ("requirements.txt",)
+        wheelhouse = Wheelhouse.for_venv.return_value = Wheelhouse.return_value
+        wheelhouse.prefetch.return_value = ["--find-links", "wheels"]
+
+        pip_sync(venv, action, skip_on_hash_match=False)
+
+        wheelhouse.prefetch.assert_called_once_with(venv, ["requirements.txt"])
+        sync_installed.assert_called_once_with(
+            venv, action, ["requirements.txt"], pip_args=["--find-links", "wheels"]
+        )
+        pip_tools_run.assert_called_once_with(
+            "pip-sync",
+            ["requirements.txt", "--find-links", "wheels"],
+            message=Any(),
+            venv=venv,
+            action=action,
+        )
+
+    def test_it_can_have_in_process_syncing_disabled(
+        self, pip_tools_run, venv, action, sync_installed
+    ):
+        venv.envconfig.config.tox_pip_sync["in_process_sync"] = False
+        sync_installed.return_value = True
+
+        pip_sync(venv, action, skip_on_hash_match=False)
+
+        sync_installed.assert_not_called()
+        pip_tools_run.assert_called_once()
+
     def test_it_skips_if_hashes_match(
-        self, venv, action, RequirementList, EnvData, pip_tools_run
+        self, venv, action, RequirementList, EnvData, pip_tools_run, events
     ):  # pylint: disable=too-many-arguments
         requirements = RequirementList.from_strings.return_value
         requirements.hash.return_value = sentinel.matching_hash_value
@@ -219,6 +591,142 @@ class TestPipSync:
         pip_sync(venv, action, skip_on_hash_match=True)
 
         pip_tools_run.assert_not_called()
+        EnvData.return_value.save.assert_not_called()
+        assert events.events == [
+            Any.dict.containing(
+                {"kind": "sync", "outcome": "skip", "reason": "hash-match"}
+            )
+        ]
+
+    @pytest.mark.usefixtures("matching_hashes")
+    @pytest.mark.parametrize("attribute", ("changed", "removed"))
+    def test_it_saves_touched_files_when_skipping(
+        self, venv, action, EnvData, SourceFiles, pip_tools_run, attribute
+    ):  # pylint: disable=too-many-arguments
+        # Like after `touch requirements.txt` or a `git checkout`
+        setattr(SourceFiles.return_value, attribute, ["requirements.txt"])
+
+        pip_sync(venv, action, skip_on_hash_match=True)
+
+        pip_tools_run.assert_not_called()
+        EnvData.return_value.save.assert_called_once_with(
+            requirements_hash=sentinel.matching_hash_value,
+            sources=SourceFiles.return_value,
+            python="cpython3.9",
+            interpreter="/usr/bin/python3.9",
+            site_packages=Any(),
+            timings=Any.dict(),
+        )
+
+    @pytest.mark.parametrize(
+        "skip_on_hash_match,last_hash,fingerprint,reason",
+        (
+            (False, sentinel.hash, sentinel.fingerprint, "hashing-disabled"),
+            (True, None, sentinel.fingerprint, "new-env"),
+            (True, sentinel.other_hash, sentinel.fingerprint, "requirements-changed"),
+            (True, sentinel.hash, sentinel.other_fingerprint, "packages-changed"),
+        ),
+    )
+    @pytest.mark.usefixtures("pip_tools_run")
+    def test_it_records_why_it_synced(
+        self,
+        venv,
+        action,
+        RequirementList,
+        EnvData,
+        site_packages_fingerprint,
+        events,
+        skip_on_hash_match,
+        last_hash,
+        fingerprint,
+        reason,
+    ):  # pylint: disable=too-many-arguments
+        RequirementList.from_strings.return_value.hash.return_value = sentinel.hash
+        EnvData.return_value.last_hash = last_hash
+        site_packages_fingerprint.return_value = fingerprint
+
+        pip_sync(venv, action, skip_on_hash_match=skip_on_hash_match)
+
+        assert events.events == [
+            Any.dict.containing({"kind": "sync", "outcome": "sync", "reason": reason})
+        ]
+
+    @pytest.mark.usefixtures("matching_hashes")
+    def test_it_syncs_if_the_installed_packages_changed(
+        self, venv, action, site_packages_fingerprint, pip_tools_run
+    ):
+        site_packages_fingerprint.return_value = sentinel.other_fingerprint
+
+        pip_sync(venv, action, skip_on_hash_match=True)
+
+        site_packages_fingerprint.assert_called_with(venv.path)
+        pip_tools_run.assert_called_once()
+
+    @pytest.mark.usefixtures("matching_hashes")
+    def test_it_skips_if_there_is_no_previous_fingerprint(
+        self, venv, action, EnvData, pip_tools_run
+    ):
+        EnvData.return_value.site_packages = None
+
+        pip_sync(venv, action, skip_on_hash_match=True)
+
+        pip_tools_run.assert_not_called()
+
+    @pytest.mark.usefixtures("matching_hashes")
+    @pytest.mark.parametrize("attribute", ("changed", "removed"))
+    def test_it_reinstalls_the_local_project_if_only_it_changed(
+        self,
+        venv,
+        action,
+        RequirementList,
+        SourceFiles,
+        EnvData,
+        reinstall_local,
+        pip_tools_run,
+        events,
+        attribute,
+    ):  # pylint: disable=too-many-arguments
+        requirements = RequirementList.from_strings.return_value
+        requirements.__iter__.return_value = iter([PipRequirement("-e .")])
+        setattr(
+            SourceFiles.return_value,
+            attribute,
+            [str(Path(venv.envconfig.config.setupdir) / "setup.cfg")],
+        )
+
+        pip_sync(venv, action, skip_on_hash_match=True)
+
+        reinstall_local.assert_called_once_with(venv, action, requirements)
+        pip_tools_run.assert_not_called()
+        EnvData.return_value.save.assert_called_once()
+        assert events.events == [
+            Any.dict.containing(
+                {"outcome": "reinstall-local", "reason": "project-changed"}
+            )
+        ]
+
+    @pytest.mark.usefixtures("matching_hashes")
+    @pytest.mark.parametrize(
+        "reqs,changed",
+        (
+            # Only files which aren't part of the project changed
+            (["-e ."], "requirements.txt"),
+            # There's no local project to reinstall
+            (["package"], "setup.cfg"),
+        ),
+    )
+    def test_it_does_not_reinstall_the_local_project_otherwise(
+        self, venv, action, RequirementList, SourceFiles, reinstall_local, reqs, changed
+    ):  # pylint: disable=too-many-arguments
+        requirements = RequirementList.from_strings.return_value
+        requirements.__iter__.return_value = iter([PipRequirement(req) for req in reqs])
+        SourceFiles.return_value.changed = [
+            str(Path(venv.envconfig.config.setupdir) / changed)
+        ]
+
+        pip_sync(venv, action, skip_on_hash_match=True)
+
+        reinstall_local.assert_not_called()
 
     def test_it_runs_if_hashes_differ(
         self, venv, action, RequirementList, EnvData, pip_tools_run
@@ -232,19 +740,144 @@ class TestPipSync:
         pip_tools_run.assert_called_once()
 
     @pytest.mark.usefixtures("pip_tools_run")
-    def test_it_saves_the_hash(self, venv, action, RequirementList, EnvData):
+    def test_it_clones_matching_envs_for_new_envs(
+        self, venv, action, RequirementList, EnvData, clone_matching_env
+    ):  # pylint: disable=too-many-arguments
+        venv.envconfig.config.tox_pip_sync["clone_envs"] = True
+        EnvData.return_value.last_hash = None
+
         pip_sync(venv, action, skip_on_hash_match=True)
 
-        requirements = RequirementList.from_strings.return_value
-        requirements.hash.assert_called_once_with(
-            root_dir=venv.envconfig.config.setupdir
+        clone_matching_env.assert_called_once_with(
+            venv, RequirementList.from_strings.return_value.hash.return_value
         )
 
+    @pytest.mark.usefixtures("pip_tools_run")
+    def test_it_waits_for_background_compiles(
+        self, venv, action, requirements_files_for_env
+    ):
+        background_compile = create_autospec(BackgroundCompile, instance=True)
+        venv.background_compile = background_compile
+
+        def join():
+            # We should wait before looking for compiled files
+            requirements_files_for_env.assert_not_called()
+
+        background_compile.join.side_effect = join
+
+        pip_sync(venv, action, skip_on_hash_match=False)
+
+        background_compile.join.assert_called_once_with()
+        requirements_files_for_env.assert_called_once()
+        assert venv.background_compile is None
+
+    @pytest.mark.parametrize(
+        "last_hash,config",
+        ((sentinel.last_hash, {"clone_envs": True}), (None, {"clone_envs": False})),
+    )
+    @pytest.mark.usefixtures("pip_tools_run")
+    def test_it_does_not_clone_envs_if_not_new_or_disabled(
+        self, venv, action, EnvData, clone_matching_env, last_hash, config
+    ):  # pylint: disable=too-many-arguments
+        EnvData.return_value.last_hash = last_hash
+        venv.envconfig.config.tox_pip_sync.update(config)
+
+        pip_sync(venv, action, skip_on_hash_match=True)
+
+        clone_matching_env.assert_not_called()
+
+    @pytest.mark.parametrize(
+        "changed,removed,message",
+        (
+            (["a.txt"], [], "Requirements have changed: 'a.txt' changed"),
+            ([], ["b.txt"], "Requirements have changed: 'b.txt' removed"),
+            ([], [], "Requirements have changed: dependencies in tox.ini changed"),
+        ),
+    )
+    @pytest.mark.usefixtures("pip_tools_run")
+    def test_it_reports_what_changed(
+        self, venv, action, EnvData, SourceFiles, verbosity1, changed, removed, message
+    ):  # pylint: disable=too-many-arguments
+        EnvData.return_value.last_hash = sentinel.old_hash
+        SourceFiles.return_value.changed = changed
+        SourceFiles.return_value.removed = removed
+
+        pip_sync(venv, action, skip_on_hash_match=True)
+
+        verbosity1.assert_any_call(message)
+
+    @pytest.mark.usefixtures("pip_tools_run")
+    def test_it_does_not_report_changes_without_a_previous_hash(
+        self, venv, action, EnvData, verbosity1
+    ):
+        EnvData.return_value.last_hash = None
+
+        pip_sync(venv, action, skip_on_hash_match=True)
+
+        verbosity1.assert_not_called()
+
+    @pytest.mark.usefixtures("pip_tools_run")
+    def test_it_saves_the_hash(
+        self, venv, action, RequirementList, EnvData, SourceFiles
+    ):  # pylint: disable=too-many-arguments
+        pip_sync(venv, action, skip_on_hash_match=True)
+
         EnvData.assert_called_once_with(venv.path)
+        SourceFiles.assert_called_once_with(EnvData.return_value.sources)
+        requirements = RequirementList.from_strings.return_value
+        requirements.hash.assert_called_once_with(
+            root_dir=venv.envconfig.config.setupdir,
+            sources=SourceFiles.return_value,
+            raw_files=False,
+        )
         EnvData.return_value.save.assert_called_once_with(
-            requirements_hash=requirements.hash.return_value
+            requirements_hash=requirements.hash.return_value,
+            sources=SourceFiles.return_value,
+            python="cpython3.9",
+            interpreter="/usr/bin/python3.9",
+            site_packages=sentinel.fingerprint,
+            timings=Any.dict.containing(["hash", "requirements-files", "sync"]),
         )
 
+    @pytest.mark.parametrize(
+        "dir_name,direct_url,syncs",
+        (
+            # Like tox installing the project after we've synced
+            ("project-1.0.dist-info", True, 1),
+            # Like someone running `pip install` in the env
+            ("other-1.0.dist-info", False, 2),
+        ),
+    )
+    def test_it_only_notices_packages_installed_from_an_index(
+        self,
+        venv,
+        action,
+        RequirementList,
+        pip_tools_run,
+        EnvData,
+        SourceFiles,
+        site_packages_fingerprint,
+        dir_name,
+        direct_url,
+        syncs,
+    ):  # pylint: disable=too-many-arguments
+        # Use the real files on disk
+        RequirementList.from_strings.return_value.hash.return_value = "hash"
+        EnvData.side_effect = _env_data.EnvData
+        SourceFiles.side_effect = _requirements.SourceFiles
+        site_packages_fingerprint.side_effect = _installed.site_packages_fingerprint
+        site_packages = Path(venv.path) / "lib" / "python3.9" / "site-packages"
+        site_packages.mkdir(parents=True)
+        (site_packages / "package-1.0.dist-info").mkdir()
+
+        pip_sync(venv, action, skip_on_hash_match=True)
+        (site_packages / dir_name).mkdir()
+        if direct_url:
+            (site_packages / dir_name / "direct_url.json").write_text("{}")
+        pip_sync(venv, action, skip_on_hash_match=True)
+
+        assert pip_tools_run.call_count == syncs
+
     @pytest.fixture(autouse=True)
     def pip_tools_run(self, patch):
         return patch("tox_pip_sync._pip_sync.pip_tools_run")
@@ -255,29 +888,54 @@ class TestPipSync:
 
     @pytest.fixture(autouse=True)
     def RequirementList(self, patch):
-        return patch("tox_pip_sync._pip_sync.RequirementList")
+        RequirementList = patch("tox_pip_sync._pip_sync.RequirementList")
+        RequirementList.PROJECT_FILE_SOURCES = ("setup.py", "setup.cfg")
+        return RequirementList
+
+    @pytest.fixture
+    def matching_hashes(self, RequirementList, EnvData):
+        requirements = RequirementList.from_strings.return_value
+        requirements.hash.return_value = sentinel.matching_hash_value
+        EnvData.return_value.last_hash = sentinel.matching_hash_value
 
     @pytest.fixture(autouse=True)
-    def EnvData(self, patch):
-        return patch("tox_pip_sync._pip_sync.EnvData")
+    def reinstall_local(self, patch):
+        return patch("tox_pip_sync._pip_sync.reinstall_local")
 
+    @pytest.fixture(autouse=True)
+    def EnvData(self, patch):
+        EnvData = patch("tox_pip_sync._pip_sync.EnvData")
+        EnvData.return_value.site_packages = sentinel.fingerprint
+        return EnvData
 
-class TestEnvData:
-    def test_it_can_load_the_hash(self, tmpdir):
-        (tmpdir / "tox-pip-sync.json").write_text(
-            json.dumps({"hash": "value"}), "utf-8"
+    @pytest.fixture(autouse=True)
+    def site_packages_fingerprint(self, patch):
+        return patch(
+            "tox_pip_sync._pip_sync.site_packages_fingerprint",
+            return_value=sentinel.fingerprint,
         )
-        last_hash = EnvData(tmpdir).last_hash
 
-        assert last_hash == "value"
+    @pytest.fixture(autouse=True)
+    def SourceFiles(self, patch):
+        SourceFiles = patch("tox_pip_sync._pip_sync.SourceFiles")
+        SourceFiles.return_value.changed = []
+        SourceFiles.return_value.removed = []
+        return SourceFiles
 
-    def test_it_fails_gracefully_if_the_file_is_missing(self, tmpdir):
-        last_hash = EnvData(tmpdir).last_hash
+    @pytest.fixture
+    def verbosity1(self, patch):
+        return patch("tox_pip_sync._pip_sync.verbosity1")
 
-        assert last_hash is None
+    @pytest.fixture(autouse=True)
+    def sync_installed(self, patch):
+        return patch("tox_pip_sync._pip_sync.sync_installed", return_value=False)
 
-    def test_it_can_save_the_hash(self, tmpdir):
-        EnvData(tmpdir).save(requirements_hash="value")
+    @pytest.fixture(autouse=True)
+    def clone_matching_env(self, patch):
+        return patch("tox_pip_sync._pip_sync.clone_matching_env")
 
-        content = json.loads((tmpdir / "tox-pip-sync.json").read_text("utf-8"))
-        assert content == {"hash": "value"}
+    @pytest.fixture(autouse=True)
+    def Wheelhouse(self, patch):
+        Wheelhouse = patch("tox_pip_sync._pip_sync.Wheelhouse")
+        Wheelhouse.for_venv.return_value = None
+        return Wheelhouse
@@ -0,0 +1,142 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from h_matchers import Any
+from tox.config import parseconfig
+from tox.exception import ConfigError
+
+from tox_pip_sync._cache import CompileCache
+from tox_pip_sync._precompile import Precompile
+from tox_pip_sync._requirements import RequirementList
+from tox_pip_sync._tool_env import ToolEnv
+
+
+class TestPrecompile:
+    @pytest.mark.parametrize("option", ("compile_cache", "shared_tool_env"))
+    def test_it_requires_the_cache_and_tool_env(self, tox_config, option):
+        tox_config.tox_pip_sync[option] = False
+
+        with pytest.raises(ConfigError):
+            Precompile(tox_config)
+
+    def test_jobs_dedupes_envs_with_the_same_requirements(self, precompile):
+        jobs = precompile.jobs()
+
+        assert sorted(
+            sorted(venv.name for venv in venvs) for venvs in jobs.values()
+        ) == [["a", "b"], ["c"]]
+
+    def test_jobs_can_be_limited_to_some_envs(self, precompile):
+        jobs = precompile.jobs(["c", "no_deps"])
+
+        assert [[venv.name for venv in venvs] for venvs in jobs.values()] == [["c"]]
+
+    def test_jobs_rejects_unknown_envs(self, precompile):
+        with pytest.raises(ConfigError, match="Unknown tox env.*: typo, other"):
+            precompile.jobs(["a", "typo", "other"])
+
+    def test_jobs_skips_envs_already_in_the_cache(self, precompile):
+        (key,) = precompile.jobs(["a"])
+        cache = CompileCache.for_venv(precompile.jobs(["a"])[key][0])
+        (cache.path / "compiled").mkdir(parents=True)
+        (cache.path / "compiled" / f"{key}.txt").write_text("", encoding="utf-8")
+
+        assert not precompile.jobs(["a", "b"])
+
+    def test_jobs_skips_envs_pinned_by_their_requirements_files(
+        self, precompile, tmp_path
+    ):
+        (tmp_path / "requirements.txt").write_text("package==1.0", encoding="utf-8")
+
+        assert not precompile.jobs(["pinned"])
+
+    def test_jobs_use_the_key_used_when_installing(self, precompile, tox_config):
+        tox_config.tox_pip_sync["raw_file_hashing"] = True
+        (tox_config.toxinidir / "requirements.txt").write("other")
+        requirements = RequirementList.from_strings(["-rrequirements.txt", "package"])
+        raw_hash = requirements.hash(tox_config.setupdir, raw_files=True)
+
+        (key,) = precompile.jobs(["pinned"])
+
+        assert key.startswith(f"{raw_hash}-")
+
+    def test_jobs_skips_envs_without_an_interpreter(self, precompile):
+        assert not precompile.jobs(["missing_python"])
+
+    def test_run_compiles_each_job(
+        self, precompile, compile_into_cache, ensure_exists, tmp_path
+    ):
+        jobs = precompile.jobs()
+
+        results = list(precompile.run(jobs, max_workers=2))
+
+        assert sorted(key for key, _, _ in results) == sorted(jobs)
+        assert all(error is None for _, _, error in results)
+        ensure_exists.assert_called_with(Any.instance_of(ToolEnv), Any())
+        compile_into_cache.assert_any_call(
+            cache=Any.instance_of(CompileCache),
+            key=Any.string(),
+            command=Any.list.containing(["-m", "piptools", "compile"]),
+            unpinned="package_c",
+            work_dir=Any(),
+            cwd=str(tmp_path),
+            root_dir=str(tmp_path),
+            seed=None,
+            env=Any.dict.containing({"PIP_INDEX_URL": "https://example.com/simple"}),
+        )
+
+    def test_run_reports_errors(self, precompile, compile_into_cache):
+        compile_into_cache.side_effect = ValueError("oh no")
+
+        results = list(precompile.run(precompile.jobs(["c"])))
+
+        assert results == [(Any.string(), [Any()], Any.instance_of(ValueError))]
+
+    @pytest.fixture
+    def tox_config(self, tmp_path, monkeypatch):
+        (tmp_path / "tox.ini").write_text(
+            "\n".join(
+                [
+                    "[tox]",
+                    "envlist = a,b,c,no_deps",
+                    "skipsdist = true",
+                    "[testenv]",
+                    "deps =",
+                    "    {a,b}: package_ab",
+                    "    c: package_c",
+                    "setenv =",
+                    "    c: PIP_INDEX_URL = https://example.com/simple",
+                    "[testenv:pinned]",
+                    "deps =",
+                    "    -r requirements.txt",
+                    "    package",
+                    "[testenv:missing_python]",
+                    "basepython = python1.0",
+                    "deps = package",
+                ]
+            ),
+            encoding="utf-8",
+        )
+        monkeypatch.chdir(tmp_path)
+
+        return parseconfig(["-c", str(tmp_path / "tox.ini")])
+
+    @pytest.fixture
+    def precompile(self, tox_config):
+        return Precompile(tox_config)
+
+    @pytest.fixture(autouse=True)
+    def ensure_exists(self, patch):
+        return patch("tox_pip_sync._precompile.ToolEnv.ensure_exists")
+
+    @pytest.fixture
+    def compile_into_cache(self, patch):
+        return patch("tox_pip_sync._precompile.compile_into_cache")
+
+    @pytest.fixture(autouse=True)
+    def ProcessPoolExecutor(self, patch):
+        # Mocks don't make it into other processes
+        return patch(
+            "tox_pip_sync._precompile.ProcessPoolExecutor",
+            side_effect=ThreadPoolExecutor,
+        )
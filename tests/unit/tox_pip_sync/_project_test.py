@@ -0,0 +1,126 @@
+import pytest
+
+from tox_pip_sync._project import read_project_file
+
+
+class TestReadProjectFile:
+    @pytest.mark.parametrize(
+        "file_name,content,changed",
+        (
+            (
+                "setup.py",
+                "import setuptools\nsetup(version='1.0', install_requires=['b'])",
+                "import setuptools\n\nsetup(version='2.0', install_requires=['b'])",
+            ),
+            (
+                "setup.cfg",
+                "[metadata]\nversion = 1.0\n[options]\ninstall_requires = b\n[flake8]\na = 1",
+                "[metadata]\nversion = 2.0\n[options]\ninstall_requires = b\n[flake8]\na = 2",
+            ),
+            (
+                "pyproject.toml",
+                '[project]\nversion = "1.0"\ndependencies = ["b"]\n[tool.black]\na = 1',
+                '[project]\nversion = "2.0"\ndependencies = ["b"]\n[tool.black]\na = 2',
+            ),
+        ),
+    )
+    def test_it_ignores_changes_to_other_parts_of_the_file(
+        self, tmp_path, file_name, content, changed
+    ):
+        assert self._digest(tmp_path, file_name, content) == self._digest(
+            tmp_path, file_name, changed
+        )
+
+    @pytest.mark.parametrize(
+        "file_name,content,changed",
+        (
+            (
+                "setup.py",
+                "setup(install_requires=['b'])",
+                "setup(install_requires=['b', 'c'])",
+            ),
+            (
+                "setup.py",
+                "setuptools.setup(extras_require={'x': ['b']})",
+                "setuptools.setup(extras_require={'x': ['c']})",
+            ),
+            (
+                "setup.py",
+                "setup(python_requires='>=3.8')",
+                "setup(python_requires='>=3.9')",
+            ),
+            (
+                "setup.cfg",
+                "[options]\ninstall_requires = b",
+                "[options]\ninstall_requires = c",
+            ),
+            (
+                "setup.cfg",
+                "[options.extras_require]\nx = b",
+                "[options.extras_require]\nx = c",
+            ),
+            (
+                "pyproject.toml",
+                '[project]\ndependencies = ["b"]',
+                '[project]\ndependencies = ["c"]',
+            ),
+            (
+                "pyproject.toml",
+                '[project.optional-dependencies]\nx = ["b"]',
+                '[project.optional-dependencies]\nx = ["c"]',
+            ),
+            (
+                "pyproject.toml",
+                '[build-system]\nrequires = ["b"]',
+                '[build-system]\nrequires = ["c"]',
+            ),
+        ),
+    )
+    def test_it_detects_changes_to_dependencies(
+        self, tmp_path, file_name, content, changed
+    ):
+        assert self._digest(tmp_path, file_name, content) != self._digest(
+            tmp_path, file_name, changed
+        )
+
+    @pytest.mark.parametrize(
+        "file_name,content",
+        (
+            # Dependencies worked out when it runs
+            ("setup.py", "setup(install_requires=open('reqs.txt').readlines())"),
+            ("setup.py", "setup(**kwargs)"),
+            ("setup.py", "if a:\n    setup()\nelse:\n    setup()"),
+            ("setup.py", "print('no setup call')"),
+            ("setup.py", "make_setup()(install_requires=['b'])"),
+            ("setup.py", "not python"),
+            ("setup.cfg", "not an ini file"),
+            ("pyproject.toml", "not = toml = file"),
+            ("pyproject.toml", b"\xff\xfe"),
+        ),
+    )
+    def test_it_uses_the_whole_file_when_it_cannot_read_dependencies(
+        self, tmp_path, file_name, content
+    ):
+        # A change which would be ignored if we understood the file
+        assert self._digest(tmp_path, file_name, content) != self._digest(
+            tmp_path,
+            file_name,
+            content + (b"\n" if isinstance(content, bytes) else "\n# comment"),
+        )
+
+    def test_it_raises_if_the_file_is_missing(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            read_project_file(tmp_path / "setup.py")
+
+    @staticmethod
+    def _digest(tmp_path, file_name, content):
+        project_file = tmp_path / file_name
+        if isinstance(content, bytes):
+            project_file.write_bytes(content)
+        else:
+            project_file.write_text(content, encoding="utf-8")
+
+        result = read_project_file(project_file)
+
+        assert not result["includes"]
+        return result["digest"]
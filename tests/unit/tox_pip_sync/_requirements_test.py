@@ -1,9 +1,11 @@
+import os
 from pathlib import Path
+from unittest.mock import call
 
 import pytest
 from h_matchers import Any
 
-from tox_pip_sync._requirements import PipRequirement, RequirementList
+from tox_pip_sync._requirements import PipRequirement, RequirementList, SourceFiles
 
 
 class TestRequirementsList:
@@ -31,6 +33,30 @@ class TestRequirementsList:
             ("-crequirements.txt", [PipRequirement("-c requirements.txt")]),
             ("-e .", [PipRequirement("-e .")]),
             ("-e.", [PipRequirement("-e .")]),
+            ("--requirement=requirements.txt", [PipRequirement("-r requirements.txt")]),
+            ("--editable .", [PipRequirement("-e .")]),
+            ("  # comment", []),
+            (
+                "package \\\n  --hash=sha256:abc",
+                [PipRequirement("package --hash=sha256:abc")],
+            ),
+            (
+                "package \\\n# comment\nother",
+                [PipRequirement("package"), PipRequirement("other")],
+            ),
+            ("package \\", [PipRequirement("package")]),
+            ("package\n\\", [PipRequirement("package")]),
+            ("package\n# comment \\", [PipRequirement("package")]),
+            ("package\n   ", [PipRequirement("package")]),
+            (
+                "-i https://example.com/simple",
+                [PipRequirement("--index-url https://example.com/simple")],
+            ),
+            (
+                "pkg @ https://example.com/pkg.zip#sha256=abc  # comment",
+                [PipRequirement("pkg @ https://example.com/pkg.zip#sha256=abc")],
+            ),
+            ("a\r\nb", [PipRequirement("a"), PipRequirement("b")]),
         ),
     )
     def test_from_requirements_file(self, line, requirements, tmpdir):
@@ -41,6 +67,15 @@ class TestRequirementsList:
 
         assert req_set == requirements
 
+    def test_iter_requirements_file(self, tmpdir):
+        req_file = tmpdir / "requirements.txt"
+        req_file.write_text("package_1\npackage_2", encoding="utf-8")
+
+        reqs = RequirementList.iter_requirements_file(req_file)
+
+        assert next(reqs) == PipRequirement("package_1")
+        assert list(reqs) == [PipRequirement("package_2")]
+
     @pytest.mark.parametrize(
         "requirement,needs_compilation",
         (
@@ -76,10 +111,18 @@ class TestRequirementsList:
         )
 
 
-class TestRequirementsSetHashing:
+class TestRequirementsSetHashing:  # pylint: disable=too-many-public-methods
     def test_hash_is_repeatable(self, get_hash):
         assert get_hash() == get_hash()
 
+    def test_hash_is_remembered_for_each_instance(self, project_reqs, project_dir):
+        requirements = RequirementList.from_strings(project_reqs)
+        first_hash = requirements.hash(project_dir)
+
+        (project_dir / "requirements.txt").write_text("new_dep", encoding="utf-8")
+
+        assert requirements.hash(project_dir) == first_hash
+
     @pytest.mark.parametrize("file_name", ("setup.py", "setup.cfg", "pyproject.toml"))
     def test_it_detects_changes_to_project_files(
         self, get_hash, project_dir, file_name
@@ -91,6 +134,17 @@ class TestRequirementsSetHashing:
 
         assert get_hash() != first_hash
 
+    def test_it_ignores_changes_to_project_files_which_are_not_dependencies(
+        self, get_hash, project_dir
+    ):
+        setup_cfg = project_dir / "setup.cfg"
+        setup_cfg.write_text("[metadata]\nversion = 1.0", encoding="utf-8")
+        first_hash = get_hash()
+
+        setup_cfg.write_text("[metadata]\nversion = 2.0", encoding="utf-8")
+
+        assert get_hash() == first_hash
+
     @pytest.mark.parametrize("file_name", ("setup.py", "setup.cfg", "pyproject.toml"))
     def test_it_is_happy_with_project_files_being_missing(
         self, get_hash, project_dir, file_name
@@ -123,10 +177,254 @@ class TestRequirementsSetHashing:
 
         assert get_hash() != first_hash
 
+    def test_it_records_the_source_files(self, get_hash, project_dir):
+        sources = SourceFiles()
+
+        get_hash(sources=sources)
+
+        assert set(sources) == {
+            str(project_dir / file_name)
+            for file_name in (
+                "requirements.txt",
+                "child-reqs.txt",
+                "absolute-reqs.txt",
+                "setup.py",
+                "setup.cfg",
+                "pyproject.toml",
+            )
+        }
+
+    @pytest.mark.parametrize("file_name", ("child-reqs.txt", "setup.py"))
+    def test_it_does_not_read_files_with_the_same_stats(
+        self, get_hash, project_dir, file_name
+    ):
+        sources = SourceFiles()
+        first_hash = get_hash(sources=sources)
+
+        # Change the contents, but make it look the same
+        self._change_file_keeping_stats(project_dir / file_name)
+
+        assert get_hash(sources=SourceFiles(sources)) == first_hash
+
+    @pytest.mark.parametrize("file_name", ("child-reqs.txt", "setup.py"))
+    def test_it_reads_files_with_different_stats(
+        self, get_hash, project_dir, file_name
+    ):
+        sources = SourceFiles()
+        first_hash = get_hash(sources=sources)
+
+        (project_dir / file_name).write_text("a_new_dependency", encoding="utf-8")
+
+        assert get_hash(sources=SourceFiles(sources)) != first_hash
+
+    def test_it_follows_includes_of_unchanged_files(self, get_hash, project_dir):
+        sources = SourceFiles()
+        first_hash = get_hash(sources=sources)
+
+        # `child-reqs.txt` doesn't change, but the file it includes does
+        (project_dir / "requirements.txt").write_text("new_dep", encoding="utf-8")
+
+        assert get_hash(sources=SourceFiles(sources)) != first_hash
+
+    def test_it_reads_shared_includes_once(self, project_dir, iter_requirements_file):
+        (project_dir / "a.txt").write_text("-r base.txt", encoding="utf-8")
+        (project_dir / "b.txt").write_text("-r base.txt", encoding="utf-8")
+        (project_dir / "base.txt").write_text("package", encoding="utf-8")
+
+        RequirementList.from_strings(["-r a.txt", "-r b.txt"]).hash(project_dir)
+
+        assert (
+            iter_requirements_file.call_args_list.count(
+                call(str(project_dir / "base.txt"))
+            )
+            == 1
+        )
+
+    def test_it_reads_files_once_for_all_envs(
+        self, get_hash, project_dir, iter_requirements_file
+    ):
+        first_sources, second_sources = SourceFiles(), SourceFiles()
+
+        get_hash(sources=first_sources)
+        # Another env with a different set of requirements
+        RequirementList.from_strings(["-r child-reqs.txt", "other"]).hash(
+            project_dir, sources=second_sources
+        )
+
+        assert iter_requirements_file.call_count == 3
+        # Each env still knows what it's read
+        assert second_sources == {
+            str(project_dir / "child-reqs.txt"): Any.dict(),
+            str(project_dir / "requirements.txt"): Any.dict(),
+        }
+        assert second_sources.changed == list(second_sources)
+
+    def test_it_reads_project_files_once_for_many_local_requirements(
+        self, project_dir, patch
+    ):
+        read_project_file = patch(
+            "tox_pip_sync._requirements.read_project_file",
+            return_value={"digest": "digest", "includes": []},
+        )
+
+        RequirementList.from_strings([".", "-e .[tests]"]).hash(project_dir)
+
+        assert read_project_file.call_count == 3
+
+    def test_it_remembers_hashes_for_all_envs(
+        self, get_hash, project_reqs, project_dir, patch
+    ):
+        first_hash = get_hash()
+        hash_fragments = patch(
+            "tox_pip_sync._requirements.RequirementList._hash_fragments"
+        )
+
+        assert RequirementList.from_strings(project_reqs).hash(project_dir) == (
+            first_hash
+        )
+        hash_fragments.assert_not_called()
+
+    @pytest.mark.parametrize("change", ("write", "remove"))
+    def test_it_does_not_remember_hashes_if_files_change(
+        self, get_hash, project_dir, change
+    ):
+        first_hash = get_hash()
+
+        if change == "write":
+            (project_dir / "requirements.txt").write_text("new", encoding="utf-8")
+        else:
+            (project_dir / "setup.py").remove()
+
+        assert get_hash() != first_hash
+
+    def test_it_handles_include_cycles(self, project_dir):
+        (project_dir / "a.txt").write_text("-r b.txt\npackage_a", encoding="utf-8")
+        (project_dir / "b.txt").write_text("-r a.txt\npackage_b", encoding="utf-8")
+        requirements = RequirementList.from_strings(["-r a.txt"])
+
+        first_hash = requirements.hash(project_dir)
+        (project_dir / "b.txt").write_text("-r a.txt\npackage_c", encoding="utf-8")
+
+        assert RequirementList.from_strings(["-r a.txt"]).hash(project_dir) != (
+            first_hash
+        )
+
+    def test_it_stores_tree_digests(self, get_hash, project_dir):
+        sources = SourceFiles()
+        get_hash(sources=sources)
+        child = sources[str(project_dir / "child-reqs.txt")]["tree"]
+        parent = sources[str(project_dir / "requirements.txt")]["tree"]
+
+        (project_dir / "requirements.txt").write_text("new_dep", encoding="utf-8")
+        new_sources = SourceFiles(sources)
+        get_hash(sources=new_sources)
+
+        # A change to the included file changes the digest of the includer
+        assert new_sources[str(project_dir / "child-reqs.txt")]["tree"] != child
+        assert new_sources[str(project_dir / "requirements.txt")]["tree"] != parent
+
+    def test_it_records_which_files_changed(self, get_hash, project_dir):
+        sources = SourceFiles()
+        get_hash(sources=sources)
+
+        (project_dir / "requirements.txt").write_text("new_dep", encoding="utf-8")
+        (project_dir / "setup.cfg").remove()
+        new_sources = SourceFiles(sources)
+        get_hash(sources=new_sources)
+
+        assert new_sources.changed == [str(project_dir / "requirements.txt")]
+        assert new_sources.removed == [str(project_dir / "setup.cfg")]
+
+    @pytest.mark.parametrize(
+        "file_name", ("requirements.txt", "child-reqs.txt", "absolute-reqs.txt")
+    )
+    def test_raw_hashing_detects_changes_to_requirements_files(
+        self, get_hash, project_dir, file_name
+    ):
+        first_hash = get_hash(raw_files=True)
+
+        (project_dir / file_name).write_text("a_new_dependency", encoding="utf-8")
+
+        assert get_hash(raw_files=True) != first_hash
+
+    def test_raw_hashing_detects_changes_to_comments(self, get_hash, project_dir):
+        first_hash = get_hash(raw_files=True)
+
+        (project_dir / "requirements.txt").write_text(
+            "package==1.1.1  # a comment", encoding="utf-8"
+        )
+
+        assert get_hash(raw_files=True) != first_hash
+
+    @pytest.mark.parametrize(
+        "include",
+        ("-r base.txt", "  -c base.txt", "-cbase.txt", "--requirement=base.txt"),
+    )
+    def test_raw_hashing_follows_includes(self, project_dir, include):
+        (project_dir / "reqs.txt").write_text(f"package\n{include}", encoding="utf-8")
+        (project_dir / "base.txt").write_text("", encoding="utf-8")
+        sources = SourceFiles()
+
+        RequirementList.from_strings(["-r reqs.txt"]).hash(
+            project_dir, sources=sources, raw_files=True
+        )
+
+        assert str(project_dir / "base.txt") in sources
+
+    @pytest.mark.parametrize(
+        "line",
+        (
+            "package-connector==1.0",
+            "package==1.0 --constraint base.txt",
+            "# -r base.txt",
+            "--rbase.txt",
+            "    --hash=sha256:abc",
+        ),
+    )
+    def test_raw_hashing_only_follows_includes_at_the_start_of_lines(
+        self, project_dir, line
+    ):
+        (project_dir / "reqs.txt").write_text(f"package\n{line}", encoding="utf-8")
+        sources = SourceFiles()
+
+        RequirementList.from_strings(["-r reqs.txt"]).hash(
+            project_dir, sources=sources, raw_files=True
+        )
+
+        assert list(sources) == [str(project_dir / "reqs.txt")]
+
+    def test_raw_hashing_differs_from_parsed_hashing(self, get_hash):
+        assert get_hash(raw_files=True) != get_hash()
+
+    def test_it_remembers_raw_and_parsed_hashes_separately(self, project_dir):
+        requirements = RequirementList.from_strings(["-r requirements.txt"])
+
+        parsed_hash = requirements.hash(project_dir)
+        raw_hash = requirements.hash(project_dir, raw_files=True)
+
+        assert raw_hash != parsed_hash
+        assert requirements.hash(project_dir) == parsed_hash
+
+    @pytest.fixture
+    def iter_requirements_file(self, patch):
+        return patch(
+            "tox_pip_sync._requirements.RequirementList.iter_requirements_file",
+            side_effect=RequirementList.iter_requirements_file,
+        )
+
+    @staticmethod
+    def _change_file_keeping_stats(path):
+        stat = os.stat(path)
+        content = path.read_text(encoding="utf-8")
+        path.write_text(content.swapcase(), encoding="utf-8")
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
     @pytest.fixture
     def get_hash(self, project_reqs, project_dir):
-        def get_hash():
-            return RequirementList.from_strings(project_reqs).hash(project_dir)
+        def get_hash(sources=None, raw_files=False):
+            return RequirementList.from_strings(project_reqs).hash(
+                project_dir, sources=sources, raw_files=raw_files
+            )
 
         return get_hash
 
@@ -204,6 +502,65 @@ class TestPipRequirement:
                 },
             ),
             ("-epackage", {"requirement": "package"}),
+            (
+                "--requirement requirements.txt",
+                {
+                    "arg_type": PipRequirement.ArgType.REFERENCE,
+                    "filename": "requirements.txt",
+                },
+            ),
+            (
+                "--constraint=requirements.txt",
+                {
+                    "arg_type": PipRequirement.ArgType.CONSTRAINT,
+                    "filename": "requirements.txt",
+                },
+            ),
+            (
+                "--editable=.[tests]",
+                {
+                    "arg_type": PipRequirement.ArgType.EDITABLE,
+                    "requirement": ".[tests]",
+                },
+            ),
+            (
+                "--index-url=https://example.com",
+                {
+                    "arg_type": PipRequirement.ArgType.OPTION,
+                    "requirement": "--index-url https://example.com",
+                },
+            ),
+            (
+                "--pre",
+                {"arg_type": PipRequirement.ArgType.OPTION, "requirement": "--pre"},
+            ),
+            (
+                "package==1.0 --hash=sha256:abc --hash sha256:def",
+                {
+                    "requirement": "package==1.0",
+                    "options": "--hash=sha256:abc --hash sha256:def",
+                    "hashes": ("sha256:abc", "sha256:def"),
+                },
+            ),
+            (
+                "package==1.0\t--hash=sha256:abc",
+                {"requirement": "package==1.0", "hashes": ("sha256:abc",)},
+            ),
+            (
+                'package==1.0 ; python_version < "3.8" --hash=sha256:abc',
+                {
+                    "requirement": 'package==1.0 ; python_version < "3.8"',
+                    "hashes": ("sha256:abc",),
+                },
+            ),
+            (
+                "package --global-option=a --no-binary",
+                {
+                    "requirement": "package",
+                    "options": "--global-option=a --no-binary",
+                    "hashes": (),
+                },
+            ),
         ),
     )
     def test_it_parses(self, string, attrs):
@@ -227,11 +584,34 @@ class TestPipRequirement:
 
         assert bool(req.is_local) == is_local
 
+    @pytest.mark.parametrize(
+        "string",
+        (
+            "package==1.0",
+            "package==1.0 --hash=sha256:abc --hash=sha256:def",
+            "-r requirements.txt",
+            "-e .",
+            "--index-url https://example.com",
+        ),
+    )
+    def test_str(self, string):
+        assert str(PipRequirement(string)) == string
+
+    def test_it_has_no_instance_dict(self):
+        assert not hasattr(PipRequirement("package"), "__dict__")
+
+    def test_it_interns_strings(self):
+        assert (
+            PipRequirement("package==1.0").requirement
+            is PipRequirement("package==1.0 ").requirement
+        )
+
     def test_equality(self):
         req = PipRequirement("-e package")
 
         assert req == PipRequirement("-e package")
         assert req != PipRequirement("package")
+        assert req != PipRequirement("-e package --hash=sha256:abc")
         assert req != "-e package"
 
     def test_it_can_hash(self):
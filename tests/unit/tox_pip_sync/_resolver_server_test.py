@@ -0,0 +1,218 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from threading import Thread
+from types import SimpleNamespace
+from unittest.mock import Mock, call, sentinel
+
+import pytest
+
+from tox_pip_sync._resolver_server import WARM_MODULES, main, run, serve
+
+
+# Requests are run in forks of the server, which runs in a thread here
+@pytest.mark.filterwarnings("ignore:.*multi-threaded.*fork:DeprecationWarning")
+class TestServe:
+    def test_it_runs_requests(self, socket_path, cli, tmp_path):
+        # The request is run in another process, so we can't check the mock
+        cli.main.side_effect = lambda args, **_kwargs: print(args)
+        server = self.start(socket_path, cli)
+
+        response = self.request(socket_path, ["compile", "file.in"], tmp_path)
+
+        assert response == {"returncode": 0, "output": "['compile', 'file.in']\n"}
+        server.join()
+
+    def test_it_runs_requests_at_the_same_time(self, socket_path, cli, tmp_path):
+        flag = tmp_path / "flag"
+
+        def main(args, **_kwargs):  # pragma: no cover
+            # This runs in a fork of the server, which coverage doesn't follow
+            if args == ["first"]:
+                # Wait for the second request, which can only run if the
+                # first isn't blocking the server
+                for _ in range(500):
+                    if flag.exists():
+                        break
+                    time.sleep(0.01)
+                print(flag.exists())
+            else:
+                flag.touch()
+
+        cli.main.side_effect = main
+        server = self.start(socket_path, cli)
+
+        with self.connect(socket_path, ["first"], tmp_path) as first:
+            assert self.request(socket_path, ["second"], tmp_path)["returncode"] == 0
+            assert json.loads(first.readline())["output"] == "True\n"
+
+        server.join()
+
+    def test_it_waits_for_requests_to_finish_before_exiting(
+        self, socket_path, cli, tmp_path
+    ):
+        cli.main.side_effect = lambda **_kwargs: time.sleep(0.5)
+        server = self.start(socket_path, cli, idle_timeout=0.1)
+
+        with self.connect(socket_path, ["compile"], tmp_path) as stream:
+            time.sleep(0.3)
+            assert server.is_alive()
+            assert json.loads(stream.readline())["returncode"] == 0
+
+        server.join()
+
+    def test_it_exits_when_idle(self, socket_path, cli):
+        assert not serve(socket_path, 0.1, cli)
+
+        assert not os.path.exists(socket_path)
+
+    def test_it_exits_if_another_server_is_listening(self, socket_path, cli):
+        with open(socket_path, "w", encoding="utf-8"):
+            pass
+
+        assert serve(socket_path, 0.1, cli) == 1
+
+    @staticmethod
+    def start(socket_path, cli, idle_timeout=0.5):
+        server = Thread(target=serve, args=(socket_path, idle_timeout, cli))
+        server.start()
+
+        for _ in range(100):  # pragma: no branch
+            if os.path.exists(socket_path):
+                break
+            server.join(0.01)
+
+        return server
+
+    @classmethod
+    def request(cls, socket_path, args, cwd):
+        with cls.connect(socket_path, args, cwd) as stream:
+            return json.loads(stream.readline())
+
+    @staticmethod
+    @contextmanager
+    def connect(socket_path, args, cwd):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(socket_path)
+            with client.makefile("rwb") as stream:
+                stream.write(
+                    json.dumps({"args": args, "cwd": str(cwd), "env": {}}).encode()
+                    + b"\n"
+                )
+                stream.flush()
+                yield stream
+
+    @pytest.fixture
+    def socket_path(self):
+        # Unix socket paths can't be very long, so avoid the pytest tmp dirs
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            yield os.path.join(tmp_dir, "server.sock")
+
+
+class TestRun:
+    def test_it_runs_the_command_in_the_directory_and_env(self, cli, tmp_path):
+        def main(**_kwargs):
+            print(os.getcwd(), os.environ["NAME"], os.environ.get("PATH"))
+
+        cli.main.side_effect = main
+        original_cwd = os.getcwd()
+
+        result = run(cli, ["compile"], str(tmp_path), {"NAME": "value"})
+
+        assert result == (0, f"{tmp_path} value None\n")
+        assert os.getcwd() == original_cwd
+        assert "NAME" not in os.environ
+        assert "PATH" in os.environ
+
+    def test_it_captures_output_from_subprocesses(self, cli, tmp_path):
+        def main(**_kwargs):
+            print("from pip-tools", flush=True)
+            subprocess.run(
+                [sys.executable, "-c", "import sys; sys.stderr.write('from pip')"],
+                check=True,
+            )
+
+        cli.main.side_effect = main
+
+        returncode, output = run(cli, ["sync"], str(tmp_path), dict(os.environ))
+
+        assert returncode == 0
+        assert output == "from pip-tools\nfrom pip"
+
+    @pytest.mark.parametrize(
+        "exit_code,returncode,output",
+        ((None, 0, ""), (0, 0, ""), (2, 2, ""), ("Oh no", 1, "Oh no\n")),
+    )
+    def test_it_handles_system_exit(self, cli, tmp_path, exit_code, returncode, output):
+        cli.main.side_effect = SystemExit(exit_code)
+
+        assert run(cli, [], str(tmp_path), {}) == (returncode, output)
+
+    def test_it_handles_click_exceptions(self, cli, tmp_path):
+        class UsageError(Exception):
+            exit_code = 2
+
+            def show(self):
+                print("Usage: oh no")
+
+        cli.main.side_effect = UsageError()
+
+        assert run(cli, [], str(tmp_path), {}) == (2, "Usage: oh no\n")
+
+    def test_it_handles_other_exceptions(self, cli, tmp_path):
+        cli.main.side_effect = ValueError("Oh no")
+
+        returncode, output = run(cli, [], str(tmp_path), {})
+
+        assert returncode == 1
+        assert "ValueError: Oh no" in output
+
+
+class TestMain:
+    @pytest.mark.usefixtures("import_module")
+    def test_it_serves_with_pip_tools(self, serve, monkeypatch):
+        piptools_main = SimpleNamespace(cli=sentinel.cli)
+        monkeypatch.setitem(sys.modules, "piptools", SimpleNamespace())
+        monkeypatch.setitem(sys.modules, "piptools.__main__", piptools_main)
+
+        result = main(["/tmp/server.sock", "--idle-timeout", "5"])
+
+        serve.assert_called_once_with("/tmp/server.sock", 5, sentinel.cli)
+        assert result == serve.return_value
+
+    @pytest.mark.usefixtures("serve", "piptools")
+    def test_it_imports_parts_of_pip_up_front(self, import_module):
+        import_module.side_effect = [None, ImportError(), None]
+
+        main(["/tmp/server.sock"])
+
+        assert import_module.call_args_list == [call(name) for name in WARM_MODULES]
+
+    @pytest.fixture
+    def piptools(self, monkeypatch):
+        monkeypatch.setitem(sys.modules, "piptools", SimpleNamespace())
+        monkeypatch.setitem(
+            sys.modules, "piptools.__main__", SimpleNamespace(cli=sentinel.cli)
+        )
+
+    @pytest.fixture
+    def serve(self, patch):
+        return patch("tox_pip_sync._resolver_server.serve")
+
+    @pytest.fixture
+    def import_module(self, patch):
+        # Only patch our reference, as `patch` imports things itself
+        return patch("tox_pip_sync._resolver_server.importlib").import_module
+
+
+@pytest.fixture
+def cli():
+    cli = Mock(spec_set=["main"])
+    cli.main.side_effect = lambda **_kwargs: print("compiled")
+
+    return cli
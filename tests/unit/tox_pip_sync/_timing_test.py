@@ -0,0 +1,83 @@
+import json
+
+import pytest
+from h_matchers import Any
+
+from tox_pip_sync._timing import Timings
+
+
+class TestTimings:
+    def test_phase_records_an_event(self, venv):
+        timings = Timings()
+
+        with timings.phase("pip-compile", venv):
+            pass
+
+        assert timings.events == [
+            {
+                "name": "pip-compile",
+                "env": "env_name",
+                "start": Any.float(),
+                "duration": Any.float(),
+            }
+        ]
+
+    def test_phase_records_an_event_when_an_exception_is_raised(self, venv):
+        timings = Timings()
+
+        with pytest.raises(ValueError):
+            with timings.phase("pip-compile", venv):
+                raise ValueError()
+
+        assert timings.events == [Any.dict.containing({"name": "pip-compile"})]
+
+    def test_totals(self, timings):
+        assert timings.totals("env_1") == {"hash": 3, "pip-sync": 2}
+
+    def test_summary(self, timings):
+        assert timings.summary() == (
+            "env_1: hash 3.00s, pip-sync 2.00s\nenv_2: pip-compile 4.00s"
+        )
+
+    def test_export_to_json_lines(self, timings, tmp_path):
+        trace_file = tmp_path / "trace.jsonl"
+
+        timings.export(trace_file)
+        timings.export(trace_file)
+
+        lines = trace_file.read_text(encoding="utf-8").splitlines()
+        assert [json.loads(line) for line in lines] == [
+            dict(event, pid=Any.int()) for event in timings.events * 2
+        ]
+
+    def test_export_to_chrome_trace(self, timings, tmp_path):
+        trace_file = tmp_path / "trace.json"
+
+        timings.export(trace_file)
+        timings.export(trace_file)
+
+        # The array format doesn't need closing, but `json` needs it to be
+        content = trace_file.read_text(encoding="utf-8").rstrip(",\n") + "]"
+        assert json.loads(content) == [
+            {
+                "name": event["name"],
+                "cat": event["env"],
+                "ph": "X",
+                "ts": int(event["start"] * 1e6),
+                "dur": int(event["duration"] * 1e6),
+                "pid": Any.int(),
+                "tid": event["env"],
+            }
+            for event in timings.events * 2
+        ]
+
+    @pytest.fixture
+    def timings(self):
+        timings = Timings()
+        timings.events = [
+            {"name": "hash", "env": "env_1", "start": 1.0, "duration": 1.0},
+            {"name": "pip-sync", "env": "env_1", "start": 2.0, "duration": 2.0},
+            {"name": "hash", "env": "env_1", "start": 4.0, "duration": 2.0},
+            {"name": "pip-compile", "env": "env_2", "start": 1.5, "duration": 4.0},
+        ]
+        return timings
@@ -0,0 +1,152 @@
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
+
+from tox_pip_sync._cache import default_cache_dir
+from tox_pip_sync._tool_env import ToolEnv
+
+# pylint: disable=protected-access
+
+
+class TestToolEnv:
+    def test_for_venv(self, venv):
+        tool_env = ToolEnv.for_venv(venv)
+
+        assert tool_env.path == default_cache_dir() / "tools" / "cpython3.9"
+
+    def test_for_venv_separates_python_implementations(self, venv):
+        venv.envconfig.python_info.implementation = "PyPy"
+
+        tool_env = ToolEnv.for_venv(venv)
+
+        assert tool_env.path == default_cache_dir() / "tools" / "pypy3.9"
+
+    def test_for_venv_returns_None_if_disabled(self, venv):
+        venv.envconfig.config.tox_pip_sync["shared_tool_env"] = False
+
+        assert ToolEnv.for_venv(venv) is None
+
+    def test_python(self, tool_env):
+        assert tool_env.python == tool_env.path / "bin" / "python"
+
+    def test_command_for_pip_compile(self, tool_env, venv):
+        assert tool_env.command("pip-compile", venv) == [
+            str(tool_env.python),
+            "-m",
+            "piptools",
+            "compile",
+        ]
+
+    def test_command_for_pip_sync(self, tool_env, venv):
+        assert tool_env.command("pip-sync", venv) == [
+            str(tool_env.python),
+            "-m",
+            "piptools",
+            "sync",
+            "--python-executable",
+            str(venv.envconfig.envpython),
+        ]
+
+    def test_arguments(self, venv):
+        assert ToolEnv.arguments("pip-sync", venv) == [
+            "sync",
+            "--python-executable",
+            str(venv.envconfig.envpython),
+        ]
+
+    def test_ensure_exists_does_nothing_if_the_env_exists(self, tool_env, venv, action):
+        tool_env.python.parent.mkdir(parents=True)
+        tool_env.python.touch()
+
+        tool_env.ensure_exists(venv, action)
+
+        venv._pcall.assert_not_called()
+
+    def test_ensure_exists_creates_the_env(self, tool_env, venv, action, fake_venv):
+        venv._pcall.side_effect = fake_venv
+
+        tool_env.ensure_exists(venv, action)
+
+        partial = tool_env.path.with_name(partial_name(tool_env))
+        assert venv._pcall.call_args_list[0].args[0] == [
+            sys.executable,
+            "-m",
+            "virtualenv",
+            "--python",
+            str(venv.envconfig.python_info.executable),
+            str(partial),
+        ]
+        assert venv._pcall.call_args_list[1].args[0] == [
+            str(ToolEnv(partial).python),
+            "-m",
+            "pip",
+            "install",
+            "pip-tools>=6.8",
+        ]
+        assert tool_env.python.exists()
+        assert not partial.exists()
+
+    def test_ensure_exists_replaces_an_env_whose_python_has_gone(
+        self, tool_env, venv, action, fake_venv
+    ):
+        tool_env.python.parent.mkdir(parents=True)
+        tool_env.python.symlink_to(tool_env.path / "missing" / "python3.9")
+        venv._pcall.side_effect = fake_venv
+
+        tool_env.ensure_exists(venv, action)
+
+        assert tool_env.python.read_text(encoding="utf-8") == "ours"
+
+    def test_ensure_exists_can_run_outside_of_tox(
+        self, tool_env, venv, patch, fake_venv
+    ):
+        run = patch("tox_pip_sync._tool_env.subprocess.run")
+        run.side_effect = fake_venv
+
+        tool_env.ensure_exists(venv)
+
+        assert run.call_count == 2
+        assert run.call_args_list[1].args[0][1:4] == ["-m", "pip", "install"]
+        venv._pcall.assert_not_called()
+        assert tool_env.python.exists()
+
+    def test_ensure_exists_uses_an_env_created_while_waiting(
+        self, tool_env, venv, action, exclusive
+    ):
+        @contextmanager
+        def other_process_creates_env(lock_file, waiting_message):
+            assert lock_file == tool_env.path.with_name("cpython3.9.lock")
+            assert waiting_message
+            tool_env.python.parent.mkdir(parents=True)
+            tool_env.python.touch()
+            yield
+
+        exclusive.side_effect = other_process_creates_env
+
+        tool_env.ensure_exists(venv, action)
+
+        venv._pcall.assert_not_called()
+
+    @pytest.fixture
+    def exclusive(self, patch):
+        return patch("tox_pip_sync._tool_env.exclusive")
+
+    @pytest.fixture
+    def fake_venv(self):
+        def fake_venv(args, **_kwargs):
+            if args[1:3] == ["-m", "virtualenv"]:
+                python = ToolEnv(args[-1]).python
+                python.parent.mkdir(parents=True)
+                python.write_text("ours", encoding="utf-8")
+
+        return fake_venv
+
+    @pytest.fixture
+    def tool_env(self, tmp_path):
+        return ToolEnv(tmp_path / "tools" / "cpython3.9")
+
+
+def partial_name(tool_env):
+    return f"{tool_env.path.name}.{os.getpid()}.partial"
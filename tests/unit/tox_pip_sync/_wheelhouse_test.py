@@ -0,0 +1,162 @@
+import os
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from tox_pip_sync._cache import default_cache_dir
+from tox_pip_sync._wheelhouse import Wheelhouse
+
+
+class TestWheelhouse:
+    def test_for_venv(self, venv):
+        venv.envconfig.config.tox_pip_sync["wheelhouse"] = True
+
+        wheelhouse = Wheelhouse.for_venv(venv)
+
+        assert wheelhouse.path == default_cache_dir() / "wheels" / "cpython3.9"
+
+    def test_for_venv_keeps_wheels_for_each_python_apart(self, venv):
+        venv.envconfig.config.tox_pip_sync["wheelhouse"] = True
+        venv.envconfig.python_info.version_info = (3, 8, 1, "final", 0)
+
+        wheelhouse = Wheelhouse.for_venv(venv)
+
+        assert wheelhouse.path == default_cache_dir() / "wheels" / "cpython3.8"
+
+    def test_for_venv_returns_None_if_disabled(self, venv):
+        assert Wheelhouse.for_venv(venv) is None
+
+    def test_prefetch_fetches_missing_wheels(self, wheelhouse, venv, run, reqs):
+        reqs.write_text("package-a==1.0\nPackage_B==2.0", encoding="utf-8")
+        (wheelhouse.path / "package_a-1.0-py3-none-any.whl").touch()
+
+        arguments = wheelhouse.prefetch(venv, [reqs])
+
+        run.assert_called_once_with(
+            [
+                str(venv.envconfig.envpython),
+                "-m",
+                "pip",
+                "wheel",
+                "--no-deps",
+                "--wheel-dir",
+                AnyTempDir(wheelhouse.path),
+                "package-b==2.0",
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            env=venv._get_os_environ.return_value,  # pylint: disable=protected-access
+            check=False,
+        )
+        assert (wheelhouse.path / "package_b-2.0-py3-none-any.whl").exists()
+        assert arguments == ["--find-links", str(wheelhouse.path), "--no-index"]
+
+    def test_prefetch_does_nothing_if_all_wheels_are_present(
+        self, wheelhouse, venv, run, reqs
+    ):
+        reqs.write_text("package-a==1.0", encoding="utf-8")
+        (wheelhouse.path / "package_a-1.0-py3-none-any.whl").touch()
+
+        arguments = wheelhouse.prefetch(venv, [reqs])
+
+        run.assert_not_called()
+        assert arguments == ["--find-links", str(wheelhouse.path), "--no-index"]
+
+    @pytest.mark.parametrize(
+        "wheel",
+        (
+            "package_a-1.0.0-py3-none-any.whl",
+            "package_a-1.0-1-cp39-cp39-linux_x86_64.whl",
+        ),
+    )
+    def test_prefetch_matches_wheels_by_version(
+        self, wheelhouse, venv, run, reqs, wheel
+    ):  # pylint: disable=too-many-arguments
+        reqs.write_text("package-a==1.0", encoding="utf-8")
+        (wheelhouse.path / wheel).touch()
+
+        wheelhouse.prefetch(venv, [reqs])
+
+        run.assert_not_called()
+
+    def test_prefetch_ignores_files_which_are_not_wheels(
+        self, wheelhouse, venv, run, reqs
+    ):
+        reqs.write_text("package-a==1.0", encoding="utf-8")
+        (wheelhouse.path / "not-a-wheel.whl").touch()
+
+        wheelhouse.prefetch(venv, [reqs])
+
+        run.assert_called_once()
+
+    @pytest.mark.parametrize(
+        "content",
+        (
+            "package-a==1.0\n-e file:///project",
+            "package-a==1.0\npackage-b==1.0 --hash=sha256:abc",
+            # Not really a pin, so no wheel will match it
+            "package-a==1.*",
+        ),
+    )
+    @pytest.mark.usefixtures("run")
+    def test_prefetch_allows_the_index_if_not_everything_is_pinned(
+        self, wheelhouse, venv, reqs, content
+    ):
+        reqs.write_text(content, encoding="utf-8")
+
+        arguments = wheelhouse.prefetch(venv, [reqs])
+
+        assert arguments == ["--find-links", str(wheelhouse.path)]
+
+    def test_prefetch_allows_the_index_if_fetching_fails(
+        self, wheelhouse, venv, run, reqs
+    ):
+        reqs.write_text("package-a==1.0", encoding="utf-8")
+        run.side_effect = None
+        run.return_value.returncode = 1
+
+        arguments = wheelhouse.prefetch(venv, [reqs])
+
+        assert arguments == ["--find-links", str(wheelhouse.path)]
+
+    def test_prefetch_allows_the_index_if_the_right_wheel_does_not_arrive(
+        self, wheelhouse, venv, run, reqs
+    ):
+        reqs.write_text("package-a==1.0", encoding="utf-8")
+        run.side_effect = None
+        run.return_value.returncode = 0
+
+        arguments = wheelhouse.prefetch(venv, [reqs])
+
+        assert arguments == ["--find-links", str(wheelhouse.path)]
+
+    @pytest.fixture
+    def reqs(self, tmp_path):
+        return tmp_path / "requirements.txt"
+
+    @pytest.fixture
+    def run(self, patch):
+        def fake_pip_wheel(args, **_kwargs):
+            name, version = args[-1].split("==")
+            build_dir = Path(args[args.index("--wheel-dir") + 1])
+            (build_dir / f"{name.replace('-', '_')}-{version}-py3-none-any.whl").touch()
+            return subprocess.CompletedProcess(args, 0)
+
+        return patch(
+            "tox_pip_sync._wheelhouse.subprocess.run", side_effect=fake_pip_wheel
+        )
+
+    @pytest.fixture
+    def wheelhouse(self, tmp_path):
+        path = tmp_path / "wheels"
+        path.mkdir()
+        return Wheelhouse(path)
+
+
+class AnyTempDir:
+    def __init__(self, parent):
+        self.parent = parent
+
+    def __eq__(self, other):
+        return os.path.dirname(other) == str(self.parent)